@@ -0,0 +1,273 @@
+"""
+Admission Control
+
+Sync endpoints run in a bounded threadpool and share a bounded DB pool, so a handful of
+brigade-wide report/ticket queries can occupy every worker thread and connection while
+roll-call `verify` requests time out behind them. This middleware admits requests before
+they reach the threadpool:
+
+- Each request is classified (`classify()`): write > read > heavy_read (priority order).
+- A global `ADMISSION_CAPACITY` bounds requests in flight; each class also has its own cap.
+  Reads and heavy reads together never take the last `ADMISSION_WRITE_RESERVE` slots, and
+  heavy reads never more than `ADMISSION_HEAVY_MAX`, so cheap writes always find room.
+- Requests over their cap wait in a bounded per-class queue; freed slots go to the
+  highest-priority waiter first (FIFO within a class).
+- Queue full -> 429, waited longer than the class's max_wait -> 503; both with Retry-After.
+- Coalesced heavy reads (COALESCED_PATHS) are admitted as plain reads: most of them only
+  wait for another request's result (single_flight.py). The one that actually computes, the
+  flight leader, first trades its read slot for a heavy_read slot (`claim_heavy()`), so
+  every computation still counts against ADMISSION_HEAVY_MAX, whatever its scope.
+
+Limits are per worker process. Counters, queue depths and wait/service percentiles are at
+GET /metrics/admission. Set ADMISSION_ENABLED=0 to bypass.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+ENABLED = os.getenv("ADMISSION_ENABLED", "1") != "0"
+CAPACITY = int(os.getenv("ADMISSION_CAPACITY", "12"))  # Keep below the DB pool size (5 + 10 overflow)
+WRITE_RESERVE = int(os.getenv("ADMISSION_WRITE_RESERVE", "2"))
+HEAVY_MAX = int(os.getenv("ADMISSION_HEAVY_MAX", "2"))
+
+# Broad scoped scans and aggregations
+HEAVY_READ_PREFIXES = ("/reports/query", "/reports/daily_movement", "/tickets", "/analytics/", "/compliance/", "/units/tree")
+HEAVY_WRITE_PATHS = ("/analytics/reliability/rebuild", "/users/import")
+# Heavy reads that share in-flight results (single_flight.py)
+COALESCED_PATHS = ("/analytics/unit_readiness", "/tickets/", "/reports/query")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+EXEMPT_PATHS = ("/", "/metrics/admission", "/metrics/report_cache", "/metrics/bus", "/metrics/group_commit", "/metrics/single_flight", "/docs", "/redoc", "/openapi.json")
+
+def classify(method: str, path: str) -> Optional[str]:
+    if path in EXEMPT_PATHS or method == "OPTIONS":
+        return None
+    if path in HEAVY_WRITE_PATHS:
+        return "heavy_read"
+    if method in WRITE_METHODS:
+        return "write"
+    if path.startswith(HEAVY_READ_PREFIXES):
+        return "heavy_read"
+    return "read"
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class RouteClass:
+    def __init__(self, name: str, priority: int, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.priority = priority  # Lower is served first
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.waits = deque(maxlen=1024)     # Seconds spent queued (0 for immediate admits)
+        self.services = deque(maxlen=1024)  # Seconds from admission to response
+        self.avg_service = 0.1              # EWMA, for Retry-After
+
+    def metrics(self) -> dict:
+        return {
+            "priority": self.priority,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_ms": percentiles(self.waits),
+            "service_ms": percentiles(self.services),
+        }
+
+def percentiles(samples) -> dict:
+    """p50 / p99 / max in ms of a window of durations in seconds."""
+    if not samples:
+        return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": round(pick(0.50) * 1000, 1), "p99": round(pick(0.99) * 1000, 1), "max": round(ordered[-1] * 1000, 1)}
+
+class AdmissionController:
+    """Runs on the event loop only (middleware), so no locks are needed."""
+
+    def __init__(self, capacity: int, classes: List[RouteClass], write_reserve: int = WRITE_RESERVE):
+        self.capacity = capacity
+        self.shared_limit = max(1, capacity - write_reserve)  # Total in flight that non-writes may fill
+        self.classes: Dict[str, RouteClass] = {c.name: c for c in classes}
+        self.in_flight = 0
+        self._waiters = []  # heap of [priority, seq, RouteClass, future]
+        self._seq = itertools.count()
+        self.coalesced_admits = 0  # Coalesced heavy reads admitted as reads
+        self.heavy_claims = 0      # ...of which went on to compute (flight leaders)
+
+    def _can_admit(self, cls: RouteClass) -> bool:
+        """Within the class cap, and reads of either kind never take the last WRITE_RESERVE slots overall."""
+        ceiling = self.capacity if cls.name == "write" else self.shared_limit
+        return self.in_flight < ceiling and cls.in_flight < cls.limit
+
+    def _admit(self, cls: RouteClass):
+        self.in_flight += 1
+        cls.in_flight += 1
+        cls.admitted += 1
+
+    def retry_after(self, cls: RouteClass) -> int:
+        estimate = cls.avg_service * (cls.queued + 1) / max(cls.limit, 1)
+        return min(30, max(1, math.ceil(estimate)))
+
+    async def acquire(self, name: str) -> float:
+        """Wait for a slot. Returns seconds queued; raises Rejected when saturated."""
+        cls = self.classes[name]
+        if cls.queued == 0 and self._can_admit(cls):
+            self._admit(cls)
+            cls.waits.append(0.0)
+            return 0.0
+        if cls.queued >= cls.max_queue:
+            cls.rejected_full += 1
+            raise Rejected(429, f"Server busy ({name} queue full). Retry later.", self.retry_after(cls))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [cls.priority, next(self._seq), cls, future])
+        cls.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), cls.max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()  # Dropped from the heap lazily by _dispatch
+                cls.queued -= 1
+                cls.rejected_timeout += 1
+                raise Rejected(503, f"Server overloaded ({name}). Retry later.", self.retry_after(cls))
+        except asyncio.CancelledError:
+            # Client went away: give back the slot if we were admitted meanwhile
+            if future.done() and not future.cancelled():
+                self.release(name, 0.0)
+            else:
+                future.cancel()
+                cls.queued -= 1
+            raise
+        waited = time.monotonic() - started
+        cls.waits.append(waited)
+        return waited
+
+    def release(self, name: str, service_seconds: float):
+        cls = self.classes[name]
+        self.in_flight -= 1
+        cls.in_flight -= 1
+        if service_seconds:
+            cls.services.append(service_seconds)
+            cls.avg_service = 0.8 * cls.avg_service + 0.2 * service_seconds
+        self._dispatch()
+
+    async def upgrade(self, slot: "_Slot"):
+        """Give back slot's read slot and wait for a heavy_read one, like any heavy read."""
+        self.release(slot.name, 0.0)
+        slot.name = None  # Holding nothing until admitted
+        self.heavy_claims += 1
+        await self.acquire("heavy_read")
+        slot.name = "heavy_read"
+
+    def _dispatch(self):
+        """Hand free slots to waiters in priority order; skip (but keep) those whose class is capped."""
+        skipped = []
+        while self._waiters and self.in_flight < self.capacity:
+            entry = heapq.heappop(self._waiters)
+            _, _, cls, future = entry
+            if future.done():
+                continue  # Timed out or disconnected
+            if not self._can_admit(cls):
+                skipped.append(entry)
+                continue
+            self._admit(cls)
+            cls.queued -= 1
+            future.set_result(True)
+        for entry in skipped:
+            heapq.heappush(self._waiters, entry)
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": ENABLED,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "coalesced_admits": self.coalesced_admits,
+            "heavy_claims": self.heavy_claims,
+            "classes": {name: cls.metrics() for name, cls in self.classes.items()},
+        }
+
+controller = AdmissionController(CAPACITY, [
+    RouteClass("write", priority=0, limit=CAPACITY, max_queue=200, max_wait=10.0),
+    RouteClass("read", priority=1, limit=max(1, CAPACITY - WRITE_RESERVE), max_queue=100, max_wait=10.0),
+    RouteClass("heavy_read", priority=2, limit=min(HEAVY_MAX, max(1, CAPACITY - WRITE_RESERVE)), max_queue=20, max_wait=15.0),
+])
+
+class _Slot:
+    """The class whose slot a request holds; None while it holds none."""
+    __slots__ = ("controller", "loop", "name")
+
+    def __init__(self, controller: AdmissionController, loop, name: str):
+        self.controller = controller
+        self.loop = loop
+        self.name = name
+
+_slot: ContextVar[Optional[_Slot]] = ContextVar("admission_slot", default=None)
+
+def claim_heavy():
+    """
+    Called by a single-flight leader (any thread) before it computes: if this request was
+    admitted as a coalesced read, wait for a heavy_read slot instead. Raises Rejected.
+    """
+    slot = _slot.get()
+    if slot is None or slot.name != "read":
+        return
+    asyncio.run_coroutine_threadsafe(slot.controller.upgrade(slot), slot.loop).result()
+
+async def claim_heavy_async():
+    """claim_heavy() for callers on the event loop."""
+    slot = _slot.get()
+    if slot is not None and slot.name == "read":
+        await slot.controller.upgrade(slot)
+
+def _rejected(r: Rejected) -> JSONResponse:
+    return JSONResponse(
+        status_code=r.status_code,
+        content={"detail": r.detail},
+        headers={"Retry-After": str(r.retry_after)}
+    )
+
+async def middleware(request: Request, call_next):
+    name = classify(request.method, request.url.path) if ENABLED else None
+    if name is None:
+        return await call_next(request)
+    if name == "heavy_read" and request.url.path in COALESCED_PATHS:
+        name = "read"
+        controller.coalesced_admits += 1
+    try:
+        await controller.acquire(name)
+    except Rejected as r:
+        return _rejected(r)
+    slot = _Slot(controller, asyncio.get_running_loop(), name)
+    token = _slot.set(slot)
+    started = time.monotonic()
+    try:
+        return await call_next(request)
+    except Rejected as r:  # claim_heavy() timed out or the heavy queue was full
+        return _rejected(r)
+    finally:
+        _slot.reset(token)
+        if slot.name is not None:
+            slot.controller.release(slot.name, time.monotonic() - started)
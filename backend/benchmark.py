@@ -0,0 +1,125 @@
+"""
+Worker Scaling Benchmark
+
+    python -m backend.benchmark --workers 1,2,4 --seconds 20 --clients 32
+
+For each worker count, starts `python -m backend.server` on --port with that
+WEB_CONCURRENCY, logs in as --user, and drives a read mix (`/equipment/accessible`,
+`/reports/query`, `/users/me`, `/compliance/overdue`) from --clients closed-loop
+clients spread over several processes (so the client side is not GIL-bound).
+Prints requests/s, p50/p99 latency, non-2xx count and speedup over the first run.
+
+Run it against seeded data (`python -m backend.seed_data`) on the database in
+DATABASE_URL; PostgreSQL is needed to see real scaling (SQLite serializes writers).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+PATHS = ["/equipment/accessible", "/reports/query", "/users/me", "/compliance/overdue"]
+
+def _login(base: str, user: str, password: str) -> str:
+    body = urllib.parse.urlencode({"username": user, "password": password}).encode()
+    with urllib.request.urlopen(f"{base}/login", data=body, timeout=10) as r:
+        return json.load(r)["access_token"]
+
+def _wait_ready(base: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base}/", timeout=2):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {base} did not come up in {timeout:.0f}s")
+
+def _client(args) -> tuple:
+    """One closed-loop client: request after request until the deadline. Returns (latencies, errors)."""
+    base, token, deadline, offset = args
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies, errors, i = [], 0, offset
+    while time.time() < deadline:
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(base + path, headers=headers), timeout=30) as r:
+                r.read()
+        except (urllib.error.URLError, ConnectionError):
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    return latencies, errors
+
+def _client_process(args) -> tuple:
+    base, token, deadline, threads, first = args
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(_client, [(base, token, deadline, first + t) for t in range(threads)]))
+    return [l for lat, _ in results for l in lat], sum(e for _, e in results)
+
+def run_once(workers: int, port: int, seconds: float, clients: int, user: str, password: str) -> dict:
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), HOST="127.0.0.1")
+    server = subprocess.Popen([sys.executable, "-m", "backend.server"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(base)
+        token = _login(base, user, password)
+        processes = min(clients, os.cpu_count() or 1)
+        per_process = [clients // processes + (1 if i < clients % processes else 0) for i in range(processes)]
+        deadline = time.time() + seconds
+        with Pool(processes) as pool:
+            results = pool.map(_client_process, [
+                (base, token, deadline, n, sum(per_process[:i])) for i, n in enumerate(per_process)
+            ])
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    latencies = sorted(l for lat, _ in results for l in lat)
+    errors = sum(e for _, e in results)
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(pick(0.50), 1),
+        "p99_ms": round(pick(0.99), 1),
+        "errors": errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--user", default="u_co_cmdr_a")
+    parser.add_argument("--password", default="secret")
+    args = parser.parse_args()
+
+    counts = [int(w) for w in args.workers.split(",")]
+    if max(counts) > (os.cpu_count() or 1):
+        print(f"warning: {os.cpu_count()} CPU(s) for up to {max(counts)} workers; extra workers cannot add throughput", flush=True)
+
+    runs = []
+    for workers in counts:
+        result = run_once(workers, args.port, args.seconds, args.clients, args.user, args.password)
+        result["speedup"] = round(result["rps"] / runs[0]["rps"], 2) if runs and runs[0]["rps"] else 1.0
+        runs.append(result)
+        print(f"workers={result['workers']:<3} rps={result['rps']:<8} p50={result['p50_ms']}ms "
+              f"p99={result['p99_ms']}ms errors={result['errors']} speedup={result['speedup']}x", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Invalidation Bus
+
+In-process caches (refdata.py, report_cache.py) drop entries on local writes directly.
+With several uvicorn workers (server.py) the other processes must hear about those
+writes too, so each cache also publishes a small message on a named channel here and
+subscribes to the same channel to apply invalidations from its peers.
+
+Backends (INVALIDATION_BUS, default: "postgres" on PostgreSQL, else "file"):
+- postgres: LISTEN/NOTIFY on a dedicated connection; works across hosts.
+- file:     one append-only log per channel in BUS_DIR, tailed every BUS_POLL_SECONDS
+            (same host only; the stand-in for SQLite and local runs).
+- local:    no cross-process delivery (single worker).
+
+Messages from this process are skipped on receipt (the publisher already applied them).
+A subscriber is called with payload None when messages may have been missed (listener
+reconnected, log rotated); it must then drop everything it caches.
+"""
+import json
+import os
+import select
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from . import database
+
+BACKEND = os.getenv("INVALIDATION_BUS") or ("postgres" if database.engine.dialect.name == "postgresql" else "file")
+BUS_DIR = os.getenv("BUS_DIR", os.path.join(tempfile.gettempdir(), "military_logistics_bus"))
+POLL_SECONDS = float(os.getenv("BUS_POLL_SECONDS", "0.05"))
+CHANNEL_PREFIX = "ml_"
+MAX_PAYLOAD = 3500          # Below NOTIFY's 8000-byte limit and one atomic O_APPEND write
+FILE_ROTATE_BYTES = 4 * 1024 * 1024
+
+Callback = Callable[[Optional[str]], None]
+
+class Bus:
+    """Local fan-out shared by all backends; subclasses move messages between processes."""
+
+    def __init__(self):
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._subscribers: Dict[str, List[Callback]] = defaultdict(list)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.published = 0
+        self.received = 0
+        self.resyncs = 0
+
+    def subscribe(self, channel: str, callback: Callback):
+        self._subscribers[channel].append(callback)
+
+    def publish(self, channel: str, payload: str = ""):
+        """Tell the other workers. Payloads over MAX_PAYLOAD are sent as a resync (None)."""
+        message = json.dumps({"o": self.origin, "p": payload if len(payload) <= MAX_PAYLOAD else None})
+        try:
+            self._send(CHANNEL_PREFIX + channel, message)
+            self.published += 1
+        except Exception as e:
+            print(f"Invalidation bus publish failed ({channel}): {e}")
+
+    def _send(self, channel: str, message: str):
+        pass
+
+    def _deliver(self, channel: str, message: str):
+        try:
+            decoded = json.loads(message)
+        except ValueError:
+            return
+        if decoded.get("o") == self.origin:
+            return
+        self.received += 1
+        self._dispatch(channel[len(CHANNEL_PREFIX):], decoded.get("p"))
+
+    def _dispatch(self, channel: str, payload: Optional[str]):
+        for callback in self._subscribers.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"Invalidation bus subscriber failed ({channel}): {e}")
+
+    def _resync(self):
+        self.resyncs += 1
+        for channel in list(self._subscribers):
+            self._dispatch(channel, None)
+
+    # --- Lifecycle ---
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        pass
+
+    def metrics(self) -> dict:
+        return {
+            "backend": BACKEND,
+            "origin": self.origin,
+            "channels": sorted(self._subscribers),
+            "published": self.published,
+            "received": self.received,
+            "resyncs": self.resyncs,
+        }
+
+class PostgresBus(Bus):
+    def _send(self, channel: str, message: str):
+        with database.engine.connect() as conn:  # Rebound by server.configure_pool()
+            conn.execute(text("SELECT pg_notify(:channel, :message)"), {"channel": channel, "message": message})
+            conn.commit()
+
+    def _run(self):
+        backoff = 1.0
+        first = True
+        while not self._stop.is_set():
+            raw = None
+            try:
+                raw = database.engine.raw_connection()
+                raw.detach()  # Long-lived LISTEN connection, never returned to the pool
+                dbapi = raw.dbapi_connection
+                dbapi.autocommit = True
+                with dbapi.cursor() as cursor:
+                    for channel in self._subscribers:
+                        cursor.execute(f'LISTEN "{CHANNEL_PREFIX}{channel}"')
+                if not first:
+                    self._resync()  # Anything sent while disconnected is lost
+                first, backoff = False, 1.0
+                while not self._stop.is_set():
+                    if select.select([dbapi], [], [], 1.0)[0]:
+                        dbapi.poll()
+                        while dbapi.notifies:
+                            notify = dbapi.notifies.pop(0)
+                            self._deliver(notify.channel, notify.payload)
+            except Exception as e:
+                print(f"Invalidation bus listener lost ({e}); reconnecting in {backoff:.0f}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if raw is not None:
+                    raw.close()
+
+class FileBus(Bus):
+    def __init__(self, directory: str = BUS_DIR):
+        super().__init__()
+        self.directory = directory
+        self._positions: Dict[str, tuple] = {}  # channel -> (inode, offset)
+
+    def _path(self, channel: str) -> str:
+        return os.path.join(self.directory, f"{channel}.log")
+
+    def _send(self, channel: str, message: str):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(channel)
+        try:
+            if os.path.getsize(path) > FILE_ROTATE_BYTES:
+                tmp_path = f"{path}.{self.origin}.tmp"
+                open(tmp_path, "w").close()
+                os.replace(tmp_path, path)  # Tailing readers see a new inode and resync
+        except FileNotFoundError:
+            pass
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (message + "\n").encode())  # One write per line: appends never interleave
+        finally:
+            os.close(fd)
+
+    def _tail(self, channel: str):
+        path = self._path(channel)
+        inode, offset = self._positions.get(channel, (None, 0))
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._positions[channel] = (None, 0)
+            return
+        if inode is None:
+            inode, offset = st.st_ino, 0  # Created since the last poll: read it from the start
+        elif st.st_ino != inode or st.st_size < offset:
+            inode, offset = st.st_ino, 0
+            self._resync()
+        if st.st_size == offset:
+            self._positions[channel] = (inode, offset)
+            return
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(st.st_size - offset)
+        complete = data.rfind(b"\n") + 1  # Leave a half-written last line for the next poll
+        self._positions[channel] = (inode, offset + complete)
+        for line in data[:complete].decode(errors="replace").splitlines():
+            self._deliver(channel, line)
+
+    def _run(self):
+        channels = [CHANNEL_PREFIX + c for c in self._subscribers]
+        for channel in channels:
+            try:
+                st = os.stat(self._path(channel))
+                self._positions[channel] = (st.st_ino, st.st_size)  # Start at the end; no replay
+            except FileNotFoundError:
+                pass
+        while not self._stop.wait(POLL_SECONDS):
+            for channel in channels:
+                try:
+                    self._tail(channel)
+                except OSError as e:
+                    print(f"Invalidation bus read failed ({channel}): {e}")
+
+def make_bus(kind: str = BACKEND) -> Bus:
+    if kind == "postgres":
+        return PostgresBus()
+    if kind == "file":
+        return FileBus()
+    return Bus()
+
+bus = make_bus()
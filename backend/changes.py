@@ -0,0 +1,139 @@
+"""
+Change Sequence ("changes since") Tracking
+
+Every flush that inserts/updates Equipment or MaintenanceLog rows stamps them with a new
+value from the global change counter; deletes leave a Tombstone with the same seq.
+Equipment whose holder or unit changes also leaves a "left_scope" Tombstone carrying the
+previous values, so a client whose scope the item just left is told to drop it.
+Clients keep the highest seq they have seen and ask for `?since=<seq>`.
+
+The counter is a single row bumped with UPDATE, so its row lock is held until commit and
+sequence numbers become visible in commit order (no gaps a reader could skip past).
+Bulk `query.update()` calls bypass the ORM flush: pass `change_seq=next_seq(db)` explicitly.
+"""
+from typing import Optional
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+COUNTER_NAME = "global"
+TRACKED = (models.Equipment, models.MaintenanceLog)
+SCOPE_COLUMNS = ("unit_hierarchy", "unit_id", "holder_user_id")
+
+def next_seq(session: Session) -> int:
+    conn = session.connection()
+    counter = models.ChangeCounter.__table__
+    updated = conn.execute(
+        update(counter).where(counter.c.name == COUNTER_NAME).values(value=counter.c.value + 1)
+    )
+    if updated.rowcount == 0:
+        conn.execute(counter.insert().values(name=COUNTER_NAME, value=1))
+    return conn.execute(select(counter.c.value).where(counter.c.name == COUNTER_NAME)).scalar_one()
+
+def current_seq(session: Session) -> int:
+    value = session.query(models.ChangeCounter.value).filter(models.ChangeCounter.name == COUNTER_NAME).scalar()
+    return value or 0
+
+def fetch_since(query, seq_column, since: int, limit: int):
+    """
+    Rows with seq > since, oldest first. Returns (rows, has_more).
+    Pages never split one seq (one transaction), so resuming from rows[-1].change_seq skips nothing.
+    """
+    rows = query.filter(seq_column > since).order_by(seq_column).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, False
+    boundary = rows[limit].change_seq
+    page = [r for r in rows[:limit] if r.change_seq < boundary]
+    if page:
+        return page, True
+    # A single transaction touched more than `limit` rows: return it whole
+    return query.filter(seq_column == boundary).all(), True
+
+def backfill(session: Session) -> int:
+    """Stamp rows written before change tracking existed (or by raw SQL) so `since=0` returns them."""
+    pending = [
+        model for model in TRACKED
+        if session.query(model.id).filter(model.change_seq.is_(None)).first()
+    ]
+    if not pending:
+        return 0
+    seq = next_seq(session)
+    for model in pending:
+        session.query(model).filter(model.change_seq.is_(None)).update(
+            {"change_seq": seq}, synchronize_session=False
+        )
+    session.commit()
+    return seq
+
+def _tombstone(obj, seq: int) -> models.Tombstone:
+    if isinstance(obj, models.Equipment):
+        return models.Tombstone(
+            entity="equipment", entity_id=obj.id, change_seq=seq,
+            unit_hierarchy=obj.unit_hierarchy, unit_id=obj.unit_id, holder_user_id=obj.holder_user_id
+        )
+    item = obj.equipment
+    return models.Tombstone(
+        entity="maintenance_log", entity_id=obj.id, change_seq=seq,
+        unit_hierarchy=item.unit_hierarchy if item else None,
+        unit_id=item.unit_id if item else None,
+        holder_user_id=item.holder_user_id if item else None
+    )
+
+def _scope_exit(obj: models.Equipment, seq: int) -> Optional[models.Tombstone]:
+    """A left_scope marker with the item's previous holder/unit, if either changed in this flush."""
+    state = inspect(obj)
+    previous = {}
+    for name in SCOPE_COLUMNS:
+        history = state.attrs[name].history
+        if history.has_changes() and history.deleted:
+            previous[name] = history.deleted[0]
+    if not previous:
+        return None
+    # unit_id may not be re-resolved yet (units.py runs its hook too): then it is still the old one
+    return models.Tombstone(
+        entity="equipment", entity_id=obj.id, change_seq=seq, kind="left_scope",
+        **{name: previous.get(name, getattr(obj, name)) for name in SCOPE_COLUMNS}
+    )
+
+@event.listens_for(Session, "before_flush")
+def _stamp_changes(session: Session, flush_context, instances):
+    changed = [o for o in session.new if isinstance(o, TRACKED)]
+    moved = [o for o in session.dirty if isinstance(o, TRACKED) and session.is_modified(o)]
+    deleted = [o for o in session.deleted if isinstance(o, TRACKED)]
+    if not changed and not moved and not deleted:
+        return
+
+    seq = next_seq(session)
+    for obj in changed + moved:
+        obj.change_seq = seq
+    for obj in moved:
+        marker = _scope_exit(obj, seq) if isinstance(obj, models.Equipment) else None
+        if marker is not None:
+            session.add(marker)
+    for obj in deleted:
+        session.add(_tombstone(obj, seq))
+
+def revoked(db: Session, user: models.User, since: int, cursor: int):
+    """
+    Equipment ids in (since, cursor] that were visible to `user` and have left their scope:
+    left_scope markers within the caller's scope whose item is no longer in it.
+    Returns (revoked_ids, deleted_ids) for the equipment feed.
+    """
+    from .dependencies import apply_equipment_scope  # dependencies imports units, which imports us
+
+    T = models.Tombstone
+    rows = apply_equipment_scope(
+        db.query(T.entity_id, T.kind).filter(
+            T.entity == "equipment", T.change_seq > since, T.change_seq <= cursor
+        ), user, equipment=T
+    ).all()
+    deleted = sorted({r.entity_id for r in rows if r.kind == "deleted"})
+    exits = {r.entity_id for r in rows if r.kind == "left_scope"} - set(deleted)
+    if exits:
+        still_visible = {r[0] for r in apply_equipment_scope(
+            db.query(models.Equipment.id).filter(models.Equipment.id.in_(exits)), user
+        )}
+        exits -= still_visible
+    return sorted(exits), deleted
@@ -0,0 +1,138 @@
+"""
+Overdue-Verification Sweeper
+
+A background thread runs one range query on the indexed `equipment.last_verified_at`
+every OVERDUE_SWEEP_SECONDS, and keeps the result:
+- in memory, grouped per unit (serves /compliance/overdue without touching the DB)
+- in `overdue_equipment` (diffed, so only items entering/leaving the set are written); with
+  `persist = False` (server.py workers) only the launcher's sweeper writes it
+Threshold matches dependencies.get_daily_status(): SEVERE = not verified for 48h.
+"""
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from .database import SessionLocal
+from . import models
+
+SEVERE_AFTER = timedelta(hours=48)
+SWEEP_SECONDS = float(os.getenv("OVERDUE_SWEEP_SECONDS", "60"))
+
+class OverdueSweeper:
+    def __init__(self, interval: float = SWEEP_SECONDS):
+        self.interval = interval
+        self.persist = True
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._by_unit: Dict[str, List[dict]] = {}
+        self.swept_at: Optional[datetime] = None
+
+    # --- Lifecycle ---
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="overdue-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Overdue sweep failed: {e}")
+            self._stop.wait(self.interval)
+
+    # --- Sweep ---
+    def sweep(self):
+        now = datetime.utcnow()
+        cutoff = now - SEVERE_AFTER
+        Holder = aliased(models.User)
+
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                models.Equipment.id,
+                models.Equipment.serial_number,
+                models.Equipment.unit_hierarchy,
+                models.Equipment.holder_user_id,
+                models.Equipment.last_verified_at,
+                models.CatalogItem.name.label("item_name"),
+                Holder.full_name.label("holder_name")
+            ).outerjoin(
+                models.CatalogItem, models.Equipment.catalog_item_id == models.CatalogItem.id
+            ).outerjoin(
+                Holder, models.Equipment.holder_user_id == Holder.id
+            ).filter(
+                (models.Equipment.last_verified_at < cutoff) | (models.Equipment.last_verified_at.is_(None))
+            ).all()
+
+            by_unit = defaultdict(list)
+            for row in rows:
+                by_unit[row.unit_hierarchy or ""].append({
+                    "equipment_id": row.id,
+                    "serial_number": row.serial_number,
+                    "item_name": row.item_name or "Unknown",
+                    "unit_hierarchy": row.unit_hierarchy,
+                    "holder_user_id": row.holder_user_id,
+                    "holder_name": row.holder_name,
+                    "last_verified_at": row.last_verified_at,
+                    "hours_overdue": round((now - row.last_verified_at).total_seconds() / 3600, 1) if row.last_verified_at else None
+                })
+            for entries in by_unit.values():
+                # Never-verified first, then oldest verification first
+                entries.sort(key=lambda e: (e["last_verified_at"] is not None, e["last_verified_at"] or now))
+
+            if self.persist:
+                try:
+                    self._persist(db, {row.id: row for row in rows}, now)
+                except IntegrityError:
+                    db.rollback()  # Another process persisted the same sweep first
+
+            with self._lock:
+                self._by_unit = dict(by_unit)
+                self.swept_at = now
+        finally:
+            db.close()
+
+    def _persist(self, db, current: dict, now: datetime):
+        existing = {r.equipment_id: r for r in db.query(models.OverdueEquipment)}
+        gone = existing.keys() - current.keys()
+        if gone:
+            db.query(models.OverdueEquipment).filter(
+                models.OverdueEquipment.equipment_id.in_(gone)
+            ).delete(synchronize_session=False)
+        db.add_all([
+            models.OverdueEquipment(
+                equipment_id=eid,
+                unit_hierarchy=row.unit_hierarchy,
+                holder_user_id=row.holder_user_id,
+                last_verified_at=row.last_verified_at,
+                detected_at=now
+            ) for eid, row in current.items() if eid not in existing
+        ])
+        # Still overdue but moved to another unit/holder
+        for eid, row in current.items():
+            stored = existing.get(eid)
+            if stored and (stored.unit_hierarchy, stored.holder_user_id) != (row.unit_hierarchy, row.holder_user_id):
+                stored.unit_hierarchy = row.unit_hierarchy
+                stored.holder_user_id = row.holder_user_id
+        db.commit()
+
+    # --- Reads ---
+    def snapshot(self) -> Dict[str, List[dict]]:
+        if self.swept_at is None:
+            self.sweep()
+        with self._lock:
+            return self._by_unit
+
+sweeper = OverdueSweeper()
@@ -0,0 +1,59 @@
+"""
+Optimistic Concurrency for Equipment
+
+`Equipment.version` is the mapper's version_id_col: every ORM UPDATE is emitted as
+`... WHERE id = :id AND version = :seen` and bumps the version, so a write based on a
+stale read matches no row and SQLAlchemy raises StaleDataError instead of overwriting.
+
+Mutating endpoints:
+1. take the client's expected version from `If-Match` (optional; `if_match_version`)
+2. `check_version()` right after loading the item (fast 409, nothing written)
+3. wrap the write + commit in `except StaleDataError: raise conflict(db, item_id)`
+   to cover a concurrent write landing between the read and the UPDATE.
+The 409 body carries the current state and version so the client can retry without refetching.
+Bulk `query.update()` on equipment must bump `version` itself.
+"""
+from typing import Optional
+
+from fastapi import Header, HTTPException
+from sqlalchemy.orm import Session
+
+from . import models
+
+def if_match_version(if_match: Optional[str] = Header(None)) -> Optional[int]:
+    """Parse `If-Match: 3`, `"3"` or `W/"3"`. Missing or `*` means "no precondition"."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header: expected an equipment version")
+
+def equipment_state(item: models.Equipment) -> dict:
+    return {
+        "id": item.id,
+        "version": item.version,
+        "status": item.status,
+        "holder_user_id": item.holder_user_id,
+        "owner_user_id": item.owner_user_id,
+        "custom_location": item.custom_location,
+        "actual_location_id": item.actual_location_id,
+        "last_verified_at": item.last_verified_at.isoformat() if item.last_verified_at else None,
+        "current_state_description": item.current_state_description,
+    }
+
+def conflict(db: Session, equipment_id: int) -> HTTPException:
+    """Roll back and build the 409 carrying the item's current (committed) state."""
+    db.rollback()
+    item = db.query(models.Equipment).filter(models.Equipment.id == equipment_id).first()
+    return HTTPException(status_code=409, detail={
+        "message": "Equipment was modified by someone else. Review the current state and retry.",
+        "current": equipment_state(item) if item else None
+    })
+
+def check_version(db: Session, item: models.Equipment, expected: Optional[int]):
+    if expected is not None and item.version != expected:
+        raise conflict(db, item.id)
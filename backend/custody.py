@@ -0,0 +1,235 @@
+"""
+Custody History (point-in-time "who held it")
+
+custody_intervals holds one row per period during which an item's holder, owner, location,
+unit and status stayed the same (valid_to NULL = now). An after_flush hook keeps it current
+in the same transaction as the write, just like equipment_read: it closes the item's open
+interval and opens a new one whenever the tracked columns differ. Intervals outlive deleted
+items. Bulk `query.update()` calls bypass the ORM flush: call `sync(db, ids)` yourself.
+
+"State of item X at T" is one index seek on (equipment_id, valid_from).
+
+"Everything held by a user / unit at T" uses checkpoints. Every CUSTODY_CHECKPOINT_HOURS
+(default 168, 0 = off) the open intervals are copied into custody_checkpoint_items. A
+query for T starts from the latest checkpoint at or before T. Items with no interval
+starting or ending between it and T are answered from the checkpoint. Only those that
+changed are replayed from the intervals. Either way the cost is bounded by one checkpoint
+plus one period's changes, however many years of history there are. The replay window
+starts CHECKPOINT_SLACK_SECONDS before the checkpoint to cover transactions that flushed
+before it and committed after.
+
+Checkpoints younger than CUSTODY_CHECKPOINT_KEEP_DAYS (default 56) are all kept; older
+ones are thinned to the first of each calendar month after every new checkpoint, so
+storage grows by one checkpoint a month and queries into old history replay at most about
+a month of changes.
+
+History starts when this table was first populated. Older handovers in transaction_logs
+record the target by name only and are not replayed.
+
+    python -m backend.custody            # open intervals for items that have none, checkpoint, prune
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import event, func, insert, inspect, literal, or_, select, union, union_all, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+CHECKPOINT_HOURS = float(os.getenv("CUSTODY_CHECKPOINT_HOURS", "168"))
+CHECKPOINT_SLACK = timedelta(seconds=float(os.getenv("CUSTODY_CHECKPOINT_SLACK_SECONDS", "600")))
+KEEP_ALL = timedelta(days=float(os.getenv("CUSTODY_CHECKPOINT_KEEP_DAYS", "56")))
+CHUNK = 500
+
+TRACKED = ("holder_user_id", "owner_user_id", "custom_location", "actual_location_id", "unit_id", "status")
+
+# --- Maintenance ---
+def sync(session: Session, equipment_ids: Iterable[int], at: Optional[datetime] = None) -> int:
+    """
+    Make each item's open interval match its current row (close + open where they differ,
+    close only where the item is gone). Runs in the session's transaction. Returns intervals opened.
+    """
+    E, I = models.Equipment, models.CustodyInterval
+    conn = session.connection()
+    at = at or datetime.utcnow()
+    ids = sorted(set(equipment_ids))
+    opened = 0
+    for i in range(0, len(ids), CHUNK):
+        chunk = ids[i:i + CHUNK]
+        current = {
+            r[0]: r for r in conn.execute(
+                select(E.id, *[getattr(E, c) for c in TRACKED], E.unit_hierarchy).where(E.id.in_(chunk))
+            )
+        }
+        open_now = {
+            r[0]: r for r in conn.execute(
+                select(I.equipment_id, *[getattr(I, c) for c in TRACKED], I.id).where(
+                    I.equipment_id.in_(chunk), I.valid_to.is_(None)
+                )
+            )
+        }
+        stale, fresh = [], []
+        for equipment_id in chunk:
+            row, interval = current.get(equipment_id), open_now.get(equipment_id)
+            state = tuple(row[1:len(TRACKED) + 1]) if row else None
+            if interval is not None and tuple(interval[1:len(TRACKED) + 1]) != state:
+                stale.append(interval[-1])
+            if row is not None and (interval is None or interval[-1] in stale):
+                fresh.append({
+                    "equipment_id": equipment_id, "valid_from": at, "unit_hierarchy": row[-1],
+                    **dict(zip(TRACKED, state)),
+                })
+        if stale:
+            conn.execute(update(I).where(I.id.in_(stale)).values(valid_to=at))
+        if fresh:
+            conn.execute(insert(I), fresh)
+        opened += len(fresh)
+    return opened
+
+def ensure_populated(session: Session) -> int:
+    """Startup: open an interval for every item that has none (first deploy, or rows added by bulk SQL). Commits."""
+    E, I = models.Equipment, models.CustodyInterval
+    missing = [r[0] for r in session.execute(
+        select(E.id).where(~select(I.id).where(I.equipment_id == E.id, I.valid_to.is_(None)).exists())
+    )]
+    if not missing:
+        return 0
+    opened = sync(session, missing)
+    session.commit()
+    return opened
+
+def checkpoint(session: Session, at: Optional[datetime] = None) -> models.CustodyCheckpoint:
+    """Copy the open intervals into a new checkpoint. Commits."""
+    I, CI = models.CustodyInterval, models.CustodyCheckpointItem
+    cp = models.CustodyCheckpoint(taken_at=at or datetime.utcnow())
+    session.add(cp)
+    session.flush()
+    result = session.execute(insert(CI).from_select(
+        ["checkpoint_id", "equipment_id", "interval_id", "holder_user_id", "unit_id"],
+        select(literal(cp.id), I.equipment_id, I.id, I.holder_user_id, I.unit_id).where(I.valid_to.is_(None))
+    ))
+    cp.item_count = result.rowcount
+    session.commit()
+    return cp
+
+def prune(session: Session, now: Optional[datetime] = None) -> int:
+    """Drop checkpoints older than KEEP_ALL except the first of each month. Commits. Returns checkpoints dropped."""
+    CP, CI = models.CustodyCheckpoint, models.CustodyCheckpointItem
+    cutoff = (now or datetime.utcnow()) - KEEP_ALL
+    kept, doomed = set(), []
+    for cp_id, taken_at in session.query(CP.id, CP.taken_at).filter(CP.taken_at < cutoff).order_by(CP.taken_at, CP.id):
+        month = (taken_at.year, taken_at.month)
+        if month in kept:
+            doomed.append(cp_id)
+        else:
+            kept.add(month)
+    for i in range(0, len(doomed), CHUNK):
+        chunk = doomed[i:i + CHUNK]
+        session.query(CI).filter(CI.checkpoint_id.in_(chunk)).delete(synchronize_session=False)
+        session.query(CP).filter(CP.id.in_(chunk)).delete(synchronize_session=False)
+    session.commit()
+    return len(doomed)
+
+# --- Point-in-time queries ---
+def interval_at(db: Session, equipment_id: int, at: datetime) -> Optional[models.CustodyInterval]:
+    """The item's interval covering `at`, or None (not yet recorded, or already deleted)."""
+    I = models.CustodyInterval
+    row = db.query(I).filter(I.equipment_id == equipment_id, I.valid_from <= at).order_by(
+        I.valid_from.desc(), I.id.desc()
+    ).first()
+    if row is None or (row.valid_to is not None and row.valid_to <= at):
+        return None
+    return row
+
+def holding_ids_at(db: Session, at: datetime, holder_user_id: Optional[int] = None, unit_ids=None):
+    """
+    SELECT of the interval ids covering `at` for items held by holder_user_id, or (if that is
+    None) whose unit is in unit_ids (a list or a SELECT of unit ids).
+    """
+    I, CI, CP = models.CustodyInterval, models.CustodyCheckpointItem, models.CustodyCheckpoint
+
+    def matches(model):
+        return model.holder_user_id == holder_user_id if holder_user_id is not None else model.unit_id.in_(unit_ids)
+
+    open_at = or_(I.valid_to.is_(None), I.valid_to > at)
+    cp = db.query(CP).filter(CP.taken_at <= at).order_by(CP.taken_at.desc()).first()
+    if cp is None:
+        return select(I.id).where(matches(I), I.valid_from <= at, open_at)
+
+    since = cp.taken_at - CHECKPOINT_SLACK
+    changed = union(
+        select(I.equipment_id).where(I.valid_from > since, I.valid_from <= at),
+        select(I.equipment_id).where(I.valid_to > since, I.valid_to <= at),
+    ).subquery("changed")
+    latest = select(func.max(I.id)).where(
+        I.equipment_id.in_(select(changed.c.equipment_id)), I.valid_from <= at
+    ).group_by(I.equipment_id)
+    return union_all(
+        select(I.id).where(I.id.in_(latest), matches(I), open_at),
+        select(CI.interval_id).where(
+            CI.checkpoint_id == cp.id, matches(CI), CI.equipment_id.not_in(select(changed.c.equipment_id))
+        ),
+    )
+
+# --- Flush hook ---
+@event.listens_for(Session, "after_flush")
+def _record_custody(session: Session, flush_context):
+    ids = {o.id for o in session.new if isinstance(o, models.Equipment)}
+    ids.update(o.id for o in session.deleted if isinstance(o, models.Equipment))
+    for obj in session.dirty:
+        if isinstance(obj, models.Equipment):
+            state = inspect(obj)
+            if any(state.attrs[c].history.has_changes() for c in TRACKED):
+                ids.add(obj.id)
+    if ids:
+        sync(session, ids)
+
+# --- Periodic checkpoints ---
+class Checkpointer:
+    def __init__(self, interval_hours: float = CHECKPOINT_HOURS):
+        self.interval = timedelta(hours=interval_hours)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.interval <= timedelta(0) or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="custody-checkpointer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_if_due()
+            except Exception as e:
+                print(f"Custody checkpoint failed: {e}")
+            self._stop.wait(min(3600.0, self.interval.total_seconds()))
+
+    def run_if_due(self) -> Optional[models.CustodyCheckpoint]:
+        """Take a checkpoint unless one is younger than the interval (another worker may have taken it)."""
+        with SessionLocal() as db:
+            last = db.query(func.max(models.CustodyCheckpoint.taken_at)).scalar()
+            if last and datetime.utcnow() - last < self.interval:
+                return None
+            cp = checkpoint(db)
+            prune(db)
+            return cp
+
+checkpointer = Checkpointer()
+
+if __name__ == "__main__":
+    from . import changes, units  # noqa: F401  (register flush hooks before writing)
+
+    models.Base.metadata.create_all(bind=SessionLocal().get_bind())
+    with SessionLocal() as db:
+        print(f"custody intervals opened: {ensure_populated(db)}")
+        cp = checkpoint(db)
+        print(f"checkpoint {cp.id} at {cp.taken_at.isoformat()}: {cp.item_count} items")
+        print(f"checkpoints pruned: {prune(db)}")
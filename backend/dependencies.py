@@ -6,12 +6,13 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session, joinedload
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple, Union
 
 from .database import get_db
 from . import models
 from . import schemas
 from . import security
+from . import units
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
@@ -55,6 +56,75 @@ def verify_admin_access(user: models.User):
             detail="Permission denied. Only MASTER can perform this action."
         )
 
+TECH_PROFILES = ("Company Tech Soldier", "Battalion Tech Commander", "Brigade Tech Commander")
+
+def can_transfer_equipment(user: models.User) -> bool:
+    """May move equipment between holders/locations (transfer, assign owner, count corrections)."""
+    return bool(
+        (user.profile and user.profile.can_change_assignment_others) or
+        (user.profile and user.profile.name in TECH_PROFILES) or
+        user.role == "master"
+    )
+
+# Compiled visibility scope: ("all", None) | ("unit", <Unit 188/53>) | ("holder", user_id)
+Scope = Tuple[str, Optional[Union[models.Unit, int]]]
+
+def get_visibility_scope(user: models.User) -> Scope:
+    """
+    The Matrix Security cascade, compiled once per user.
+    Same order as before: MASTER -> all -> battalion -> company -> personal.
+    Unit scopes resolve to a `units` row (user.unit_id is kept in sync by units.py).
+    """
+    if user.role == models.UserRole.MASTER or user.role == "master":
+        return ("all", None)
+    if user.profile and user.profile.can_view_all_equipment:
+        return ("all", None)
+
+    if user.profile and user.profile.can_view_battalion_realtime:
+        if user.unit:
+            return ("unit", units.battalion_of(user.unit))
+        return ("holder", user.id)
+
+    if user.profile and user.profile.can_view_company_realtime:
+        if user.unit:
+            return ("unit", user.unit)
+        return ("holder", user.id)
+
+    return ("holder", user.id)
+
+def apply_equipment_scope(query, user: models.User, equipment=models.Equipment):
+    """
+    Apply the caller's scope to a query that selects from Equipment.
+    `equipment` may be an aliased Equipment entity, or any model with unit_id + holder_user_id.
+    Unit scopes are a semi-join on the unit_closure subtree, not a string prefix scan.
+    """
+    kind, value = get_visibility_scope(user)
+    if kind == "all":
+        return query
+    if kind == "unit":
+        return query.filter(equipment.unit_id.in_(units.subtree(value.id)))
+    return query.filter(equipment.holder_user_id == value)
+
+def apply_log_scope(query, user: models.User):
+    """
+    apply_equipment_scope for a query over TransactionLog joined to Equipment. Unit scopes
+    also filter on the log's brigade, so PostgreSQL scans only that brigade's partition.
+    """
+    query = apply_equipment_scope(query, user)
+    kind, value = get_visibility_scope(user)
+    if kind == "unit":
+        query = query.filter(models.TransactionLog.brigade == units.brigade_of(value.path))
+    return query
+
+def in_scope(scope: Scope, unit_hierarchy: Optional[str], holder_user_id: Optional[int]) -> bool:
+    """Python twin of apply_equipment_scope, for data already held in memory."""
+    kind, value = scope
+    if kind == "all":
+        return True
+    if kind == "unit":
+        return units.path_within(unit_hierarchy, value.path)
+    return holder_user_id == value
+
 def get_daily_status(last_verified_at: Optional[datetime]) -> str:
     now_utc = datetime.utcnow()
     if not last_verified_at:
@@ -0,0 +1,209 @@
+"""
+Group Commit for Roll-Call Writes
+
+During morning roll call thousands of `POST /equipment/{id}/verify` and `POST /verifications/`
+requests arrive within minutes. With one commit each, the database's log flush (fsync) is
+the bottleneck. With GROUP_COMMIT_ENABLED=1 those endpoints hand their write to one writer
+thread instead. It takes whatever arrives within GROUP_COMMIT_WINDOW_MS (default 5) of the
+first queued op, up to GROUP_COMMIT_MAX_BATCH (default 200), runs the ops in one session and
+commits once. A request is answered only after its batch's commit has returned.
+
+An op is `fn(db) -> result`: the endpoint's own load/validate/mutate code. It must return
+plain values rather than ORM objects, and it must never roll back the shared session.
+Endpoints close their own session before waiting, so queued requests hold no pooled
+connection. The whole queue needs just the writer's one.
+- An op that fails without having changed or flushed anything (404, 403, version mismatch)
+  fails alone. The rest of the batch carries on.
+- If an op fails after writing, the transaction is rolled back and the remaining ops are
+  replayed without it.
+- If the commit itself fails, every op is retried with its own commit, so one bad row
+  cannot fail the others.
+Batch sizes, queue wait and commit time are at GET /metrics/group_commit (per worker).
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .admission import percentiles
+
+ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "0") == "1"
+WINDOW_SECONDS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5")) / 1000
+MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "200"))
+
+FLUSHES_KEY = "group_commit_flushes"
+
+Op = Callable[[Session], Any]
+
+class _Pending:
+    __slots__ = ("fn", "future", "queued_at")
+
+    def __init__(self, fn: Op):
+        self.fn = fn
+        self.future: Future = Future()
+        self.queued_at = time.monotonic()
+
+@event.listens_for(Session, "after_flush")
+def _count_flush(session: Session, flush_context):
+    if FLUSHES_KEY in session.info:
+        session.info[FLUSHES_KEY] += 1
+
+class GroupCommitWriter:
+    def __init__(self, window: float = WINDOW_SECONDS, max_batch: int = MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[_Pending]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # Counters
+        self.batches = 0
+        self.ops = 0
+        self.failed = 0
+        self.replays = 0
+        self.fallbacks = 0
+        self.sizes = deque(maxlen=1024)
+        self.queue_waits = deque(maxlen=1024)   # Seconds from submit to its batch starting
+        self.commit_times = deque(maxlen=1024)  # Seconds to apply + commit one batch
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Commit what is queued, then stop."""
+        with self._lock:
+            self._stopping = True
+        self._queue.put(None)
+
+    # --- Submission ---
+    def submit(self, fn: Op) -> Future:
+        """Queue an op; the future resolves to its result once its batch is committed."""
+        pending = _Pending(fn)
+        if self._stopping:
+            pending.future.set_exception(RuntimeError("Group commit writer is stopped"))
+            return pending.future
+        self.start()
+        self._queue.put(pending)
+        return pending.future
+
+    def run(self, fn: Op) -> Any:
+        """submit() and wait. For sync endpoints; async ones await asyncio.wrap_future(submit(fn))."""
+        return self.submit(fn).result()
+
+    # --- Writer ---
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = [first], False
+            deadline = first.queued_at + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+            if stop:
+                return
+
+    def _commit_batch(self, batch: List[_Pending]):
+        started = time.monotonic()
+        ops = [p for p in batch if p.future.set_running_or_notify_cancel()]
+        db = SessionLocal()
+        db.info[FLUSHES_KEY] = 0
+        try:
+            results = self._apply(db, ops)
+            try:
+                db.commit()
+            except Exception as e:
+                print(f"Group commit failed ({e}); retrying {len(results)} ops one by one")
+                db.rollback()
+                self.fallbacks += 1
+                results = self._apply_one_by_one(db, list(results))
+            for op, result in results.items():
+                op.future.set_result(result)
+        except Exception as e:
+            for op in ops:
+                if not op.future.done():
+                    op.future.set_exception(e)
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.ops += len(ops)
+        self.failed += sum(1 for op in ops if op.future.exception() is not None)
+        self.sizes.append(len(ops))
+        self.queue_waits.extend(started - op.queued_at for op in ops)
+        self.commit_times.append(time.monotonic() - started)
+
+    def _apply(self, db: Session, ops: List[_Pending]) -> Dict[_Pending, Any]:
+        while True:
+            results, poisoned = {}, False
+            for op in ops:
+                flushes = db.info[FLUSHES_KEY]
+                try:
+                    results[op] = op.fn(db)
+                    db.flush()  # Attribute flush errors to this op, not the next one
+                except Exception as e:
+                    op.future.set_exception(e)
+                    if db.info[FLUSHES_KEY] != flushes or db.new or db.dirty or db.deleted:
+                        poisoned = True
+                        break
+            if not poisoned:
+                return results
+            db.rollback()
+            self.replays += 1
+            ops = [op for op in ops if not op.future.done()]
+
+    def _apply_one_by_one(self, db: Session, ops: List[_Pending]) -> Dict[_Pending, Any]:
+        results = {}
+        for op in ops:
+            try:
+                result = op.fn(db)
+                db.commit()
+                results[op] = result
+            except Exception as e:
+                db.rollback()
+                op.future.set_exception(e)
+        return results
+
+    def metrics(self) -> dict:
+        sizes = sorted(self.sizes)
+        return {
+            "enabled": ENABLED,
+            "window_ms": round(self.window * 1000, 1),
+            "max_batch": self.max_batch,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "ops": self.ops,
+            "failed": self.failed,
+            "replays": self.replays,
+            "fallbacks": self.fallbacks,
+            "batch_size": {
+                "mean": round(sum(sizes) / len(sizes), 1) if sizes else 0.0,
+                "p50": sizes[len(sizes) // 2] if sizes else 0,
+                "max": sizes[-1] if sizes else 0,
+            },
+            "queue_wait_ms": percentiles(self.queue_waits),
+            "commit_ms": percentiles(self.commit_times),
+        }
+
+writer = GroupCommitWriter()
@@ -8,13 +8,30 @@ from sqlalchemy.exc import OperationalError
 import time
 
 # Internal Modules - relative imports within backend package
-from .database import engine
+from .database import SessionLocal
 from . import models
+from . import changes  # Registers the change_seq flush hook
+from . import read_model  # Registers the equipment_read flush hook
+from . import units  # Registers the unit_id resolution hook
+from . import reliability
+from . import custody  # Registers the custody interval flush hook
+from . import partitions  # Partitioned transaction_logs DDL + brigade flush hook
+from .compliance import sweeper as overdue_sweeper
+from . import admission
+from . import report_jobs
+from . import roster
+from . import traffic
+from . import group_commit
+from . import server
+from .bus import bus
+from .snapshots import exporter as snapshot_exporter
 
 # Routers
-from .routers import auth, users, equipment, maintenance, setup, reports, analytics, verifications
+from .routers import auth, users, equipment, maintenance, setup, reports, analytics, verifications, sync, compliance, units as units_router, metrics, counts, custody as custody_router
 
 # --- Database Initialization ---
+engine = server.configure_pool()  # Per-worker pool sizing (see server.py)
+
 def wait_for_db():
     max_retries = 30
     retry_interval = 2
@@ -29,12 +46,32 @@ def wait_for_db():
             time.sleep(retry_interval)
     raise Exception("Database connection failed after multiple retries")
 
+def initialize_database():
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        changes.backfill(session)
+        units.backfill(session)
+        read_model.ensure_populated(session)
+        custody.ensure_populated(session)
+        partitions.backfill(session)
+        partitions.ensure_partitions(session)
+        if reliability.ensure_unit_ids(session) or reliability.refresh(session):  # Tickets closed outside fix_equipment
+            session.commit()
+
 wait_for_db()
-models.Base.metadata.create_all(bind=engine)
+if not server.launched():  # Under server.py the launcher already ran it
+    initialize_database()
 
 # --- FastAPI App ---
 app = FastAPI(title="Military Logistics System", version="4.1 - Modular")
 
+# --- Admission Control (registered first so CORS wraps its 429/503 responses) ---
+app.middleware("http")(admission.middleware)
+
+# --- Traffic Capture (opt-in, TRAFFIC_CAPTURE_DIR; outside admission so queueing and 429s are recorded) ---
+if traffic.recorder.enabled:
+    app.middleware("http")(traffic.middleware)
+
 # --- CORS Middleware (Strict Origins) ---
 origins = [
     "http://localhost:3000",
@@ -49,6 +86,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 # --- Include Routers ---
@@ -61,6 +99,45 @@ app.include_router(reports.router)
 app.include_router(analytics.router)
 app.include_router(verifications.router)
 app.include_router(verifications.history_router)
+app.include_router(sync.router)
+app.include_router(compliance.router)
+app.include_router(units_router.router)
+app.include_router(metrics.router)
+app.include_router(counts.router)
+app.include_router(custody_router.router)
+
+# --- Background Workers ---
+def start_singletons():
+    """Jobs that must run in one process: the server.py launcher, or this app when run alone."""
+    overdue_sweeper.start()
+    snapshot_exporter.start()
+    custody.checkpointer.start()
+
+def stop_singletons():
+    overdue_sweeper.stop()
+    snapshot_exporter.stop()
+    custody.checkpointer.stop()
+
+@app.on_event("startup")
+def start_background_workers():
+    bus.start()
+    if server.launched():
+        overdue_sweeper.persist = False  # In-memory view only; the launcher writes overdue_equipment
+        overdue_sweeper.start()
+    else:
+        start_singletons()
+    traffic.recorder.start()
+    if group_commit.ENABLED:
+        group_commit.writer.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    bus.stop()
+    stop_singletons()
+    report_jobs.shutdown()
+    roster.shutdown()
+    group_commit.writer.stop()
+    traffic.recorder.stop()
 
 # --- Root Endpoint ---
 @app.get("/")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
 from .database import Base # Use shared Base from backend package
@@ -25,11 +25,37 @@ class User(Base):
     company = Column(String, nullable=True)   # e.g. "Pluga B"
     unit_path = Column(String, nullable=True) # e.g. "Golani/51/B" - Used for hierarchy permissions
     unit_hierarchy = Column(String, index=True, nullable=True) # NEW: Materialized path
+    unit_id = Column(Integer, ForeignKey('units.id'), index=True, nullable=True) # Resolved from unit_hierarchy by units.py
 
     # Status
     is_active_duty = Column(Boolean, default=True) # Is currently in service?
     last_seen = Column(DateTime, default=datetime.utcnow)
 
+    unit = relationship("Unit", foreign_keys=[unit_id])
+
+class Unit(Base):
+    """
+    One node of the unit tree (brigade -> battalion -> company), e.g. path "188/53/A".
+    `path` mirrors the legacy unit_hierarchy strings; ancestry lives in UnitClosure.
+    """
+    __tablename__ = 'units'
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)            # Last path segment, e.g. "A"
+    path = Column(String, unique=True, nullable=False)
+    parent_id = Column(Integer, ForeignKey('units.id'), index=True, nullable=True)
+    depth = Column(Integer, default=0)               # 0 = brigade, 1 = battalion, 2 = company
+
+    parent = relationship("Unit", remote_side=[id])
+
+class UnitClosure(Base):
+    """Every (ancestor, descendant) pair of the unit tree, including (u, u) at depth 0."""
+    __tablename__ = 'unit_closure'
+
+    ancestor_id = Column(Integer, ForeignKey('units.id'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey('units.id'), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False)
+
 class CatalogItem(Base):
     """
     Represents a type of equipment (e.g., 'M4 Carbine', 'Ceramic Vest Gen4').
@@ -71,6 +97,7 @@ class Equipment(Base):
     # Matrix Security Fields
     sensitivity = Column(String, default="UNCLASSIFIED") 
     unit_hierarchy = Column(String, index=True, nullable=True) # NEW: Materialized path
+    unit_id = Column(Integer, ForeignKey('units.id'), index=True, nullable=True) # Resolved from unit_hierarchy by units.py
     
     # --- Ownership vs Possession ---
     owner_user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
@@ -83,7 +110,15 @@ class Equipment(Base):
     actual_location_id = Column(Integer, ForeignKey('locations.id'), nullable=True)
 
     # Verification
-    last_verified_at = Column(DateTime, default=datetime.utcnow)
+    last_verified_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    # Delta sync: stamped on every write by changes.py
+    change_seq = Column(Integer, index=True, nullable=True)
+
+    # Optimistic concurrency: bumped on every UPDATE, checked in its WHERE (see concurrency.py)
+    version = Column(Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Relationships
     catalog_item = relationship("CatalogItem")
@@ -99,36 +134,15 @@ class Equipment(Base):
 
     @property
     def current_state_description(self):
-        location_desc = "לא ידוע"
-        
-        # 1. Physical Location
-        if self.holder_user_id:
-            holder_name = self.holder.full_name if self.holder else "Unknown"
-            location_desc = f"אצל {holder_name}"
-        elif self.custom_location:
-            location_desc = f"ב-{self.custom_location}"
-        elif self.actual_location_id:
-            loc_name = self.location.location_name if self.location else "Unknown"
-            location_desc = f"ב-{loc_name}"
-            
-        # 2. Ownership
-        if self.owner_user_id:
-            owner_name = self.owner.full_name if self.owner else "Unknown"
-            
-            if self.holder_user_id and self.holder_user_id != self.owner_user_id:
-                holder_name = self.holder.full_name if self.holder else "Unknown"
-                return f"שייך ל{owner_name}, אבל נמצא פיזית אצל {holder_name}"
-            
-            if self.custom_location:
-                 return f"שייך ל{owner_name}, נמצא ב{self.custom_location}"
-
-            if self.actual_location_id:
-                loc_name = self.location.location_name if self.location else "Unknown"
-                return f"שייך ל{owner_name}, מאוחסן ב{loc_name}"
-            
-            return f"בשימוש שוטף אצל {owner_name}"
-            
-        return f"במלאי ללא בעלים (יתום), כרגע: {location_desc}"
+        return describe_state(
+            holder_user_id=self.holder_user_id,
+            holder_name=self.holder.full_name if self.holder else None,
+            owner_user_id=self.owner_user_id,
+            owner_name=self.owner.full_name if self.owner else None,
+            custom_location=self.custom_location,
+            actual_location_id=self.actual_location_id,
+            location_name=self.location.location_name if self.location else None
+        )
 
     @property
     def compliance_level(self):
@@ -145,22 +159,101 @@ class Equipment(Base):
 
     @property
     def report_status(self):
-        if not self.last_verified_at:
-            return "מעולם לא דווח"
-        
-        time_diff = datetime.utcnow() - self.last_verified_at
-        if time_diff > timedelta(hours=24):
-            return f"חריגת דיווח! עברו {time_diff.days} ימים ו-{int(time_diff.seconds/3600)} שעות"
-        return "דיווח תקין"
+        return describe_report_status(self.last_verified_at)
+
+def describe_state(holder_user_id, holder_name, owner_user_id, owner_name,
+                   custom_location, actual_location_id, location_name) -> str:
+    """
+    Hebrew "where is it / whose is it" sentence for an equipment row.
+    Takes plain values so the equipment_read model can build it without loading relationships.
+    """
+    location_desc = "לא ידוע"
+    holder_name = holder_name or "Unknown"
+    owner_name = owner_name or "Unknown"
+    loc_name = location_name or "Unknown"
+
+    # 1. Physical Location
+    if holder_user_id:
+        location_desc = f"אצל {holder_name}"
+    elif custom_location:
+        location_desc = f"ב-{custom_location}"
+    elif actual_location_id:
+        location_desc = f"ב-{loc_name}"
+
+    # 2. Ownership
+    if owner_user_id:
+        if holder_user_id and holder_user_id != owner_user_id:
+            return f"שייך ל{owner_name}, אבל נמצא פיזית אצל {holder_name}"
+
+        if custom_location:
+             return f"שייך ל{owner_name}, נמצא ב{custom_location}"
+
+        if actual_location_id:
+            return f"שייך ל{owner_name}, מאוחסן ב{loc_name}"
+
+        return f"בשימוש שוטף אצל {owner_name}"
+
+    return f"במלאי ללא בעלים (יתום), כרגע: {location_desc}"
+
+def describe_report_status(last_verified_at) -> str:
+    if not last_verified_at:
+        return "מעולם לא דווח"
+
+    time_diff = datetime.utcnow() - last_verified_at
+    if time_diff > timedelta(hours=24):
+        return f"חריגת דיווח! עברו {time_diff.days} ימים ו-{int(time_diff.seconds/3600)} שעות"
+    return "דיווח תקין"
+
+class EquipmentRead(Base):
+    """
+    Denormalized read model: one flat row per Equipment, kept current by read_model.py
+    in the same transaction as the write. List/report/search endpoints read this table
+    instead of joining catalog_items, users (x2) and locations per row.
+    """
+    __tablename__ = 'equipment_read'
+
+    equipment_id = Column(Integer, ForeignKey('equipment.id', ondelete="CASCADE"), primary_key=True)
+    serial_number = Column(String, nullable=True)
+    item_name = Column(String, index=True)
+    category = Column(String, nullable=True)
+    status = Column(String, index=True)
+    sensitivity = Column(String)
+
+    # Scope columns (same semantics as Equipment, for apply_equipment_scope)
+    unit_hierarchy = Column(String, nullable=True)
+    unit_id = Column(Integer, index=True, nullable=True)
+    holder_user_id = Column(Integer, index=True, nullable=True)
+    holder_name = Column(String, nullable=True)
+    owner_user_id = Column(Integer, nullable=True)
+    owner_name = Column(String, nullable=True)
+
+    custom_location = Column(String, nullable=True)
+    actual_location_id = Column(Integer, nullable=True)
+    location_name = Column(String, nullable=True)
+    state_description = Column(String)
+
+    last_verified_at = Column(DateTime, nullable=True)
+    last_movement_at = Column(DateTime, nullable=True)  # Latest TransactionLog entry
+    last_fault_at = Column(DateTime, nullable=True)     # Latest MaintenanceLog opened
+    version = Column(Integer)                           # Equipment.version, for If-Match
 
 # --- Logs & History ---
 class TransactionLog(Base):
+    """
+    On PostgreSQL this is a LIST-partitioned table keyed on `brigade` (see partitions.py);
+    on SQLite the (brigade, timestamp) index plays that role for scoped reports.
+    """
     __tablename__ = 'transaction_logs'
+    __table_args__ = (
+        Index('ix_transaction_logs_brigade_timestamp', 'brigade', 'timestamp'),
+        {"info": {"partition_by": "brigade"}},
+    )
     id = Column(Integer, primary_key=True, index=True)
-    equipment_id = Column(Integer, ForeignKey('equipment.id'))
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), index=True)
+    brigade = Column(String, nullable=False, default="")  # Top unit segment of the item, kept by partitions.py
     involved_user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
     involved_location_id = Column(Integer, ForeignKey('locations.id'), nullable=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     user_status_at_time = Column(Boolean, nullable=True) 
     event_type = Column(String) 
     
@@ -187,14 +280,21 @@ class FaultType(Base):
 class MaintenanceLog(Base):
     __tablename__ = 'maintenance_logs'
     id = Column(Integer, primary_key=True, index=True)
-    equipment_id = Column(Integer, ForeignKey('equipment.id'))
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), index=True)
     fault_type_id = Column(Integer, ForeignKey('fault_types.id'))
     description = Column(String)
-    status = Column(String, default="Open") 
-    opened_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String, default="Open", index=True)
+    opened_at = Column(DateTime, default=datetime.utcnow, index=True)
     closed_at = Column(DateTime, nullable=True)
+
+    # Reliability analytics (filled once the ticket is closed and folded into ReliabilityStat)
+    repair_seconds = Column(Float, nullable=True)
+    failure_gap_seconds = Column(Float, nullable=True) # Time since the previous fault on the same item
     
     technician_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+
+    # Delta sync: stamped on every write by changes.py
+    change_seq = Column(Integer, index=True, nullable=True)
     
     equipment = relationship("Equipment")
     fault_type = relationship("FaultType")
@@ -254,6 +354,25 @@ class DailyStats(Base):
     functional_items = Column(Integer)
     readiness_score = Column(Float)
 
+class ReliabilityStat(Base):
+    """
+    Running MTTR / MTBF sums, refreshed incrementally as tickets close (see reliability.py).
+    dimension: "catalog" | "fault_type" | "unit" (one row per unit the item was in, key = str(unit_id);
+    subtrees are summed through unit_closure at read time) | "heatmap" (fault x catalog)
+    """
+    __tablename__ = 'reliability_stats'
+    __table_args__ = (UniqueConstraint('dimension', 'key', 'secondary_key', name='uq_reliability_stats_cell'),)
+    id = Column(Integer, primary_key=True, index=True)
+    dimension = Column(String, index=True)
+    key = Column(String)
+    secondary_key = Column(String, default="") # Catalog name for heatmap cells
+    unit_id = Column(Integer, index=True, nullable=True)  # "unit" cells only
+    repairs = Column(Integer, default=0)
+    repair_seconds = Column(Float, default=0.0)
+    failure_gaps = Column(Integer, default=0)
+    failure_gap_seconds = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 
 # --- Verification & Status History ---
 class Verification(Base):
@@ -261,7 +380,7 @@ class Verification(Base):
     __tablename__ = 'verifications'
     
     id = Column(Integer, primary_key=True, index=True)
-    equipment_id = Column(Integer, ForeignKey('equipment.id'), nullable=False)
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), nullable=False, index=True)
     verification_type = Column(String, nullable=False)
     reported_status = Column(String, nullable=False)
     findings = Column(String, nullable=True)
@@ -278,7 +397,7 @@ class EquipmentStatusHistory(Base):
     __tablename__ = 'equipment_status_history'
     
     id = Column(Integer, primary_key=True, index=True)
-    equipment_id = Column(Integer, ForeignKey('equipment.id'), nullable=False)
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), nullable=False, index=True)
     old_status = Column(String, nullable=False)
     new_status = Column(String, nullable=False)
     change_reason = Column(String, nullable=False)
@@ -292,6 +411,161 @@ class EquipmentStatusHistory(Base):
     user = relationship("User", foreign_keys=[created_by])
 
 
+# --- Offline Sync ---
+class SyncOperation(Base):
+    """Idempotency ledger for /sync: one row per client operation that was applied."""
+    __tablename__ = 'sync_operations'
+    __table_args__ = (UniqueConstraint('user_id', 'idempotency_key'),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    idempotency_key = Column(String, nullable=False)
+    op_type = Column(String, nullable=False)
+    result = Column(String, nullable=False) # JSON of the result returned the first time
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# --- Compliance ---
+class OverdueEquipment(Base):
+    """Items past the SEVERE verification threshold, kept current by compliance.OverdueSweeper."""
+    __tablename__ = 'overdue_equipment'
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), primary_key=True)
+    unit_hierarchy = Column(String, index=True, nullable=True)
+    holder_user_id = Column(Integer, index=True, nullable=True)
+    last_verified_at = Column(DateTime, nullable=True)
+    detected_at = Column(DateTime, default=datetime.utcnow)
+
+
+# --- Delta Sync ("changes since") ---
+class ChangeCounter(Base):
+    """Single-row counter behind change_seq. Updating it holds a row lock until commit, so seq order == commit order."""
+    __tablename__ = 'change_counters'
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class Tombstone(Base):
+    """
+    Deleted equipment/tickets, kept so delta clients can drop them.
+    kind="left_scope" marks equipment that moved (holder or unit) instead: the scope columns
+    hold where it was, so clients of the old scope learn it left.
+    """
+    __tablename__ = 'tombstones'
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String, nullable=False) # "equipment" | "maintenance_log"
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, index=True, nullable=False)
+    kind = Column(String, nullable=False, default="deleted") # "deleted" | "left_scope"
+    
+    # Copied from the deleted (or previous) item so the Matrix Security scope can still be applied
+    unit_hierarchy = Column(String, nullable=True)
+    unit_id = Column(Integer, nullable=True)
+    holder_user_id = Column(Integer, nullable=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ReportJob(Base):
+    """
+    An asynchronous report run (report_jobs.py). The result is a gzip JSON artifact keyed by
+    cache_key = hash(report type, caller scope, parameters, data version), shared by every job
+    with the same key until the data changes.
+    """
+    __tablename__ = 'report_jobs'
+    id = Column(String, primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    report_type = Column(String, nullable=False)  # "inventory" | "daily_movement"
+    params = Column(String, nullable=False)       # JSON, defaults already resolved
+    cache_key = Column(String, nullable=False, index=True)
+    status = Column(String, default="queued")     # queued | running | done | failed
+    cached = Column(Boolean, default=False)       # Served from an existing artifact
+    row_count = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+# --- Custody History (custody.py) ---
+class CustodyInterval(Base):
+    """
+    One period during which an item's custody state (holder, owner, location, unit, status)
+    did not change. valid_to is NULL for the current period. Kept after the item is deleted.
+    """
+    __tablename__ = 'custody_intervals'
+    __table_args__ = (
+        Index('ix_custody_equipment_from', 'equipment_id', 'valid_from'),
+        Index('ix_custody_holder_from', 'holder_user_id', 'valid_from'),
+        Index('ix_custody_unit_from', 'unit_id', 'valid_from'),
+    )
+    id = Column(Integer, primary_key=True)
+    equipment_id = Column(Integer, nullable=False)
+    valid_from = Column(DateTime, nullable=False, index=True)
+    valid_to = Column(DateTime, nullable=True, index=True)
+
+    holder_user_id = Column(Integer, nullable=True)
+    owner_user_id = Column(Integer, nullable=True)
+    custom_location = Column(String, nullable=True)
+    actual_location_id = Column(Integer, nullable=True)
+    unit_id = Column(Integer, nullable=True)
+    unit_hierarchy = Column(String, nullable=True)  # Path at the time (display only)
+    status = Column(String, nullable=True)
+
+class CustodyCheckpoint(Base):
+    """The open custody intervals as of taken_at, so point-in-time queries replay only what changed since."""
+    __tablename__ = 'custody_checkpoints'
+    id = Column(Integer, primary_key=True)
+    taken_at = Column(DateTime, nullable=False, index=True)
+    item_count = Column(Integer, default=0)
+
+class CustodyCheckpointItem(Base):
+    __tablename__ = 'custody_checkpoint_items'
+    __table_args__ = (
+        Index('ix_custody_cp_holder', 'checkpoint_id', 'holder_user_id'),
+        Index('ix_custody_cp_unit', 'checkpoint_id', 'unit_id'),
+    )
+    checkpoint_id = Column(Integer, ForeignKey('custody_checkpoints.id', ondelete="CASCADE"), primary_key=True)
+    equipment_id = Column(Integer, primary_key=True)
+    interval_id = Column(Integer, nullable=False)
+    holder_user_id = Column(Integer, nullable=True)
+    unit_id = Column(Integer, nullable=True)
+
+# --- Inventory Counts (reconciliation.py) ---
+class CountSession(Base):
+    """A physical count of one Location or custom_location, reconciled against the database at close."""
+    __tablename__ = 'count_sessions'
+    id = Column(String, primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    location_id = Column(Integer, ForeignKey('locations.id'), nullable=True)  # XOR custom_location
+    custom_location = Column(String, nullable=True)
+    status = Column(String, default="open")  # open | closed | applied (no unexpected line left pending)
+    scan_count = Column(Integer, default=0)   # Raw scans received, repeats included
+    summary = Column(String, nullable=True)   # JSON {outcome: count}, set at close
+    created_at = Column(DateTime, default=datetime.utcnow)
+    closed_at = Column(DateTime, nullable=True)
+    applied_at = Column(DateTime, nullable=True)  # Last apply
+
+    location = relationship("Location")
+
+class CountScan(Base):
+    """Staging table: every serial scanned in a session, appended in chunks while it is open."""
+    __tablename__ = 'count_scans'
+    __table_args__ = (Index('ix_count_scans_session_serial', 'session_id', 'serial'),)
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, ForeignKey('count_sessions.id', ondelete="CASCADE"), nullable=False)
+    serial = Column(String, nullable=False)
+    scanned_at = Column(DateTime, default=datetime.utcnow)
+
+class CountLine(Base):
+    """Reconciliation result, one row per distinct scanned serial plus one per missing item."""
+    __tablename__ = 'count_lines'
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, ForeignKey('count_sessions.id', ondelete="CASCADE"), nullable=False, index=True)
+    outcome = Column(String, nullable=False)  # found | missing | unexpected | unknown | out_of_scope
+    serial = Column(String, nullable=True)
+    equipment_id = Column(Integer, nullable=True)  # Not set for unknown / out_of_scope
+    recorded_location = Column(String, nullable=True)  # Where the database had an unexpected item
+    scans = Column(Integer, default=0)  # Times scanned (0 = missing)
+    applied = Column(Boolean, default=False)  # Moved here by a corrective transfer
+    dismissed = Column(Boolean, default=False)  # Unexpected line the counter chose not to apply
+
 # --- Ticket Status Enum ---
 import enum
 class TicketStatus(str, enum.Enum):
@@ -0,0 +1,36 @@
+"""
+Keyset (cursor) pagination helpers.
+A cursor is an opaque token wrapping the (timestamp, id) of the last row returned.
+Pages run in (ts DESC NULLS LAST, id DESC) order on every backend: PostgreSQL sorts NULLs
+first on DESC and SQLite sorts them last, so callers must order by keyset_order().
+"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+def encode_cursor(timestamp: Optional[datetime], row_id: int) -> str:
+    raw = f"{timestamp.isoformat() if timestamp else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        ts, row_id = raw.split("|", 1)
+        return (datetime.fromisoformat(ts) if ts else None), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_order(ts_column, id_column) -> tuple:
+    """ORDER BY clauses matching keyset_before(): newest first, NULL timestamps last."""
+    return ts_column.desc().nullslast(), id_column.desc()
+
+def keyset_before(ts_column, id_column, cursor: str):
+    """Filter for rows strictly after the cursor in keyset_order() order."""
+    ts, row_id = decode_cursor(cursor)
+    if ts is None:
+        return and_(ts_column.is_(None), id_column < row_id)
+    # NULL-timestamp rows come after every dated row, so they are always still ahead
+    return or_(ts_column < ts, and_(ts_column == ts, id_column < row_id), ts_column.is_(None))
@@ -0,0 +1,235 @@
+"""
+Brigade Partitioning (transaction_logs)
+
+transaction_logs is the one table that grows without bound, so on PostgreSQL it is LIST-
+partitioned on `brigade`, the top segment of the item's unit_hierarchy ("188/53/A" -> "188").
+Each brigade's log history lives in its own partition, so one brigade's write load and
+vacuum cycles stay in that partition. Rows without a unit (brigade "") go to
+transaction_logs_default.
+
+- A before_flush hook stamps `brigade` on new logs from their item. When an item moves
+  to another brigade, it also moves that item's existing logs, so `brigade` always equals
+  the item's current brigade. units.move() does the same for whole subtrees.
+- Partitions are created only at startup (`ensure_partitions`, one per root unit: CREATE
+  ... LIKE, move its rows out of the default partition, ATTACH), never inside a request
+  transaction. Logs of a brigade first seen at runtime land in the default partition
+  until the next startup moves them out.
+- `backfill` stamps `brigade` at startup on logs that were written without it.
+- Unit scopes add `brigade = <scope brigade>` (dependencies.apply_log_scope), so the
+  planner reads only that brigade's partition. Unscoped (MASTER) queries are spread over
+  the partitions by PostgreSQL's Parallel Append.
+- On SQLite nothing is partitioned. The same predicate uses the (brigade, timestamp) index.
+
+equipment itself is not partitioned: PostgreSQL requires the partition key in every
+unique constraint, and equipment.id is the target of six foreign keys while
+serial_number must stay unique across brigades.
+
+    python -m backend.partitions        # convert an existing unpartitioned transaction_logs (offline)
+"""
+import hashlib
+import re
+import threading
+from typing import Iterable, Set
+
+from sqlalchemy import event, inspect, select, text, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+
+from . import models
+from . import units
+
+TABLE = models.TransactionLog.__tablename__
+DEFAULT_PARTITION = f"{TABLE}_default"
+CHUNK = 500
+
+_known: Set[str] = set()  # Partitions known to exist (per process)
+_known_lock = threading.Lock()
+
+# --- DDL (PostgreSQL) ---
+@compiles(CreateTable, "postgresql")
+def _create_partitioned(element, compiler, **kw):
+    """Tables with info["partition_by"] are created PARTITION BY LIST, with the key added to the primary key."""
+    ddl = compiler.visit_create_table(element, **kw)
+    key = element.element.info.get("partition_by")
+    if not key:
+        return ddl
+    pk = ", ".join(c.name for c in element.element.primary_key.columns)
+    ddl = ddl.replace(f"PRIMARY KEY ({pk})", f"PRIMARY KEY ({pk}, {key})")
+    return f"{ddl.rstrip()} PARTITION BY LIST ({key})\n\n"
+
+@event.listens_for(models.TransactionLog.__table__, "after_create")
+def _create_default_partition(target, connection, **kw):
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT'))
+
+def partition_name(brigade: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "_", brigade.lower()).strip("_")[:32]
+    return f"{TABLE}_{slug}_{hashlib.sha1(brigade.encode()).hexdigest()[:8]}"
+
+def _load_known(conn):
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:parent AS regclass)"
+    ), {"parent": TABLE})
+    with _known_lock:
+        _known.update(r[0] for r in rows)
+
+def ensure_partition(conn, brigade: str) -> bool:
+    """
+    Create the brigade's partition if it is missing (PostgreSQL only), moving its rows out of
+    the default partition. Runs in a savepoint of the caller's transaction: if it fails
+    (e.g. another worker created it first), the rows simply keep landing in the default
+    partition or in that worker's partition. Returns True if a partition was created.
+    """
+    if conn.dialect.name != "postgresql" or not brigade:
+        return False
+    name = partition_name(brigade)
+    if name in _known:
+        return False
+    _load_known(conn)
+    if name in _known:
+        return False
+    value = brigade.replace("'", "''")
+    try:
+        with conn.begin_nested():
+            conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS)'))
+            conn.execute(text(f'INSERT INTO "{name}" SELECT * FROM "{DEFAULT_PARTITION}" WHERE brigade = :b'), {"b": brigade})
+            conn.execute(text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE brigade = :b'), {"b": brigade})
+            conn.execute(text(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES IN (\'{value}\')'))
+    except Exception as e:
+        print(f"Partition for brigade {brigade!r} not created: {e}")
+        return False
+    with _known_lock:
+        _known.add(name)
+    return True
+
+def backfill(session: Session) -> int:
+    """Startup: stamp `brigade` on logs written without one (raw SQL, older rows). Commits if anything changed."""
+    T, E = models.TransactionLog, models.Equipment
+    conn = session.connection()
+    unstamped = select(T.equipment_id).where(T.brigade == "")
+    paths = [r[0] for r in conn.execute(
+        select(E.unit_hierarchy).where(E.unit_hierarchy.isnot(None), E.id.in_(unstamped)).distinct()
+    )]
+    updated = 0
+    for path in paths:
+        brigade = units.brigade_of(path)
+        if not brigade:
+            continue
+        updated += conn.execute(update(T).where(
+            T.brigade == "", T.equipment_id.in_(select(E.id).where(E.unit_hierarchy == path))
+        ).values(brigade=brigade)).rowcount
+    if updated:
+        session.commit()
+    return updated
+
+def ensure_partitions(session: Session) -> int:
+    """Startup: a partition for every brigade (root unit) that lacks one. Commits if any were created."""
+    roots = [r[0] for r in session.execute(select(models.Unit.path).where(models.Unit.depth == 0))]
+    created = sum(ensure_partition(session.connection(), units.brigade_of(path)) for path in roots)
+    if created:
+        session.commit()
+    return created
+
+# --- Keeping `brigade` current ---
+def relabel(session: Session, equipment_ids: Iterable[int], brigade: str) -> int:
+    """Set brigade on every log of these items (they moved brigade). Does not commit."""
+    T = models.TransactionLog
+    conn = session.connection()
+    ids = list(equipment_ids)
+    moved = 0
+    for i in range(0, len(ids), CHUNK):
+        moved += conn.execute(
+            update(T).where(T.equipment_id.in_(ids[i:i + CHUNK]), T.brigade != brigade).values(brigade=brigade)
+        ).rowcount
+    return moved
+
+def _item_brigades(session: Session, equipment_ids: Set[int]) -> dict:
+    """brigade per equipment id, from the session's own objects where loaded (they may be unflushed)."""
+    found, missing = {}, []
+    for equipment_id in equipment_ids:
+        item = session.identity_map.get(session.identity_key(models.Equipment, equipment_id))
+        if item is not None:
+            found[equipment_id] = units.brigade_of(item.unit_hierarchy)
+        else:
+            missing.append(equipment_id)
+    E = models.Equipment
+    for i in range(0, len(missing), CHUNK):
+        for equipment_id, path in session.connection().execute(
+            select(E.id, E.unit_hierarchy).where(E.id.in_(missing[i:i + CHUNK]))
+        ):
+            found[equipment_id] = units.brigade_of(path)
+    return found
+
+@event.listens_for(Session, "before_flush")
+def _stamp_brigades(session: Session, flush_context, instances):
+    logs = [o for o in session.new if isinstance(o, models.TransactionLog)]
+    moved = {}
+    for obj in session.dirty:
+        if isinstance(obj, models.Equipment):
+            history = inspect(obj).attrs.unit_hierarchy.history
+            if history.has_changes():
+                old = history.deleted[0] if history.deleted else None
+                if units.brigade_of(old) != units.brigade_of(obj.unit_hierarchy):
+                    moved[obj.id] = units.brigade_of(obj.unit_hierarchy)
+    if not logs and not moved:
+        return
+
+    brigades = _item_brigades(session, {
+        log.equipment_id for log in logs if log.equipment is None and log.equipment_id is not None
+    })
+    for log in logs:
+        if log.equipment is not None:  # Assigned through the relationship (possibly a new item)
+            log.brigade = units.brigade_of(log.equipment.unit_hierarchy)
+        else:
+            log.brigade = brigades.get(log.equipment_id, "")
+
+    for equipment_id, brigade in moved.items():
+        relabel(session, [equipment_id], brigade)
+
+# --- Converting an existing table (PostgreSQL) ---
+def convert(engine) -> None:
+    """
+    Turn an existing plain transaction_logs into the partitioned layout. Run offline; the
+    old table is kept as transaction_logs_unpartitioned until you drop it.
+    """
+    if engine.dialect.name != "postgresql":
+        print("Partitioning applies to PostgreSQL only; nothing to do.")
+        return
+    legacy = f"{TABLE}_unpartitioned"
+    with engine.begin() as conn:
+        if conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = CAST(:t AS regclass)"
+        ), {"t": TABLE}).first():
+            print(f"{TABLE} is already partitioned.")
+            return
+
+        columns = {c["name"] for c in inspect(conn).get_columns(TABLE)}
+        if "brigade" not in columns:
+            conn.execute(text(f'ALTER TABLE "{TABLE}" ADD COLUMN brigade VARCHAR NOT NULL DEFAULT \'\''))
+        E = models.Equipment
+        for (path,) in conn.execute(select(E.unit_hierarchy).where(E.unit_hierarchy.isnot(None)).distinct()):
+            conn.execute(text(
+                f'UPDATE "{TABLE}" SET brigade = :b WHERE equipment_id IN (SELECT id FROM equipment WHERE unit_hierarchy = :path)'
+            ), {"b": units.brigade_of(path), "path": path})
+
+        # Free the table's constraint and index names for the new table
+        conn.execute(text(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"'))
+        for (name,) in conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": legacy}):
+            conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{name}_unpartitioned"'))
+
+        models.TransactionLog.__table__.create(conn)
+        for (brigade,) in conn.execute(text(f'SELECT DISTINCT brigade FROM "{legacy}"')):
+            ensure_partition(conn, brigade)
+        names = ", ".join(f'"{c.name}"' for c in models.TransactionLog.__table__.columns)
+        copied = conn.execute(text(f'INSERT INTO "{TABLE}" ({names}) SELECT {names} FROM "{legacy}"')).rowcount
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), COALESCE((SELECT MAX(id) FROM \"{TABLE}\"), 0) + 1, false)"
+        ))
+    print(f"Copied {copied} rows into {len(_known)} brigade partitions. Drop {legacy} when satisfied.")
+
+if __name__ == "__main__":
+    from .database import engine
+
+    convert(engine)
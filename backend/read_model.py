@@ -0,0 +1,194 @@
+"""
+Equipment Read Model (equipment_read)
+
+One flat row per Equipment with the names and state sentence already resolved, so list,
+report and search endpoints read a single narrow table instead of joining catalog_items,
+users (twice) and locations and building strings per row.
+
+Rows are rewritten in an after_flush hook on the same connection, so they commit or roll
+back together with the write that changed them. Affected equipment ids are collected from:
+- Equipment inserts/updates/deletes
+- TransactionLog / MaintenanceLog inserts (last event times)
+- renames of Users, Locations and CatalogItems referenced by equipment
+Bulk `query.update()` calls bypass the ORM flush: call `refresh(db, ids)` yourself.
+
+Every rewrite also records the (unit_hierarchy, holder_user_id) of the rows before and
+after in `session.info[TOUCHED_KEY]`, so caches (report_cache.py) can drop exactly the
+scopes that changed once the transaction commits.
+
+Rebuild everything with:  python -m backend.read_model
+"""
+from typing import Iterable, Set
+
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from . import models
+
+CHUNK = 500  # Keep IN (...) lists under SQLite's bound-parameter limit
+TOUCHED_KEY = "equipment_read_touched"
+
+def _source_rows(conn, ids):
+    E = models.Equipment
+    Holder, Owner = aliased(models.User), aliased(models.User)
+    last_movement = select(
+        models.TransactionLog.equipment_id, func.max(models.TransactionLog.timestamp).label("at")
+    ).where(models.TransactionLog.equipment_id.in_(ids)).group_by(models.TransactionLog.equipment_id).subquery()
+    last_fault = select(
+        models.MaintenanceLog.equipment_id, func.max(models.MaintenanceLog.opened_at).label("at")
+    ).where(models.MaintenanceLog.equipment_id.in_(ids)).group_by(models.MaintenanceLog.equipment_id).subquery()
+
+    stmt = select(
+        E.id, E.serial_number, E.status, E.sensitivity, E.unit_hierarchy, E.unit_id,
+        E.holder_user_id, Holder.full_name.label("holder_name"),
+        E.owner_user_id, Owner.full_name.label("owner_name"),
+        E.custom_location, E.actual_location_id, models.Location.name.label("location_name"),
+        models.CatalogItem.name.label("item_name"), models.CatalogItem.category,
+        E.last_verified_at, E.version,
+        last_movement.c.at.label("last_movement_at"),
+        last_fault.c.at.label("last_fault_at")
+    ).select_from(E).outerjoin(
+        models.CatalogItem, E.catalog_item_id == models.CatalogItem.id
+    ).outerjoin(
+        Holder, E.holder_user_id == Holder.id
+    ).outerjoin(
+        Owner, E.owner_user_id == Owner.id
+    ).outerjoin(
+        models.Location, E.actual_location_id == models.Location.id
+    ).outerjoin(
+        last_movement, last_movement.c.equipment_id == E.id
+    ).outerjoin(
+        last_fault, last_fault.c.equipment_id == E.id
+    ).where(E.id.in_(ids))
+    return conn.execute(stmt)
+
+def _to_read_row(row) -> dict:
+    return {
+        "equipment_id": row.id,
+        "serial_number": row.serial_number,
+        "item_name": row.item_name or "Unknown",
+        "category": row.category,
+        "status": row.status,
+        "sensitivity": row.sensitivity,
+        "unit_hierarchy": row.unit_hierarchy,
+        "unit_id": row.unit_id,
+        "holder_user_id": row.holder_user_id,
+        "holder_name": row.holder_name,
+        "owner_user_id": row.owner_user_id,
+        "owner_name": row.owner_name,
+        "custom_location": row.custom_location,
+        "actual_location_id": row.actual_location_id,
+        "location_name": row.location_name,
+        "state_description": models.describe_state(
+            holder_user_id=row.holder_user_id,
+            holder_name=row.holder_name,
+            owner_user_id=row.owner_user_id,
+            owner_name=row.owner_name,
+            custom_location=row.custom_location,
+            actual_location_id=row.actual_location_id,
+            location_name=row.location_name
+        ),
+        "last_verified_at": row.last_verified_at,
+        "last_movement_at": row.last_movement_at,
+        "last_fault_at": row.last_fault_at,
+        "version": row.version,
+    }
+
+def _refresh_ids(session: Session, ids: Iterable[int]) -> int:
+    conn = session.connection()
+    table = models.EquipmentRead.__table__
+    touched = session.info.setdefault(TOUCHED_KEY, set())
+    ids = sorted(set(ids))
+    written = 0
+    for i in range(0, len(ids), CHUNK):
+        chunk = ids[i:i + CHUNK]
+        rows = [_to_read_row(r) for r in _source_rows(conn, chunk)]
+        touched.update(tuple(r) for r in conn.execute(
+            select(table.c.unit_hierarchy, table.c.holder_user_id).where(table.c.equipment_id.in_(chunk))
+        ))
+        touched.update((r["unit_hierarchy"], r["holder_user_id"]) for r in rows)
+        # Delete + insert: ids whose Equipment is gone simply aren't re-inserted
+        conn.execute(table.delete().where(table.c.equipment_id.in_(chunk)))
+        if rows:
+            conn.execute(table.insert(), rows)
+        written += len(rows)
+    return written
+
+def refresh(session: Session, equipment_ids: Iterable[int]) -> int:
+    """Rewrite the read rows for these equipment ids inside the session's transaction."""
+    return _refresh_ids(session, equipment_ids)
+
+def rebuild(session: Session) -> int:
+    """Drop and recompute every read row. Commits."""
+    conn = session.connection()
+    table = models.EquipmentRead.__table__
+    session.info.setdefault(TOUCHED_KEY, set()).update(
+        tuple(r) for r in conn.execute(select(table.c.unit_hierarchy, table.c.holder_user_id).distinct())
+    )
+    conn.execute(table.delete())
+    ids = [r[0] for r in conn.execute(select(models.Equipment.id))]
+    written = _refresh_ids(session, ids)
+    session.commit()
+    return written
+
+def ensure_populated(session: Session) -> int:
+    """Startup check: build the table if it is empty but equipment exists (first deploy)."""
+    has_read = session.query(models.EquipmentRead.equipment_id).first()
+    has_equipment = session.query(models.Equipment.id).first()
+    if has_read or not has_equipment:
+        return 0
+    return rebuild(session)
+
+# --- Flush hook ---
+def _renamed(obj, attr: str) -> bool:
+    return inspect(obj).attrs[attr].history.has_changes()
+
+def _affected_ids(session: Session) -> Set[int]:
+    ids: Set[int] = set()
+    users, locations, catalog_items = set(), set(), set()
+
+    for obj in session.new:
+        if isinstance(obj, models.Equipment):
+            ids.add(obj.id)
+        elif isinstance(obj, (models.TransactionLog, models.MaintenanceLog)) and obj.equipment_id:
+            ids.add(obj.equipment_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, models.Equipment) and session.is_modified(obj):
+            ids.add(obj.id)
+        elif isinstance(obj, models.User) and _renamed(obj, "full_name"):
+            users.add(obj.id)
+        elif isinstance(obj, models.Location) and _renamed(obj, "name"):
+            locations.add(obj.id)
+        elif isinstance(obj, models.CatalogItem) and _renamed(obj, "name"):
+            catalog_items.add(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, models.Equipment):
+            ids.add(obj.id)
+
+    if users or locations or catalog_items:
+        E = models.Equipment
+        clauses = []
+        if users:
+            clauses += [E.holder_user_id.in_(users), E.owner_user_id.in_(users)]
+        if locations:
+            clauses.append(E.actual_location_id.in_(locations))
+        if catalog_items:
+            clauses.append(E.catalog_item_id.in_(catalog_items))
+        ids.update(r[0] for r in session.connection().execute(select(E.id).where(or_(*clauses))))
+    return ids
+
+@event.listens_for(Session, "after_flush")
+def _sync_read_model(session: Session, flush_context):
+    ids = _affected_ids(session)
+    if ids:
+        _refresh_ids(session, ids)
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+    from . import changes  # noqa: F401  (register flush hooks before writing)
+
+    models.Base.metadata.create_all(bind=SessionLocal().get_bind())
+    with SessionLocal() as db:
+        print(f"equipment_read rebuilt: {rebuild(db)} rows")
@@ -0,0 +1,220 @@
+"""
+Inventory Reconciliation (count sessions)
+
+A count audits one Location (or free-text custom_location): open a session, stream the
+scanned serials into the count_scans staging table in chunks, then close it. Closing
+reconciles in SQL, inside the closing transaction, and stores the result as count_lines:
+- found / missing: items recorded at the place (actual_location_id, or custom_location equal
+  to its name) within the counter's scope that were / were not scanned
+- unexpected: scanned and visible to the counter, but recorded somewhere else
+- unknown: no item has that serial
+- out_of_scope: an item the counter may not see (where it is recorded is not revealed)
+
+`apply` then moves the unexpected items to the counted place, with one RECONCILE
+TransactionLog each. It writes through the ORM in chunks, so change_seq, the read model,
+optimistic versions and cache invalidation all see the moves like any other transfer.
+Apply may be called several times with subsets; `dismiss` marks lines that should not be
+applied. The session stays "closed" until every unexpected line is applied or dismissed,
+then becomes "applied".
+"""
+import json
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, exists, func, insert, literal, null, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from . import models
+from . import schemas
+from .dependencies import apply_equipment_scope
+
+OUTCOMES = ("found", "missing", "unexpected", "unknown", "out_of_scope")
+APPLY_CHUNK = 500
+
+def place_name(count: models.CountSession) -> str:
+    return count.location.name if count.location_id is not None else count.custom_location
+
+def _place_filter(count: models.CountSession):
+    E = models.Equipment
+    if count.location_id is not None:
+        return or_(E.actual_location_id == count.location_id, E.custom_location == count.location.name)
+    return E.custom_location == count.custom_location
+
+def to_response(count: models.CountSession) -> schemas.CountSessionResponse:
+    return schemas.CountSessionResponse(
+        session_id=count.id,
+        status=count.status,
+        location_id=count.location_id,
+        custom_location=count.custom_location,
+        place=place_name(count),
+        scan_count=count.scan_count or 0,
+        summary=json.loads(count.summary) if count.summary else None,
+        created_at=count.created_at,
+        closed_at=count.closed_at,
+        applied_at=count.applied_at,
+    )
+
+# --- Lifecycle ---
+def open_session(db: Session, user: models.User, req: schemas.CountSessionCreate) -> models.CountSession:
+    custom_location = (req.custom_location or "").strip() or None
+    if (req.location_id is None) == (custom_location is None):
+        raise HTTPException(status_code=400, detail="Provide either location_id or custom_location.")
+    if req.location_id is not None and not db.get(models.Location, req.location_id):
+        raise HTTPException(status_code=404, detail="Location not found")
+
+    count = models.CountSession(
+        id=uuid.uuid4().hex, user_id=user.id, location_id=req.location_id, custom_location=custom_location
+    )
+    db.add(count)
+    db.commit()
+    db.refresh(count)
+    return count
+
+def get_own(db: Session, session_id: str, user: models.User) -> models.CountSession:
+    count = db.get(models.CountSession, session_id)
+    if not count or count.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Count session not found")
+    return count
+
+def _advance(db: Session, count: models.CountSession, from_status: str, **values):
+    """
+    Conditional UPDATE on the session row; 409 if it is no longer in from_status.
+    On PostgreSQL the row lock it takes also orders scan uploads against close and apply.
+    """
+    S = models.CountSession
+    result = db.execute(update(S).where(S.id == count.id, S.status == from_status).values(**values))
+    if result.rowcount != 1:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Count session is {db.get(S, count.id).status}, expected {from_status}")
+
+def add_scans(db: Session, count: models.CountSession, serials: List[str]) -> int:
+    """Append one chunk of scans (repeats kept). Returns the number stored."""
+    serials = [s.strip() for s in serials if s and s.strip()]
+    _advance(db, count, "open", scan_count=models.CountSession.scan_count + len(serials))
+    if serials:
+        now = datetime.utcnow()
+        db.execute(insert(models.CountScan), [
+            {"session_id": count.id, "serial": serial, "scanned_at": now} for serial in serials
+        ])
+    db.commit()
+    return len(serials)
+
+def close(db: Session, count: models.CountSession, user: models.User) -> dict:
+    """Reconcile the scans against the database and store count_lines. Returns the summary."""
+    _advance(db, count, "open", status="closed", closed_at=datetime.utcnow())
+    E, R, S, L = models.Equipment, models.EquipmentRead, models.CountScan, models.CountLine
+
+    expected = apply_equipment_scope(
+        db.query(E.id.label("id"), E.serial_number.label("serial")).filter(_place_filter(count)), user
+    ).subquery("expected")
+    visible = apply_equipment_scope(db.query(E.id.label("id")), user).subquery("visible")
+    scanned = select(S.serial, func.count().label("scans")).where(
+        S.session_id == count.id
+    ).group_by(S.serial).subquery("scanned")
+
+    is_visible = visible.c.id.isnot(None)
+    elsewhere = and_(is_visible, expected.c.id.is_(None))
+    columns = ["session_id", "outcome", "serial", "equipment_id", "recorded_location", "scans"]
+
+    # Every distinct scanned serial, matched on the unique serial_number index
+    db.execute(insert(L).from_select(columns, select(
+        literal(count.id),
+        case(
+            (expected.c.id.isnot(None), "found"),
+            (E.id.is_(None), "unknown"),
+            (is_visible, "unexpected"),
+            else_="out_of_scope",
+        ),
+        scanned.c.serial,
+        case((is_visible, E.id)),
+        case((elsewhere, R.state_description)),
+        scanned.c.scans,
+    ).select_from(scanned)
+        .outerjoin(E, E.serial_number == scanned.c.serial)
+        .outerjoin(expected, expected.c.id == E.id)
+        .outerjoin(visible, visible.c.id == E.id)
+        .outerjoin(R, R.equipment_id == E.id)
+    ))
+
+    # Expected items nobody scanned (including any without a serial number)
+    db.execute(insert(L).from_select(columns, select(
+        literal(count.id), literal("missing"), expected.c.serial, expected.c.id, null(), literal(0)
+    ).where(~exists().where(S.session_id == count.id, S.serial == expected.c.serial))))
+
+    counts = dict(db.query(L.outcome, func.count()).filter(L.session_id == count.id).group_by(L.outcome).all())
+    summary = {outcome: counts.get(outcome, 0) for outcome in OUTCOMES}
+    summary["expected"] = summary["found"] + summary["missing"]
+    db.execute(update(models.CountSession).where(models.CountSession.id == count.id).values(summary=json.dumps(summary)))
+    db.commit()
+    return summary
+
+def _pending(db: Session, count: models.CountSession, equipment_ids: Optional[List[int]] = None):
+    """Unexpected lines neither applied nor dismissed (all, or only equipment_ids)."""
+    L = models.CountLine
+    query = db.query(L).filter(
+        L.session_id == count.id, L.outcome == "unexpected", L.applied.isnot(True), L.dismissed.isnot(True)
+    )
+    if equipment_ids is not None:
+        query = query.filter(L.equipment_id.in_(set(equipment_ids)))
+    return query
+
+def _finish_if_done(db: Session, count: models.CountSession):
+    if not db.query(_pending(db, count).exists()).scalar():
+        db.execute(update(models.CountSession).where(models.CountSession.id == count.id).values(status="applied"))
+
+def dismiss(db: Session, count: models.CountSession, equipment_ids: Optional[List[int]] = None) -> dict:
+    """Mark unexpected lines (all pending, or only equipment_ids) as not to be applied."""
+    _advance(db, count, "closed", status="closed")  # Status check + row lock only
+    dismissed = _pending(db, count, equipment_ids).update({models.CountLine.dismissed: True}, synchronize_session=False)
+    _finish_if_done(db, count)
+    db.commit()
+    return {"dismissed": dismissed}
+
+def apply(db: Session, count: models.CountSession, user: models.User, equipment_ids: Optional[List[int]] = None) -> dict:
+    """
+    Move the pending unexpected items (all, or only equipment_ids) to the counted place.
+    Items that left the caller's scope since the close are skipped and stay pending.
+    """
+    now = datetime.utcnow()
+    _advance(db, count, "closed", applied_at=now)
+    L, E = models.CountLine, models.Equipment
+    place = place_name(count)
+
+    lines = _pending(db, count, equipment_ids).order_by(L.id).all()
+
+    moved = 0
+    try:
+        for i in range(0, len(lines), APPLY_CHUNK):
+            chunk = lines[i:i + APPLY_CHUNK]
+            items = {item.id: item for item in apply_equipment_scope(
+                db.query(E).filter(E.id.in_([line.equipment_id for line in chunk])), user
+            )}
+            for line in chunk:
+                item = items.get(line.equipment_id)
+                if not item:
+                    continue
+                item.holder_user_id = None
+                item.custom_location = place
+                item.actual_location_id = count.location_id
+                item.last_verified_at = now  # Seen during the count
+                db.add(models.TransactionLog(
+                    equipment_id=item.id,
+                    involved_user_id=user.id,
+                    involved_location_id=count.location_id,
+                    event_type="RECONCILE",
+                    user_status_at_time=user.is_active_duty,
+                    location=place,
+                    timestamp=now,
+                ))
+                line.applied = True
+                moved += 1
+            db.flush()
+        _finish_if_done(db, count)
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Equipment changed while applying; apply again")
+    return {"moved": moved, "skipped": len(lines) - moved}
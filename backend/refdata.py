@@ -0,0 +1,91 @@
+"""
+Reference-Data Cache
+Small, rarely changing tables (catalog items, fault types, profiles) served from memory.
+
+Every write to those tables calls `bump()` after commit. That drops this worker's copy
+and tells the other workers over the invalidation bus (bus.py), so each reloads on its
+next lookup. The version is a hash of the loaded content, so every worker reports the
+same version for the same data without sharing any state.
+"""
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .bus import bus
+
+CHANNEL = "refdata"
+
+class RefDataCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._loaded_generation: Optional[int] = None
+        self._version = "0"
+        self._catalog_ids: Dict[str, int] = {}
+        self._fault_types: Dict[str, dict] = {}
+        self._profiles: Dict[str, dict] = {}
+
+    # --- Versioning ---
+    def version(self, db: Session) -> str:
+        self._ensure_loaded(db)
+        return self._version
+
+    def invalidate(self, payload: Optional[str] = None):
+        with self._lock:
+            self._generation += 1
+
+    def bump(self):
+        """Call after committing a write to catalog items, fault types or profiles."""
+        self.invalidate()
+        bus.publish(CHANNEL)
+
+    def _ensure_loaded(self, db: Session):
+        if self._generation == self._loaded_generation:
+            return
+        with self._lock:
+            current = self._generation
+            if current == self._loaded_generation:
+                return
+            self._catalog_ids = {c.name: c.id for c in db.query(models.CatalogItem.id, models.CatalogItem.name)}
+            self._fault_types = {
+                f.name: {"id": f.id, "name": f.name, "is_pending": f.is_pending}
+                for f in db.query(models.FaultType).order_by(models.FaultType.id)
+            }
+            self._profiles = {
+                p.name: {"id": p.id, "name": p.name, "name_he": p.name_he}
+                for p in db.query(models.Profile).order_by(models.Profile.id)
+            }
+            self._version = hashlib.sha256(json.dumps(
+                [self._catalog_ids, list(self._fault_types.values()), list(self._profiles.values())],
+                sort_keys=True, ensure_ascii=False
+            ).encode()).hexdigest()[:16]
+            self._loaded_generation = current
+
+    # --- Lookups ---
+    def catalog_id(self, db: Session, name: str) -> Optional[int]:
+        self._ensure_loaded(db)
+        return self._catalog_ids.get(name)
+
+    def fault_types(self, db: Session) -> List[dict]:
+        self._ensure_loaded(db)
+        return list(self._fault_types.values())
+
+    def fault_type_by_name(self, db: Session, name: str) -> Optional[dict]:
+        self._ensure_loaded(db)
+        return self._fault_types.get(name)
+
+    def profiles(self, db: Session) -> List[dict]:
+        self._ensure_loaded(db)
+        return list(self._profiles.values())
+
+    def profile_id(self, db: Session, name: str) -> Optional[int]:
+        self._ensure_loaded(db)
+        profile = self._profiles.get(name)
+        return profile["id"] if profile else None
+
+cache = RefDataCache()
+bus.subscribe(CHANNEL, cache.invalidate)
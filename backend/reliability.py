@@ -0,0 +1,148 @@
+"""
+Maintenance Reliability Analytics (MTTR / MTBF / fault heatmaps)
+
+Each closed ticket is folded into ReliabilityStat exactly once:
+- repair time   = closed_at - opened_at                    -> MTTR
+- failure gap   = opened_at - previous ticket's opened_at  -> MTBF (LAG window over the same item)
+Only items with newly closed tickets are scanned, so a refresh costs O(new tickets), not O(history).
+
+fix_equipment folds the tickets it closes in its own request transaction, and startup folds
+anything closed some other way (seeds, raw SQL). The analytics GETs only read.
+
+Unit cells are kept per unit_id (the item's unit when the ticket closed), not per path
+prefix. `unit_rollup` sums them per subtree through unit_closure, so units.move() is
+reflected at once and nothing has to be rebuilt.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func, DateTime
+from sqlalchemy.orm import Session
+
+from . import models
+
+def _bump(db: Session, dimension: str, key: str, repair_seconds: float,
+          gap_seconds: Optional[float], secondary_key: str = "", unit_id: Optional[int] = None):
+    """Add one repair to the cell, creating it if needed. A single upsert, so concurrent closes neither lose updates nor duplicate the row."""
+    S = models.ReliabilityStat
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(S).values(
+        dimension=dimension, key=key, secondary_key=secondary_key, unit_id=unit_id,
+        repairs=1, repair_seconds=repair_seconds,
+        failure_gaps=0 if gap_seconds is None else 1,
+        failure_gap_seconds=gap_seconds or 0.0,
+        updated_at=datetime.utcnow()
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[S.dimension, S.key, S.secondary_key],
+        set_={
+            "repairs": S.repairs + stmt.excluded.repairs,
+            "repair_seconds": S.repair_seconds + stmt.excluded.repair_seconds,
+            "failure_gaps": S.failure_gaps + stmt.excluded.failure_gaps,
+            "failure_gap_seconds": S.failure_gap_seconds + stmt.excluded.failure_gap_seconds,
+            "updated_at": stmt.excluded.updated_at,
+        }
+    ))
+
+def refresh(db: Session) -> int:
+    """Fold tickets closed since the last refresh into the cache. Returns the number folded. Caller commits."""
+    ml = models.MaintenanceLog
+    pending_items = db.query(ml.equipment_id).filter(
+        ml.closed_at.isnot(None), ml.repair_seconds.is_(None)
+    ).distinct()
+
+    lagged = db.query(
+        ml.id.label("id"),
+        ml.opened_at.label("opened_at"),
+        ml.closed_at.label("closed_at"),
+        ml.repair_seconds.label("repair_seconds"),
+        ml.equipment_id.label("equipment_id"),
+        ml.fault_type_id.label("fault_type_id"),
+        func.lag(ml.opened_at, type_=DateTime).over(partition_by=ml.equipment_id, order_by=(ml.opened_at, ml.id)).label("prev_opened_at")
+    ).filter(ml.equipment_id.in_(pending_items)).subquery()
+
+    rows = db.query(
+        lagged.c.id,
+        lagged.c.opened_at,
+        lagged.c.closed_at,
+        lagged.c.prev_opened_at,
+        models.Equipment.unit_id,
+        models.CatalogItem.name.label("catalog_name"),
+        models.FaultType.name.label("fault_name")
+    ).join(models.Equipment, lagged.c.equipment_id == models.Equipment.id).outerjoin(
+        models.CatalogItem, models.Equipment.catalog_item_id == models.CatalogItem.id
+    ).outerjoin(
+        models.FaultType, lagged.c.fault_type_id == models.FaultType.id
+    ).filter(lagged.c.closed_at.isnot(None), lagged.c.repair_seconds.is_(None)).all()
+
+    folded = 0
+    for row in rows:
+        repair = max((row.closed_at - row.opened_at).total_seconds(), 0.0) if row.opened_at else 0.0
+        gap = (row.opened_at - row.prev_opened_at).total_seconds() if row.prev_opened_at and row.opened_at else None
+
+        # Claim the ticket; a concurrent refresh that got here first wins and we skip it
+        claimed = db.query(ml).filter(ml.id == row.id, ml.repair_seconds.is_(None)).update(
+            {"repair_seconds": repair, "failure_gap_seconds": gap}, synchronize_session=False
+        )
+        if not claimed:
+            continue
+
+        catalog_name = row.catalog_name or "Unknown"
+        fault_name = row.fault_name or "Unknown"
+        _bump(db, "catalog", catalog_name, repair, gap)
+        _bump(db, "fault_type", fault_name, repair, gap)
+        _bump(db, "heatmap", fault_name, repair, gap, secondary_key=catalog_name)
+        if row.unit_id is not None:
+            _bump(db, "unit", str(row.unit_id), repair, gap, unit_id=row.unit_id)
+        folded += 1
+
+    return folded
+
+def rebuild(db: Session) -> int:
+    """Drop the cache and refold every closed ticket. Caller commits."""
+    db.query(models.ReliabilityStat).delete(synchronize_session=False)
+    db.query(models.MaintenanceLog).update(
+        {"repair_seconds": None, "failure_gap_seconds": None}, synchronize_session=False
+    )
+    db.flush()
+    return refresh(db)
+
+def ensure_unit_ids(db: Session) -> int:
+    """Startup: rebuild once if unit cells are still keyed by path (before unit ids). Caller commits."""
+    S = models.ReliabilityStat
+    if not db.query(S.id).filter(S.dimension == "unit", S.unit_id.is_(None)).first():
+        return 0
+    return rebuild(db)
+
+def unit_rollup(db: Session, within=None) -> List[dict]:
+    """
+    summarize() rows per unit subtree (key = unit path), summing the per-unit cells through
+    unit_closure. `within`: a SELECT of unit ids to report on (None = every unit).
+    """
+    S, C, U = models.ReliabilityStat, models.UnitClosure, models.Unit
+    q = db.query(
+        U.path.label("key"),
+        func.sum(S.repairs).label("repairs"),
+        func.sum(S.repair_seconds).label("repair_seconds"),
+        func.sum(S.failure_gaps).label("failure_gaps"),
+        func.sum(S.failure_gap_seconds).label("failure_gap_seconds"),
+    ).select_from(S).join(C, C.descendant_id == S.unit_id).join(U, U.id == C.ancestor_id).filter(S.dimension == "unit")
+    if within is not None:
+        q = q.filter(C.ancestor_id.in_(within))
+    return [summarize(row) for row in q.group_by(U.path).order_by(U.path).all()]
+
+def _hours(total_seconds: float, count: int) -> Optional[float]:
+    return round(total_seconds / count / 3600, 2) if count else None
+
+def summarize(stat) -> dict:
+    """A ReliabilityStat, or any row with the same sum columns."""
+    return {
+        "key": stat.key,
+        "repairs": stat.repairs,
+        "mttr_hours": _hours(stat.repair_seconds, stat.repairs),
+        "failure_intervals": stat.failure_gaps,
+        "mtbf_hours": _hours(stat.failure_gap_seconds, stat.failure_gaps)
+    }
@@ -0,0 +1,191 @@
+"""
+Inventory Report Cache
+
+Caches `/reports/query` results per (caller scope, normalized filters): everyone in the
+same company running the same filters shares one entry. LRU, bounded by entry count
+(REPORT_CACHE_MAX_ENTRIES) and estimated size (REPORT_CACHE_MAX_MB).
+
+Invalidation is per subtree. read_model.py records the (unit_hierarchy, holder_user_id)
+of every equipment_read row it rewrites; after the transaction commits, only the entries
+whose scope covers one of those paths/holders are dropped, so other units stay warm.
+An entry also expires when the first of its rows would move to the next compliance band
+(GOOD -> WARNING at 24h, WARNING -> SEVERE at 48h), since `reporting_status` is relative
+to now, and in any case after REPORT_CACHE_TTL_SECONDS.
+
+Limits are per worker process. Committed invalidations are also sent to the other
+workers over the invalidation bus (bus.py) and applied there the same way.
+"""
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .bus import bus
+from .dependencies import get_visibility_scope
+from . import models
+from . import read_model
+from . import units
+
+MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256"))
+MAX_BYTES = int(float(os.getenv("REPORT_CACHE_MAX_MB", "64")) * 1024 * 1024)
+TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "300"))
+RECENT_INVALIDATIONS = 256  # Kept to reject results computed across an invalidation
+CHANNEL = "report_cache"
+
+# ("all",) | ("unit", unit_id, unit_path) | ("holder", user_id)
+CacheScope = Tuple
+
+def compile_scope(user: models.User) -> CacheScope:
+    kind, value = get_visibility_scope(user)
+    if kind == "all":
+        return ("all",)
+    if kind == "unit":
+        return ("unit", value.id, value.path)
+    return ("holder", value)
+
+def normalize_filters(equipment_type, location, status, holder_name) -> tuple:
+    """Substring filters are ILIKE, so case and surrounding spaces don't change the result."""
+    def loose(value):
+        value = (value or "").strip().lower()
+        return value or None
+    return (loose(equipment_type), loose(location), (status or "").strip() or None, loose(holder_name))
+
+def covers(scope: CacheScope, touched: Optional[Iterable[Tuple[Optional[str], Optional[int]]]]) -> bool:
+    """touched=None means "anything may have changed"."""
+    if touched is None or scope[0] == "all":
+        return True
+    if scope[0] == "unit":
+        return any(units.path_within(units.normalize(path), scope[2]) for path, _ in touched)
+    return any(holder == scope[1] for _, holder in touched)
+
+def status_expiry(rows: List[dict], now: datetime) -> datetime:
+    """When the first row's reporting_status changes (ISO strings compare like datetimes)."""
+    expiry = now + timedelta(seconds=TTL_SECONDS)
+    for band in (timedelta(hours=24), timedelta(hours=48)):
+        cutoff = (now - band).isoformat()
+        pending = [r["last_verified_at"] for r in rows if r["last_verified_at"] and r["last_verified_at"] > cutoff]
+        if pending:
+            expiry = min(expiry, datetime.fromisoformat(min(pending)) + band)
+    return expiry
+
+def _estimate_bytes(rows: List[dict]) -> int:
+    return sys.getsizeof(rows) + sum(
+        sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r.values()) for r in rows
+    )
+
+class _Entry:
+    __slots__ = ("scope", "rows", "expires_at", "size")
+
+    def __init__(self, scope: CacheScope, rows: List[dict], expires_at: datetime, size: int):
+        self.scope = scope
+        self.rows = rows
+        self.expires_at = expires_at
+        self.size = size
+
+class ReportCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self._recent = deque(maxlen=RECENT_INVALIDATIONS)  # (generation, touched)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidated = 0
+
+    # --- Lookups ---
+    def get_or_compute(self, user: models.User, filters: tuple, compute: Callable[[], List[dict]]) -> List[dict]:
+        scope = compile_scope(user)
+        key = (scope, filters)
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.rows
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            started = self._generation
+
+        rows = compute()
+        self._store(key, scope, rows, status_expiry(rows, now), started)
+        return rows
+
+    def _store(self, key: tuple, scope: CacheScope, rows: List[dict], expires_at: datetime, started: int):
+        size = _estimate_bytes(rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # A write to this scope committed while we were querying: the result may predate it
+            if self._recent and started < self._recent[0][0] - 1:
+                return
+            if any(gen > started and covers(scope, touched) for gen, touched in self._recent):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(scope, rows, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: tuple):
+        self._bytes -= self._entries.pop(key).size
+
+    # --- Invalidation ---
+    def invalidate(self, touched: Optional[set]) -> int:
+        """Drop the entries whose scope covers any (unit_hierarchy, holder_user_id) pair; None drops all."""
+        if touched is not None and not touched:
+            return 0
+        with self._lock:
+            self._generation += 1
+            self._recent.append((self._generation, None if touched is None else frozenset(touched)))
+            stale = [key for key, entry in self._entries.items() if covers(entry.scope, touched)]
+            for key in stale:
+                self._drop(key)
+            self.invalidated += len(stale)
+            return len(stale)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidated": self.invalidated,
+            }
+
+cache = ReportCache()
+
+# --- Transaction hooks ---
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    touched = session.info.pop(read_model.TOUCHED_KEY, None)
+    if touched:
+        cache.invalidate(touched)
+        bus.publish(CHANNEL, json.dumps(sorted(touched, key=str), ensure_ascii=False))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(read_model.TOUCHED_KEY, None)
+
+def _invalidate_remote(payload: Optional[str]):
+    cache.invalidate(None if payload is None else {tuple(pair) for pair in json.loads(payload)})
+
+bus.subscribe(CHANNEL, _invalidate_remote)
@@ -0,0 +1,206 @@
+"""
+Asynchronous Report Jobs
+
+Large inventory/movement reports run on a small local thread pool (REPORT_WORKERS, default 2)
+instead of inside the HTTP request, so API workers return immediately with a job id.
+
+Results are written as gzip JSON artifacts in REPORT_ARTIFACT_DIR, named by a cache key of
+(report type, caller scope, resolved parameters, data version). A job whose key already has
+an artifact is done at submission without touching the report queries. Data versions:
+- inventory: the global change_seq (changes.py), bumped by every equipment/ticket write, plus
+  the current REPORT_JOB_BUCKET_SECONDS bucket (default 60): `reporting_status` moves with the
+  clock and user/location renames reach equipment_read without an equipment write, so neither
+  bumps change_seq; a cached inventory artifact is therefore at most one bucket stale
+- daily_movement: count + max id of the transaction_logs in the window. A defaulted `end` is
+  floored to the bucket, so repeated "last 24h" requests within a bucket share one artifact
+Artifacts older than REPORT_ARTIFACT_TTL_HOURS (default 24) are pruned after each run.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .dependencies import get_visibility_scope
+from . import models
+from . import schemas
+from . import changes
+
+ARTIFACT_DIR = os.getenv(
+    "REPORT_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "military_logistics_reports")
+)
+WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+ARTIFACT_TTL_SECONDS = float(os.getenv("REPORT_ARTIFACT_TTL_HOURS", "24")) * 3600
+BUCKET_SECONDS = max(1, int(os.getenv("REPORT_JOB_BUCKET_SECONDS", "60")))
+
+INVENTORY_PARAMS = ("equipment_type", "location", "status", "holder_name")
+
+_EPOCH = datetime(1970, 1, 1)
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="report-job")
+    return _executor
+
+def shutdown():
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+
+# --- Keys & Artifacts ---
+def scope_key(user: models.User) -> str:
+    kind, value = get_visibility_scope(user)
+    if kind == "all":
+        return "all"
+    return f"{kind}:{value.id if kind == 'unit' else value}"
+
+def _bucket(now: Optional[datetime] = None) -> datetime:
+    seconds = int(((now or datetime.utcnow()) - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=seconds - seconds % BUCKET_SECONDS)
+
+def resolve_params(req: schemas.ReportJobCreate) -> dict:
+    """Only the fields that apply to the report type, with defaults frozen (so equal requests hash equal)."""
+    if req.report_type == "inventory":
+        return {name: getattr(req, name) for name in INVENTORY_PARAMS}
+    from .routers.reports import movement_window
+    start, end = movement_window(req.start, req.end or _bucket())
+    return {"start": start.isoformat(), "end": end.isoformat(), "event_type": req.event_type, "aggregate": req.aggregate}
+
+def data_version(db: Session, report_type: str, params: dict) -> str:
+    if report_type == "inventory":
+        return f"seq:{changes.current_seq(db)}:t:{_bucket().isoformat()}"
+    count, max_id = db.query(func.count(models.TransactionLog.id), func.max(models.TransactionLog.id)).filter(
+        models.TransactionLog.timestamp >= datetime.fromisoformat(params["start"]),
+        models.TransactionLog.timestamp < datetime.fromisoformat(params["end"])
+    ).one()
+    return f"logs:{count}:{max_id or 0}"
+
+def cache_key(report_type: str, scope: str, params: dict, version: str) -> str:
+    raw = json.dumps([report_type, scope, params, version], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def artifact_path(key: str) -> str:
+    return os.path.join(ARTIFACT_DIR, f"{key}.json.gz")
+
+def _write_artifact(key: str, payload) -> None:
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    path = artifact_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)  # Readers never see a partial file
+
+def prune_artifacts(now: Optional[float] = None) -> int:
+    now = now or time.time()
+    removed = 0
+    try:
+        names = os.listdir(ARTIFACT_DIR)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(ARTIFACT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > ARTIFACT_TTL_SECONDS:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+# --- Submit & Run ---
+def submit(db: Session, user: models.User, req: schemas.ReportJobCreate) -> models.ReportJob:
+    params = resolve_params(req)
+    key = cache_key(req.report_type, scope_key(user), params, data_version(db, req.report_type, params))
+    job = models.ReportJob(
+        id=uuid.uuid4().hex, user_id=user.id, report_type=req.report_type,
+        params=json.dumps(params, sort_keys=True), cache_key=key
+    )
+
+    if os.path.exists(artifact_path(key)):
+        job.status = "done"
+        job.cached = True
+        job.row_count = _known_row_count(db, key)
+        job.finished_at = datetime.utcnow()
+        db.add(job)
+        db.commit()
+        return job
+
+    db.add(job)
+    db.commit()
+    _pool().submit(run, job.id)
+    return job
+
+def _known_row_count(db: Session, key: str) -> Optional[int]:
+    previous = db.query(models.ReportJob.row_count).filter(
+        models.ReportJob.cache_key == key, models.ReportJob.row_count.isnot(None)
+    ).first()
+    return previous.row_count if previous else None
+
+def _build(db: Session, user: models.User, report_type: str, params: dict):
+    """Returns (payload, row_count)."""
+    from .routers import reports  # Report builders live with their endpoints
+
+    if report_type == "inventory":
+        rows = reports.inventory_rows(db, user, **params)
+        return rows, len(rows)
+
+    start, end = datetime.fromisoformat(params["start"]), datetime.fromisoformat(params["end"])
+    if params["aggregate"]:
+        histogram = reports.movement_histogram(db, user, start, end, params["event_type"], params["aggregate"])
+        return histogram, len(histogram["buckets"])
+    items, _ = reports.movement_events(db, user, start, end, params["event_type"])
+    return {"start": params["start"], "end": params["end"], "items": items}, len(items)
+
+def run(job_id: str):
+    db = SessionLocal()
+    try:
+        job = db.query(models.ReportJob).filter(models.ReportJob.id == job_id).first()
+        if not job:
+            return
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        db.commit()
+
+        try:
+            if os.path.exists(artifact_path(job.cache_key)):
+                # An identical job finished while this one was queued
+                job.cached = True
+                job.row_count = _known_row_count(db, job.cache_key)
+            else:
+                user = db.query(models.User).filter(models.User.id == job.user_id).first()
+                payload, job.row_count = _build(db, user, job.report_type, json.loads(job.params))
+                _write_artifact(job.cache_key, payload)
+            job.status = "done"
+        except Exception as e:
+            db.rollback()
+            print(f"Report job {job_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        prune_artifacts()
+    finally:
+        db.close()
+
+def to_response(job: models.ReportJob) -> schemas.ReportJobResponse:
+    return schemas.ReportJobResponse(
+        job_id=job.id,
+        report_type=job.report_type,
+        status=job.status,
+        cached=bool(job.cached),
+        row_count=job.row_count,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        download_url=f"/reports/jobs/{job.id}/download" if job.status == "done" else None
+    )
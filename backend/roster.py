@@ -0,0 +1,247 @@
+"""
+Roster Import (bulk user onboarding)
+
+POST /users/import takes a whole battalion's roster as CSV (with a header row) or NDJSON,
+one user per row:
+
+    personal_number, full_name, password, unit_hierarchy, profile, role, battalion, company, is_active_duty
+
+Only personal_number and full_name are required, plus password for users that don't exist
+yet. Empty cells mean "not given".
+
+- Profile names are resolved once per import (refdata cache). New users without one get "Soldier".
+- Passwords are hashed in a process pool (ROSTER_HASH_WORKERS, default: all cores). bcrypt is
+  slow by design and holds the GIL, so threads would not help.
+- Each unit path is resolved once (units.resolve). Users are then written with bulk INSERT /
+  UPDATE statements of ROSTER_BATCH rows, all in one transaction.
+- With upsert=true, rows whose personal_number already exists update that user (e.g. a transfer
+  to another unit). Only the columns present in the row change. Without upsert such rows are errors.
+
+Rows that fail validation are skipped and reported with their row number. The rest are
+imported. Bulk statements bypass the ORM flush hooks, so the typeahead index is refreshed
+here and the other workers are told over the bus, the read rows of equipment held or owned
+by renamed users are rewritten (read_model.refresh, which also drops the report_cache
+entries covering them), and in-flight single-flight computations are retired on commit.
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from . import read_model
+from . import security
+from . import single_flight
+from . import units
+from . import user_index
+from .bus import bus
+from .refdata import cache as refdata
+
+HASH_WORKERS = int(os.getenv("ROSTER_HASH_WORKERS", str(os.cpu_count() or 1)))
+BATCH = int(os.getenv("ROSTER_BATCH", "500"))
+MAX_ROWS = int(os.getenv("ROSTER_MAX_ROWS", "20000"))
+
+FIELDS = ("personal_number", "full_name", "password", "unit_hierarchy", "profile", "role",
+          "battalion", "company", "is_active_duty")
+ROLES = (models.UserRole.MASTER, models.UserRole.MANAGER, models.UserRole.TECHNICIAN_MANAGER,
+         models.UserRole.TECHNICIAN, models.UserRole.USER)
+DEFAULT_PROFILE = "Soldier"
+BOOLEANS = {"true": True, "1": True, "yes": True, "false": False, "0": False, "no": False}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the server process has running threads (bus, sweeper, writers)
+        _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def shutdown():
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    if len(passwords) < 2 or HASH_WORKERS < 2:
+        return [security.get_password_hash(p) for p in passwords]
+    chunk = max(1, len(passwords) // (HASH_WORKERS * 4))
+    return list(_pool().map(security.get_password_hash, passwords, chunksize=chunk))
+
+# --- Parsing ---
+def parse(content: bytes, fmt: str) -> List[Tuple[int, object]]:
+    """(row number, raw row) pairs; a raw row is a dict, or an error string for an unreadable NDJSON line."""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Roster must be UTF-8")
+
+    rows: List[Tuple[int, object]] = []
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        unknown = [c for c in (reader.fieldnames or []) if c and c.strip() not in FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+        for raw in reader:
+            rows.append((reader.line_num, {(k or "").strip(): v for k, v in raw.items()}))
+    else:
+        for line_num, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+            except ValueError:
+                rows.append((line_num, "Invalid JSON"))
+                continue
+            rows.append((line_num, raw if isinstance(raw, dict) else "Each line must be a JSON object"))
+    if len(rows) > MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ROWS} rows per import")
+    return rows
+
+def _clean(raw: dict) -> Tuple[Optional[dict], Optional[str]]:
+    unknown = [k for k in raw if k not in FIELDS]
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}"
+    values = {k: str(v).strip() for k, v in raw.items() if v is not None and str(v).strip() != ""}
+    missing = [f for f in ("personal_number", "full_name") if f not in values]
+    if missing:
+        return None, f"Missing {', '.join(missing)}"
+    if "role" in values and values["role"] not in ROLES:
+        return None, f"Unknown role {values['role']!r}"
+    if "is_active_duty" in values:
+        flag = BOOLEANS.get(values["is_active_duty"].lower())
+        if flag is None:
+            return None, f"is_active_duty must be true/false, got {values['is_active_duty']!r}"
+        values["is_active_duty"] = flag
+    if "unit_hierarchy" in values:
+        values["unit_hierarchy"] = units.normalize(values["unit_hierarchy"])
+    return values, None
+
+# --- Import ---
+def import_roster(db: Session, content: bytes, fmt: str, upsert: bool) -> dict:
+    U = models.User
+    errors: List[dict] = []
+
+    def reject(row_num: int, values: Optional[dict], message: str):
+        personal_number = (values or {}).get("personal_number")
+        errors.append({
+            "row": row_num,
+            "personal_number": None if personal_number is None else str(personal_number),
+            "error": message,
+        })
+
+    # 1. Validate each row on its own
+    valid: List[Tuple[int, dict]] = []
+    seen = set()
+    for row_num, raw in parse(content, fmt):
+        if isinstance(raw, str):
+            reject(row_num, None, raw)
+            continue
+        values, error = _clean(raw)
+        if error:
+            reject(row_num, raw, error)
+        elif values["personal_number"] in seen:
+            reject(row_num, values, "Duplicate personal_number in this roster")
+        else:
+            seen.add(values["personal_number"])
+            valid.append((row_num, values))
+
+    # 2. Against the database: profiles (once per name) and existing users
+    profile_ids: Dict[str, Optional[int]] = {
+        name: refdata.profile_id(db, name)
+        for name in {v["profile"] for _, v in valid if "profile" in v} | {DEFAULT_PROFILE}
+    }
+    numbers = [v["personal_number"] for _, v in valid]
+    existing: Dict[str, int] = {}
+    names: Dict[int, str] = {}  # Current full_name of existing users, to spot renames
+    for i in range(0, len(numbers), BATCH):
+        for number, user_id, full_name in db.execute(
+            select(U.personal_number, U.id, U.full_name).where(U.personal_number.in_(numbers[i:i + BATCH]))
+        ):
+            existing[number] = user_id
+            names[user_id] = full_name
+
+    accepted: List[Tuple[int, dict]] = []
+    for row_num, values in valid:
+        is_new = values["personal_number"] not in existing
+        if "profile" in values and profile_ids[values["profile"]] is None:
+            reject(row_num, values, f"Unknown profile {values['profile']!r}")
+        elif not is_new and not upsert:
+            reject(row_num, values, "User already exists (use upsert=true to update)")
+        elif is_new and "password" not in values:
+            reject(row_num, values, "password is required for new users")
+        else:
+            accepted.append((row_num, values))
+
+    # 3. Hash all passwords at once, across cores
+    with_password = [values for _, values in accepted if "password" in values]
+    for values, hashed in zip(with_password, hash_passwords([v["password"] for v in with_password])):
+        values["password_hash"] = hashed
+
+    # 4. Resolve each unit path once (creating missing units, as the flush hook would)
+    conn = db.connection()
+    unit_ids = {path: units.resolve(conn, path) for path in {v["unit_hierarchy"] for _, v in accepted if "unit_hierarchy" in v}}
+
+    inserts, updates = [], []
+    for _, values in accepted:
+        user_id = existing.get(values["personal_number"])
+        if user_id is None:
+            inserts.append({
+                "personal_number": values["personal_number"],
+                "full_name": values["full_name"],
+                "password_hash": values["password_hash"],
+                "role": values.get("role", models.UserRole.USER),
+                "profile_id": profile_ids[values.get("profile", DEFAULT_PROFILE)],
+                "battalion": values.get("battalion"),
+                "company": values.get("company"),
+                "unit_hierarchy": values.get("unit_hierarchy"),
+                "unit_id": unit_ids.get(values.get("unit_hierarchy")),
+                "is_active_duty": values.get("is_active_duty", True),
+            })
+            continue
+        changes = {"id": user_id, "full_name": values["full_name"]}
+        for field in ("password_hash", "role", "battalion", "company", "is_active_duty"):
+            if field in values:
+                changes[field] = values[field]
+        if "profile" in values:
+            changes["profile_id"] = profile_ids[values["profile"]]
+        if "unit_hierarchy" in values:
+            changes["unit_hierarchy"] = values["unit_hierarchy"]
+            changes["unit_id"] = unit_ids[values["unit_hierarchy"]]
+        updates.append(changes)
+
+    # 5. Bulk writes in batches, one transaction
+    changed_ids = [u["id"] for u in updates]
+    renamed = [u["id"] for u in updates if u["full_name"] != names.get(u["id"])]
+    try:
+        for i in range(0, len(inserts), BATCH):
+            changed_ids.extend(db.scalars(insert(U).returning(U.id), inserts[i:i + BATCH]))
+        for i in range(0, len(updates), BATCH):
+            db.execute(update(U), updates[i:i + BATCH])
+        if renamed:  # holder_name / owner_name in equipment_read (records the touched scopes for report_cache)
+            E = models.Equipment
+            held = set()
+            for i in range(0, len(renamed), BATCH):
+                chunk = renamed[i:i + BATCH]
+                held.update(db.scalars(select(E.id).where(E.holder_user_id.in_(chunk) | E.owner_user_id.in_(chunk))))
+            read_model.refresh(db, held)
+        if changed_ids:
+            db.info[single_flight.WROTE_KEY] = True  # No flush ran: bump in-flight computations on commit
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Users were added while importing; run the import again")
+
+    if changed_ids:
+        user_index.index.mark_changed(changed_ids)
+        bus.publish(user_index.CHANNEL, json.dumps(sorted(changed_ids)))
+
+    errors.sort(key=lambda e: e["row"])
+    return {"created": len(inserts), "updated": len(updates), "failed": len(errors), "errors": errors}
@@ -1,10 +1,15 @@
-"""Analytics Router - Unit readiness endpoint"""
-from fastapi import APIRouter, Depends
+"""Analytics Router - Unit readiness and maintenance reliability endpoints"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from typing import Optional
 
 from ..database import get_db
-from ..dependencies import get_current_active_user
+from ..dependencies import get_current_active_user, get_visibility_scope, verify_admin_access
 from .. import models
+from .. import reliability
+from .. import units
+from ..single_flight import flights, request_key
 
 router = APIRouter(tags=["analytics"])
 
@@ -13,13 +18,79 @@ def get_unit_readiness(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    total = db.query(models.Equipment).count()
-    functional = db.query(models.Equipment).filter(models.Equipment.status == "Functional").count()
-    
-    readiness = (functional / total * 100) if total > 0 else 0
-    
+    def compute():
+        total = db.query(models.Equipment).count()
+        functional = db.query(models.Equipment).filter(models.Equipment.status == "Functional").count()
+
+        readiness = (functional / total * 100) if total > 0 else 0
+
+        return {
+            "total_items": total,
+            "functional_items": functional,
+            "readiness_percentage": round(readiness, 2)
+        }
+
+    # Every dashboard asks at once when a briefing starts: share one computation
+    return flights.do(request_key("/analytics/unit_readiness", current_user), compute)
+
+def _require_all_scope(kind: str):
+    if kind != "all":
+        raise HTTPException(status_code=403, detail="Permission denied: fleet-wide reliability needs an all-units scope")
+
+@router.get("/analytics/reliability")
+def get_reliability(
+    dimension: str = Query("catalog", pattern="^(catalog|fault_type|unit)$"),
+    unit: Optional[str] = Query(None, description="Restrict unit rows to this subtree, e.g. 188/53"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    MTTR / MTBF (hours) per catalog item, fault type or unit subtree, served from the reliability cache.
+    Unit-scoped callers see only the subtrees inside their unit; catalog and fault type rollups are
+    fleet-wide, so they need an all-units scope.
+    """
+    kind, scope_unit = get_visibility_scope(current_user)
+    if dimension == "unit":
+        if kind == "holder":
+            raise HTTPException(status_code=403, detail="Permission denied: no unit scope")
+        within = select(models.Unit.id)
+        if kind == "unit":
+            within = within.where(models.Unit.id.in_(units.subtree(scope_unit.id)))
+        if unit:
+            root = db.query(models.Unit).filter(models.Unit.path == units.normalize(unit)).first()
+            if root is None:
+                return []
+            within = within.where(models.Unit.id.in_(units.subtree(root.id)))
+        return reliability.unit_rollup(db, within if kind == "unit" or unit else None)
+    _require_all_scope(kind)
+    q = db.query(models.ReliabilityStat).filter(models.ReliabilityStat.dimension == dimension)
+    return [reliability.summarize(s) for s in q.order_by(models.ReliabilityStat.key).all()]
+
+@router.get("/analytics/fault_heatmap")
+def get_fault_heatmap(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Fault type x catalog item matrix of closed-ticket counts and MTTR (fleet-wide: all-units scope only)."""
+    _require_all_scope(get_visibility_scope(current_user)[0])
+    cells = db.query(models.ReliabilityStat).filter(models.ReliabilityStat.dimension == "heatmap").all()
     return {
-        "total_items": total,
-        "functional_items": functional,
-        "readiness_percentage": round(readiness, 2)
+        "fault_types": sorted({c.key for c in cells}),
+        "catalog_items": sorted({c.secondary_key for c in cells}),
+        "cells": [{
+            "fault_type": c.key,
+            "catalog_item": c.secondary_key,
+            "count": c.repairs,
+            "mttr_hours": reliability.summarize(c)["mttr_hours"]
+        } for c in cells]
     }
+
+@router.post("/analytics/reliability/rebuild")
+def rebuild_reliability(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    verify_admin_access(current_user)
+    folded = reliability.rebuild(db)
+    db.commit()
+    return {"status": "Rebuilt", "tickets": folded}
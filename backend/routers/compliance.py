@@ -0,0 +1,45 @@
+"""Compliance Router - "Who hasn't reported" views served from the overdue sweeper"""
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+
+from ..dependencies import get_current_active_user, get_visibility_scope, in_scope
+from ..compliance import sweeper
+from .. import models
+from ..units import path_within
+
+router = APIRouter(tags=["compliance"])
+
+@router.get("/compliance/overdue")
+def get_overdue_equipment(
+    unit: Optional[str] = Query(None, description="Narrow to a unit subtree inside your scope, e.g. 188/53/A"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Items past the 48h SEVERE threshold in the caller's scope, most overdue first,
+    with per-unit counts. Served from the last sweep (see `swept_at`), not from the DB.
+    """
+    scope = get_visibility_scope(current_user)
+    by_unit = sweeper.snapshot()
+
+    counts = {}
+    visible = []
+    for unit_path, entries in by_unit.items():
+        if unit and not path_within(unit_path, unit):
+            continue
+        in_unit = [e for e in entries if in_scope(scope, e["unit_hierarchy"], e["holder_user_id"])]
+        if in_unit:
+            counts[unit_path] = len(in_unit)
+            visible.extend(in_unit)
+    visible.sort(key=lambda e: (e["last_verified_at"] is not None, e["last_verified_at"] or sweeper.swept_at))
+
+    return {
+        "swept_at": sweeper.swept_at.isoformat() if sweeper.swept_at else None,
+        "total": len(visible),
+        "counts": counts,
+        "items": [{
+            **e,
+            "last_verified_at": e["last_verified_at"].isoformat() if e["last_verified_at"] else None
+        } for e in visible[offset:offset + limit]]
+    }
@@ -0,0 +1,110 @@
+"""
+Counts Router - Location inventory reconciliation (count sessions)
+Open a session, upload scans in chunks, close to reconcile, optionally apply corrections.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from ..database import get_db
+from ..dependencies import get_current_active_user, can_transfer_equipment
+from ..pagination import encode_cursor, decode_cursor
+from .. import models
+from .. import schemas
+from .. import reconciliation
+
+router = APIRouter(tags=["counts"])
+
+@router.post("/counts", response_model=schemas.CountSessionResponse, status_code=201)
+def open_count(
+    req: schemas.CountSessionCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Start counting a Location (location_id) or a custom_location."""
+    return reconciliation.to_response(reconciliation.open_session(db, current_user, req))
+
+@router.get("/counts/{session_id}", response_model=schemas.CountSessionResponse)
+def get_count(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    return reconciliation.to_response(reconciliation.get_own(db, session_id, current_user))
+
+@router.post("/counts/{session_id}/scans")
+def upload_scans(
+    session_id: str,
+    req: schemas.CountScanChunk,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Append a chunk of scanned serials (≤5000 per call, repeats allowed). 409 once closed."""
+    count = reconciliation.get_own(db, session_id, current_user)
+    stored = reconciliation.add_scans(db, count, req.serials)
+    db.refresh(count)
+    return {"stored": stored, "scan_count": count.scan_count}
+
+@router.post("/counts/{session_id}/close", response_model=schemas.CountSessionResponse)
+def close_count(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Stop accepting scans and reconcile: expected vs found, missing, unexpected."""
+    count = reconciliation.get_own(db, session_id, current_user)
+    reconciliation.close(db, count, current_user)
+    db.refresh(count)
+    return reconciliation.to_response(count)
+
+@router.get("/counts/{session_id}/lines", response_model=schemas.CountLinePage)
+def list_count_lines(
+    session_id: str,
+    outcome: Optional[str] = Query(None, pattern="^(found|missing|unexpected|unknown|out_of_scope)$"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Reconciliation lines of a closed session, keyset-paginated."""
+    count = reconciliation.get_own(db, session_id, current_user)
+    if count.status == "open":
+        raise HTTPException(status_code=409, detail="Count session is still open")
+
+    query = db.query(models.CountLine).filter(models.CountLine.session_id == count.id)
+    if outcome:
+        query = query.filter(models.CountLine.outcome == outcome)
+    if cursor:
+        _, after_id = decode_cursor(cursor)
+        query = query.filter(models.CountLine.id > after_id)
+    rows = query.order_by(models.CountLine.id.asc()).limit(limit + 1).all()
+    page = rows[:limit]
+    return {"items": page, "next_cursor": encode_cursor(None, page[-1].id) if len(rows) > limit else None}
+
+@router.post("/counts/{session_id}/apply")
+def apply_count(
+    session_id: str,
+    req: schemas.CountApplyRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Move the unexpected items (all, or equipment_ids) to the counted place, with RECONCILE logs."""
+    if not can_transfer_equipment(current_user):
+        raise HTTPException(status_code=403, detail="Permission Denied: Cannot transfer equipment.")
+    count = reconciliation.get_own(db, session_id, current_user)
+    result = reconciliation.apply(db, count, current_user, req.equipment_ids)
+    db.refresh(count)
+    return {**result, "session": reconciliation.to_response(count)}
+
+@router.post("/counts/{session_id}/dismiss")
+def dismiss_count_lines(
+    session_id: str,
+    req: schemas.CountDismissRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Leave unexpected items (all pending, or equipment_ids) where the database has them."""
+    count = reconciliation.get_own(db, session_id, current_user)
+    result = reconciliation.dismiss(db, count, req.equipment_ids)
+    db.refresh(count)
+    return {**result, "session": reconciliation.to_response(count)}
@@ -0,0 +1,89 @@
+"""
+Custody Router - Point-in-time custody ("who held item X / what did user or unit U hold at T")
+Answers come from custody_intervals (see custody.py), scoped by where the item was at T.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, aliased
+from datetime import datetime, timezone
+from typing import Optional
+
+from ..database import get_db
+from ..dependencies import get_current_active_user, apply_equipment_scope
+from .. import models
+from .. import schemas
+from .. import custody
+from .. import units
+
+router = APIRouter(tags=["custody"])
+
+def _utc(at: datetime) -> datetime:
+    """Timestamps are stored as naive UTC."""
+    return at.astimezone(timezone.utc).replace(tzinfo=None) if at.tzinfo else at
+
+def _states(db: Session, user: models.User, interval_ids) -> list:
+    """Scoped intervals by id with current names (items, users, locations), ordered by equipment id."""
+    I = models.CustodyInterval
+    Holder, Owner = aliased(models.User), aliased(models.User)
+    q = db.query(
+        I,
+        models.Equipment.serial_number,
+        models.CatalogItem.name.label("item_name"),
+        Holder.full_name.label("holder_name"),
+        Owner.full_name.label("owner_name"),
+        models.Location.name.label("location_name"),
+    ).outerjoin(models.Equipment, models.Equipment.id == I.equipment_id).outerjoin(
+        models.CatalogItem, models.Equipment.catalog_item_id == models.CatalogItem.id
+    ).outerjoin(Holder, Holder.id == I.holder_user_id).outerjoin(
+        Owner, Owner.id == I.owner_user_id
+    ).outerjoin(models.Location, models.Location.id == I.actual_location_id).filter(I.id.in_(interval_ids))
+
+    rows = apply_equipment_scope(q, user, I).order_by(I.equipment_id).all()
+    return [schemas.CustodyStateResponse(
+        equipment_id=row.CustodyInterval.equipment_id,
+        serial_number=row.serial_number,
+        item_name=row.item_name,
+        holder_user_id=row.CustodyInterval.holder_user_id,
+        holder_name=row.holder_name,
+        owner_user_id=row.CustodyInterval.owner_user_id,
+        owner_name=row.owner_name,
+        custom_location=row.CustodyInterval.custom_location,
+        actual_location_id=row.CustodyInterval.actual_location_id,
+        location_name=row.location_name,
+        unit_id=row.CustodyInterval.unit_id,
+        unit_hierarchy=row.CustodyInterval.unit_hierarchy,
+        status=row.CustodyInterval.status,
+        valid_from=row.CustodyInterval.valid_from,
+        valid_to=row.CustodyInterval.valid_to,
+    ) for row in rows]
+
+@router.get("/equipment/{equipment_id}/custody", response_model=schemas.CustodyStateResponse)
+def get_custody_at(
+    equipment_id: int,
+    at: datetime = Query(..., description="Point in time (ISO 8601; naive = UTC)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Holder, owner, location, unit and status of one item at `at`."""
+    interval = custody.interval_at(db, equipment_id, _utc(at))
+    states = _states(db, current_user, [interval.id]) if interval else []
+    if not states:
+        raise HTTPException(status_code=404, detail="No custody record for this item at that time")
+    return states[0]
+
+@router.get("/custody/holdings", response_model=schemas.CustodyHoldingsResponse)
+def get_holdings_at(
+    at: datetime = Query(..., description="Point in time (ISO 8601; naive = UTC)"),
+    holder_user_id: Optional[int] = Query(None),
+    unit_id: Optional[int] = Query(None, description="Includes sub-units (current tree)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Every item held by a user (holder_user_id) or belonging to a unit (unit_id) at `at`."""
+    if (holder_user_id is None) == (unit_id is None):
+        raise HTTPException(status_code=400, detail="Provide either holder_user_id or unit_id.")
+    at = _utc(at)
+    if holder_user_id is not None:
+        ids = custody.holding_ids_at(db, at, holder_user_id=holder_user_id)
+    else:
+        ids = custody.holding_ids_at(db, at, unit_ids=units.subtree(unit_id))
+    return {"at": at, "items": _states(db, current_user, ids)}
@@ -2,15 +2,22 @@
 Equipment Router - Equipment CRUD and transfer endpoints
 CRITICAL: Contains Hierarchical Data Scoping logic
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, union_all, literal, cast, null, String
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
 from typing import List, Optional
 
 from ..database import get_db
-from ..dependencies import get_current_active_user, get_daily_status
+from ..dependencies import get_current_active_user, get_daily_status, apply_equipment_scope, get_visibility_scope, in_scope, can_transfer_equipment
+from ..pagination import encode_cursor, keyset_before, keyset_order
 from .. import models
 from .. import schemas
+from .. import changes
+from .. import concurrency
+from .. import group_commit
+from ..refdata import cache as refdata
 
 router = APIRouter(tags=["equipment"])
 
@@ -24,65 +31,146 @@ def get_accessible_equipment(
     Get ALL equipment the user is allowed to see (Matrix Security).
     CRITICAL: Hierarchical Data Scoping Logic
     """
-    q = db.query(models.Equipment)
-    
-    # 1. Apply Security Filter (Hierarchical Scoping)
-    # Use unit_hierarchy for matching (e.g., "188/53" matches equipment with "188/53/A")
-    user_hierarchy = current_user.unit_hierarchy or current_user.unit_path
-    
-    # MASTER role always sees everything
-    if current_user.role == models.UserRole.MASTER or current_user.role == "master":
-        pass  # All
-    elif current_user.profile and current_user.profile.can_view_all_equipment:
-        pass  # All
-        
-    elif current_user.profile and current_user.profile.can_view_battalion_realtime:
-        if user_hierarchy:
-            parts = user_hierarchy.split('/')
-            if len(parts) >= 2:
-                bat_path = "/".join(parts[:2])
-                q = q.filter(models.Equipment.unit_hierarchy.startswith(bat_path))
-            else:
-                q = q.filter(models.Equipment.unit_hierarchy.startswith(user_hierarchy))
-        else:
-            q = q.filter(models.Equipment.holder_user_id == current_user.id)
+    # Served from the denormalized equipment_read table: no joins, no per-row lazy loads
+    q = apply_equipment_scope(db.query(models.EquipmentRead), current_user, models.EquipmentRead)
 
-    elif current_user.profile and current_user.profile.can_view_company_realtime:
-        if user_hierarchy:
-            q = q.filter(models.Equipment.unit_hierarchy.startswith(user_hierarchy))
-        else:
-            q = q.filter(models.Equipment.holder_user_id == current_user.id)
-    else:
-        q = q.filter(models.Equipment.holder_user_id == current_user.id)
-    
-    # 2. Optional text filter 
+    # Optional text filter
     if query_str:
         search = f"%{query_str}%"
-        q = q.join(models.CatalogItem).filter(
-            (models.CatalogItem.name.ilike(search)) |
-            (models.Equipment.status.ilike(search))
+        q = q.filter(
+            (models.EquipmentRead.item_name.ilike(search)) |
+            (models.EquipmentRead.status.ilike(search))
         )
-        
-    items = q.order_by(models.Equipment.id.asc()).all()
-    
-    results = []
-    for item in items:
-        compliance = get_daily_status(item.last_verified_at)
-        results.append(schemas.EquipmentResponse(
-            id=item.id,
-            type=item.item_name,
-            item_name=item.item_name,
-            status=item.status,
-            current_state_description=item.current_state_description,
-            compliance_check=item.report_status,
-            report_status=item.report_status,
-            compliance_level=compliance,
-            holder_user_id=item.holder_user_id,
-            custom_location=item.custom_location,
-            actual_location_id=item.actual_location_id,
-            serial_number=item.serial_number
-        ))
-    return results
+
+    rows = q.order_by(models.EquipmentRead.equipment_id.asc()).all()
+    return [read_row_to_response(row) for row in rows]
+
+def read_row_to_response(row: models.EquipmentRead) -> schemas.EquipmentResponse:
+    report_status = models.describe_report_status(row.last_verified_at)
+    return schemas.EquipmentResponse(
+        id=row.equipment_id,
+        type=row.item_name,
+        item_name=row.item_name,
+        status=row.status,
+        current_state_description=row.state_description,
+        compliance_check=report_status,
+        report_status=report_status,
+        compliance_level=get_daily_status(row.last_verified_at),
+        holder_user_id=row.holder_user_id,
+        custom_location=row.custom_location,
+        actual_location_id=row.actual_location_id,
+        serial_number=row.serial_number,
+        version=row.version
+    )
+
+def to_equipment_response(item: models.Equipment) -> schemas.EquipmentResponse:
+    return schemas.EquipmentResponse(
+        id=item.id,
+        type=item.item_name,
+        item_name=item.item_name,
+        status=item.status,
+        current_state_description=item.current_state_description,
+        compliance_check=item.report_status,
+        report_status=item.report_status,
+        compliance_level=get_daily_status(item.last_verified_at),
+        holder_user_id=item.holder_user_id,
+        custom_location=item.custom_location,
+        actual_location_id=item.actual_location_id,
+        serial_number=item.serial_number,
+        version=item.version
+    )
+
+SERIAL_CHUNK = 500  # Bound parameters per IN (...) query
+
+def _lookup_serials(db: Session, serials: List[str]) -> dict:
+    """
+    serial -> EquipmentRead row for the distinct serials given, unscoped.
+    Matches on the unique index of equipment.serial_number, one IN query per SERIAL_CHUNK serials.
+    """
+    found = {}
+    for i in range(0, len(serials), SERIAL_CHUNK):
+        chunk = serials[i:i + SERIAL_CHUNK]
+        rows = db.query(models.EquipmentRead, models.Equipment.serial_number).join(
+            models.Equipment, models.Equipment.id == models.EquipmentRead.equipment_id
+        ).filter(models.Equipment.serial_number.in_(chunk)).all()
+        found.update((serial, row) for row, serial in rows)
+    return found
+
+@router.get("/equipment/by-serial/{serial}", response_model=schemas.EquipmentResponse)
+def get_equipment_by_serial(
+    serial: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Single barcode scan. 404 if no item has this serial, 403 if it is outside the caller's scope."""
+    row = _lookup_serials(db, [serial.strip()]).get(serial.strip())
+    if not row:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    if not in_scope(get_visibility_scope(current_user), row.unit_hierarchy, row.holder_user_id):
+        raise HTTPException(status_code=403, detail="Equipment is outside your scope")
+    return read_row_to_response(row)
+
+@router.post("/equipment/by-serial", response_model=schemas.SerialLookupResponse)
+def lookup_equipment_by_serial(
+    req: schemas.SerialLookupRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Batch barcode scan: one result per submitted serial, in scan order (repeats included).
+    Each is "found" (with the item), "not_found" or "out_of_scope" (Matrix Security).
+    """
+    serials = [s.strip() for s in req.serials]
+    rows = _lookup_serials(db, list(dict.fromkeys(s for s in serials if s)))
+    scope = get_visibility_scope(current_user)
+
+    results, counts = [], {"found": 0, "not_found": 0, "out_of_scope": 0}
+    for serial in serials:
+        row = rows.get(serial)
+        if not row:
+            outcome, equipment = "not_found", None
+        elif not in_scope(scope, row.unit_hierarchy, row.holder_user_id):
+            outcome, equipment = "out_of_scope", None
+        else:
+            outcome, equipment = "found", read_row_to_response(row)
+        counts[outcome] += 1
+        results.append(schemas.SerialLookupResult(serial=serial, status=outcome, equipment=equipment))
+    return schemas.SerialLookupResponse(results=results, **counts)
+
+@router.get("/equipment/changes")
+def get_equipment_changes(
+    since: int = Query(0, ge=0, description="Highest change_seq the client has already seen"),
+    limit: int = Query(500, ge=1, le=2000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Equipment created/modified after `since` within the caller's scope, plus deleted ids and
+    revoked ids (items that moved out of the caller's scope). Drop both from the local copy.
+    Store the returned `cursor` and pass it as `since` next time; keep paging while `has_more`.
+    """
+    query = apply_equipment_scope(db.query(models.Equipment), current_user).options(
+        joinedload(models.Equipment.catalog_item),
+        joinedload(models.Equipment.holder),
+        joinedload(models.Equipment.owner),
+        joinedload(models.Equipment.location)
+    )
+    high_water = changes.current_seq(db)  # Read first: anything committed later carries a higher seq
+    items, has_more = changes.fetch_since(query, models.Equipment.change_seq, since, limit)
+
+    if has_more:
+        cursor = items[-1].change_seq
+    else:
+        cursor = max(since, high_water, items[-1].change_seq if items else 0)
+    revoked_ids, deleted_ids = changes.revoked(db, current_user, since, cursor)
+
+    return {
+        "items": [to_equipment_response(item) for item in items],
+        "deleted_ids": deleted_ids,
+        "revoked_ids": revoked_ids,
+        "cursor": cursor,
+        "has_more": has_more
+    }
 
 @router.post("/equipment/", response_model=schemas.EquipmentResponse)
 def create_equipment(
@@ -90,13 +178,15 @@ def create_equipment(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    cat_item = db.query(models.CatalogItem).filter(models.CatalogItem.name == item.catalog_name).first()
-    if not cat_item:
+    catalog_item_id = refdata.catalog_id(db, item.catalog_name)
+    if not catalog_item_id:
         cat_item = models.CatalogItem(name=item.catalog_name)
         db.add(cat_item)
         db.commit()
+        refdata.bump()
+        catalog_item_id = cat_item.id
     
-    new_item = models.Equipment(catalog_item_id=cat_item.id, serial_number=item.serial_number)
+    new_item = models.Equipment(catalog_item_id=catalog_item_id, serial_number=item.serial_number)
     db.add(new_item)
     db.commit()
     db.refresh(new_item)
@@ -120,19 +210,16 @@ def create_equipment(
 def assign_owner(
     req: schemas.AssignOwnerRequest, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    expected_version: Optional[int] = Depends(concurrency.if_match_version)
 ):
-    allowed_tech_roles = ["Company Tech Soldier", "Battalion Tech Commander", "Brigade Tech Commander"]
-    has_permission = (current_user.profile and current_user.profile.can_change_assignment_others) or \
-                     (current_user.profile and current_user.profile.name in allowed_tech_roles) or \
-                     current_user.role == "master"
-                     
-    if not has_permission:
+    if not can_transfer_equipment(current_user):
         raise HTTPException(status_code=403, detail="Permission denied. Profile cannot assign owners.")
 
     item = db.query(models.Equipment).filter(models.Equipment.id == req.equipment_id).first()
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
+    concurrency.check_version(db, item, expected_version)
     
     item.owner_user_id = req.owner_id
     item.holder_user_id = req.owner_id
@@ -140,24 +227,23 @@ def assign_owner(
     item.last_verified_at = datetime.utcnow()
     item.custom_location = None
     
-    db.commit()
-    return {"status": "Ownership Assigned", "state": item.current_state_description}
+    try:
+        db.commit()
+    except StaleDataError:
+        raise concurrency.conflict(db, req.equipment_id)
+    return {"status": "Ownership Assigned", "state": item.current_state_description, "version": item.version}
 
 @router.post("/equipment/transfer")
 def transfer_equipment(
     req: schemas.TransferPossessionRequest,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    expected_version: Optional[int] = Depends(concurrency.if_match_version)
 ):
     """
     Transfer possession to a Person OR a Location (Strict XOR).
     """
-    allowed_tech_roles = ["Company Tech Soldier", "Battalion Tech Commander", "Brigade Tech Commander"]
-    has_permission = (current_user.profile and current_user.profile.can_change_assignment_others) or \
-                     (current_user.profile and current_user.profile.name in allowed_tech_roles) or \
-                     current_user.role == "master"
-
-    if not has_permission:
+    if not can_transfer_equipment(current_user):
         raise HTTPException(status_code=403, detail="Permission Denied: Cannot transfer equipment.")
 
     # XOR Validation
@@ -169,6 +255,7 @@ def transfer_equipment(
     item = db.query(models.Equipment).filter(models.Equipment.id == req.equipment_id).first()
     if not item:
         raise HTTPException(status_code=404, detail="Equipment not found")
+    concurrency.check_version(db, item, expected_version)
     
     try:
         if req.to_holder_id:
@@ -208,38 +295,162 @@ def transfer_equipment(
         
         db.commit()
         db.refresh(item)
-        return result_msg
+        return {**result_msg, "version": item.version}
 
+    except HTTPException:
+        db.rollback()
+        raise
+    except StaleDataError:
+        raise concurrency.conflict(db, req.equipment_id)
     except Exception as e:
         db.rollback()
         print(f"Transfer Error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error during transfer: {str(e)}")
 
-@router.post("/equipment/{equipment_id}/verify")
-def verify_equipment_daily(
-    equipment_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
-):
-    item = db.query(models.Equipment).filter(models.Equipment.id == equipment_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Equipment not found")
-        
-    if item.holder_user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Permission Denied: You can only verify equipment you hold.")
-        
-    item.last_verified_at = datetime.utcnow()
+def stamp_daily_verification(
+    db: Session,
+    item: models.Equipment,
+    user: models.User,
+    observed_at: Optional[datetime] = None
+) -> models.TransactionLog:
+    """Daily "I have it" stamp + VERIFICATION log row. Never moves last_verified_at backwards. Caller commits."""
+    observed_at = observed_at or datetime.utcnow()
+    if not item.last_verified_at or item.last_verified_at < observed_at:
+        item.last_verified_at = observed_at
     
     trans_log = models.TransactionLog(
         equipment_id=item.id,
-        involved_user_id=current_user.id,
+        involved_user_id=user.id,
         event_type="VERIFICATION",
-        user_status_at_time=current_user.is_active_duty,
-        timestamp=datetime.utcnow()
+        user_status_at_time=user.is_active_duty,
+        timestamp=observed_at
     )
     db.add(trans_log)
-    
-    db.commit()
+    return trans_log
+
+def _verify_daily(db: Session, equipment_id: int, user: models.User) -> dict:
+    """Body of the daily verify; flushes but does not commit (shared with the group-commit writer)."""
+    item = db.query(models.Equipment).filter(models.Equipment.id == equipment_id).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+        
+    if item.holder_user_id != user.id:
+        raise HTTPException(status_code=403, detail="Permission Denied: You can only verify equipment you hold.")
+        
+    stamp_daily_verification(db, item, user)
+    db.flush()
     
     new_status = get_daily_status(item.last_verified_at)
-    return {"status": "Verified", "compliance": new_status}
+    return {"status": "Verified", "compliance": new_status, "version": item.version}
+
+@router.post("/equipment/{equipment_id}/verify")
+def verify_equipment_daily(
+    equipment_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    try:
+        if group_commit.ENABLED:
+            db.close()  # Hand the connection back while waiting; current_user stays loaded (detached)
+            return group_commit.writer.run(lambda session: _verify_daily(session, equipment_id, current_user))
+        result = _verify_daily(db, equipment_id, current_user)
+        db.commit()
+        return result
+    except StaleDataError:
+        raise concurrency.conflict(db, equipment_id)
+
+# Each timeline source gets a slot so (id * N + slot) is a unique, stable tie-breaker across the union
+TIMELINE_SOURCES = ("transaction", "maintenance", "verification", "status_change")
+
+def _timeline_query(equipment_id: int):
+    n = len(TIMELINE_SOURCES)
+    tl, ml, v, h = models.TransactionLog, models.MaintenanceLog, models.Verification, models.EquipmentStatusHistory
+    u = models.User
+
+    transactions = select(
+        literal("transaction").label("source"),
+        tl.id.label("id"),
+        (tl.id * n + 0).label("row_key"),
+        tl.timestamp.label("timestamp"),
+        tl.event_type.label("event_type"),
+        cast(null(), String).label("status"),
+        tl.location.label("details"),
+        u.full_name.label("actor_name")
+    ).outerjoin(u, tl.involved_user_id == u.id).where(tl.equipment_id == equipment_id)
+
+    tickets = select(
+        literal("maintenance").label("source"),
+        ml.id,
+        (ml.id * n + 1),
+        ml.opened_at,
+        models.FaultType.name,
+        ml.status,
+        ml.description,
+        u.full_name
+    ).outerjoin(models.FaultType, ml.fault_type_id == models.FaultType.id).outerjoin(
+        u, ml.technician_id == u.id
+    ).where(ml.equipment_id == equipment_id)
+
+    verifications = select(
+        literal("verification").label("source"),
+        v.id,
+        (v.id * n + 2),
+        v.created_date,
+        v.verification_type,
+        v.reported_status,
+        v.findings,
+        u.full_name
+    ).outerjoin(u, v.created_by == u.id).where(v.equipment_id == equipment_id)
+
+    status_changes = select(
+        literal("status_change").label("source"),
+        h.id,
+        (h.id * n + 3),
+        h.created_date,
+        h.change_reason,
+        h.new_status,
+        h.notes,
+        u.full_name
+    ).outerjoin(u, h.created_by == u.id).where(h.equipment_id == equipment_id)
+
+    return union_all(transactions, tickets, verifications, status_changes).subquery("timeline")
+
+@router.get("/equipment/{equipment_id}/timeline")
+def get_equipment_timeline(
+    equipment_id: int,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Unified history of one item (movements, tickets, verifications, status changes), newest first.
+    Merged and paginated in SQL; actor names resolved by join, so it is always two queries per page.
+    """
+    visible = apply_equipment_scope(
+        db.query(models.Equipment.id).filter(models.Equipment.id == equipment_id), current_user
+    ).first()
+    if not visible:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+
+    timeline = _timeline_query(equipment_id)
+    q = select(timeline)
+    if cursor:
+        q = q.where(keyset_before(timeline.c.timestamp, timeline.c.row_key, cursor))
+    rows = db.execute(
+        q.order_by(*keyset_order(timeline.c.timestamp, timeline.c.row_key)).limit(limit + 1)
+    ).all()
+    page = rows[:limit]
+
+    return {
+        "items": [{
+            "source": row.source,
+            "id": row.id,
+            "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+            "event_type": row.event_type,
+            "status": row.status,
+            "details": row.details,
+            "actor_name": row.actor_name
+        } for row in page],
+        "next_cursor": encode_cursor(page[-1].timestamp, page[-1].row_key) if len(rows) > limit else None
+    }
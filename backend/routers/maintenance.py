@@ -1,87 +1,218 @@
 """Maintenance Router - Tickets and fix endpoints"""
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
 from typing import List, Optional
 
 from ..database import get_db
-from ..dependencies import get_current_active_user
+from ..dependencies import get_current_active_user, apply_equipment_scope
+from ..pagination import encode_cursor, keyset_before, keyset_order
 from .. import models
 from .. import schemas
+from .. import reliability
+from .. import changes
+from .. import concurrency
+from ..refdata import cache as refdata
+from ..single_flight import flights, request_key
 
 router = APIRouter(tags=["maintenance"])
 
-@router.get("/tickets/", response_model=List[schemas.TicketResponse])
+@router.get("/tickets/", response_model=schemas.TicketPage)
 def get_tickets(
     status_filter: Optional[str] = Query(None, description="Filter by ticket status"),
+    include_counts: bool = Query(False, description="Also return per-status totals"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    query = db.query(models.MaintenanceLog).options(
-        joinedload(models.MaintenanceLog.equipment),
-        joinedload(models.MaintenanceLog.fault_type)
-    )
-    if status_filter:
-        query = query.filter(models.MaintenanceLog.status == status_filter)
-    
-    tickets = query.order_by(models.MaintenanceLog.opened_at.desc()).all()
-    
-    return [schemas.TicketResponse(
-        id=t.id,
-        equipment_id=t.equipment_id,
-        fault_type_id=t.fault_type_id,
-        equipment_name=t.equipment.item_name if t.equipment else "Unknown",
-        fault_type=t.fault_type.name if t.fault_type else "Unknown",
-        description=t.description,
-        status=t.status,
-        opened_at=t.opened_at,
-        closed_at=t.closed_at
-    ) for t in tickets]
+    """Tickets on equipment the caller can see, newest first (keyset-paginated by opened_at)."""
+    def scoped(q):
+        q = q.join(models.Equipment, models.MaintenanceLog.equipment_id == models.Equipment.id)
+        return apply_equipment_scope(q, current_user)
 
-@router.post("/maintenance/report")
-def report_fault(
-    report: schemas.ReportFaultRequest,
+    def compute() -> schemas.TicketPage:
+        query = scoped(db.query(models.MaintenanceLog)).options(
+            contains_eager(models.MaintenanceLog.equipment).joinedload(models.Equipment.catalog_item),
+            joinedload(models.MaintenanceLog.fault_type)
+        )
+        if status_filter:
+            query = query.filter(models.MaintenanceLog.status == status_filter)
+        if cursor:
+            query = query.filter(keyset_before(models.MaintenanceLog.opened_at, models.MaintenanceLog.id, cursor))
+
+        tickets = query.order_by(
+            *keyset_order(models.MaintenanceLog.opened_at, models.MaintenanceLog.id)
+        ).limit(limit + 1).all()
+        page = tickets[:limit]
+
+        counts = None
+        if include_counts:
+            counts = {member.value: 0 for member in models.TicketStatus}
+            rows = scoped(db.query(models.MaintenanceLog.status, func.count(models.MaintenanceLog.id))).group_by(
+                models.MaintenanceLog.status
+            ).all()
+            for ticket_status, count in rows:
+                counts[ticket_status] = count
+            counts["all"] = sum(count for _, count in rows)
+
+        return schemas.TicketPage(
+            items=[schemas.TicketResponse(
+                id=t.id,
+                equipment_id=t.equipment_id,
+                fault_type_id=t.fault_type_id,
+                equipment_name=t.equipment.item_name if t.equipment else "Unknown",
+                fault_type=t.fault_type.name if t.fault_type else "Unknown",
+                description=t.description,
+                status=t.status,
+                created_at=t.opened_at,
+                opened_at=t.opened_at,
+                timestamp=t.opened_at,
+                closed_at=t.closed_at
+            ) for t in page],
+            next_cursor=encode_cursor(page[-1].opened_at, page[-1].id) if len(tickets) > limit else None,
+            counts=counts
+        )
+
+    key = request_key("/tickets/", current_user, status_filter, include_counts, cursor, limit)
+    return flights.do(key, compute)
+
+@router.get("/tickets/changes")
+def get_ticket_changes(
+    since: int = Query(0, ge=0, description="Highest change_seq the client has already seen"),
+    limit: int = Query(500, ge=1, le=2000),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    item = db.query(models.Equipment).filter(models.Equipment.id == report.equipment_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Equipment not found")
-    
-    # Find or create fault type
-    fault_type = db.query(models.FaultType).filter(models.FaultType.name == report.fault_name).first()
-    if not fault_type:
-        is_manager = current_user.profile and current_user.profile.can_change_maintenance_status
+    """
+    Tickets created/modified after `since` within the caller's scope, plus deleted ticket ids and
+    revoked ids (tickets of items that moved out of the caller's scope).
+    """
+    query = apply_equipment_scope(
+        db.query(models.MaintenanceLog).join(
+            models.Equipment, models.MaintenanceLog.equipment_id == models.Equipment.id
+        ), current_user
+    ).options(
+        contains_eager(models.MaintenanceLog.equipment).joinedload(models.Equipment.catalog_item),
+        joinedload(models.MaintenanceLog.fault_type)
+    )
+    high_water = changes.current_seq(db)  # Read first: anything committed later carries a higher seq
+    tickets, has_more = changes.fetch_since(query, models.MaintenanceLog.change_seq, since, limit)
+
+    if has_more:
+        cursor = tickets[-1].change_seq
+    else:
+        cursor = max(since, high_water, tickets[-1].change_seq if tickets else 0)
+    deleted = apply_equipment_scope(
+        db.query(models.Tombstone.entity_id).filter(
+            models.Tombstone.entity == "maintenance_log",
+            models.Tombstone.change_seq > since,
+            models.Tombstone.change_seq <= cursor
+        ), current_user, equipment=models.Tombstone
+    ).all()
+    revoked_items, _ = changes.revoked(db, current_user, since, cursor)
+    revoked = db.query(models.MaintenanceLog.id).filter(
+        models.MaintenanceLog.equipment_id.in_(revoked_items)
+    ).order_by(models.MaintenanceLog.id).all() if revoked_items else []
+
+    return {
+        "items": [schemas.TicketResponse(
+            id=t.id,
+            equipment_id=t.equipment_id,
+            fault_type_id=t.fault_type_id,
+            equipment_name=t.equipment.item_name if t.equipment else "Unknown",
+            fault_type=t.fault_type.name if t.fault_type else "Unknown",
+            description=t.description,
+            status=t.status,
+            created_at=t.opened_at,
+            opened_at=t.opened_at,
+            timestamp=t.opened_at,
+            closed_at=t.closed_at
+        ) for t in tickets],
+        "deleted_ids": [row.entity_id for row in deleted],
+        "revoked_ids": [row.id for row in revoked],
+        "cursor": cursor,
+        "has_more": has_more
+    }
+
+def open_fault_ticket(
+    db: Session,
+    item: models.Equipment,
+    fault_name: str,
+    description: str,
+    user: models.User,
+    opened_at: Optional[datetime] = None
+):
+    """
+    Open a ticket and mark the item Malfunctioning, creating the fault type if it is new.
+    Returns (ticket, created_fault_type). Caller commits, then bumps refdata if a fault type was created.
+    """
+    created = False
+    cached_fault = refdata.fault_type_by_name(db, fault_name)
+    # On a miss, double-check the table: the type may have been added earlier in this same transaction
+    fault_type = None if cached_fault else db.query(models.FaultType).filter(models.FaultType.name == fault_name).first()
+    if cached_fault:
+        fault_type_id = cached_fault["id"]
+    elif fault_type:
+        fault_type_id = fault_type.id
+    else:
+        is_manager = user.profile and user.profile.can_change_maintenance_status
         fault_type = models.FaultType(
-            name=report.fault_name,
+            name=fault_name,
             is_pending=not is_manager,
-            requested_by_id=current_user.id
+            requested_by_id=user.id
         )
         db.add(fault_type)
-        db.commit()
-        db.refresh(fault_type)
+        db.flush()
+        fault_type_id = fault_type.id
+        created = True
     
     # Create maintenance log
     log = models.MaintenanceLog(
         equipment_id=item.id,
-        fault_type_id=fault_type.id,
-        description=report.description,
-        status="Open"
+        fault_type_id=fault_type_id,
+        description=description,
+        status="Open",
+        opened_at=opened_at or datetime.utcnow()
     )
     db.add(log)
     
     # Mark equipment as malfunctioning
     item.status = "Malfunctioning"
+    db.flush()
     
-    db.commit()
-    return {"status": "Fault Reported", "ticket_id": log.id}
+    return log, created
+
+@router.post("/maintenance/report")
+def report_fault(
+    report: schemas.ReportFaultRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user),
+    expected_version: Optional[int] = Depends(concurrency.if_match_version)
+):
+    item = db.query(models.Equipment).filter(models.Equipment.id == report.equipment_id).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    concurrency.check_version(db, item, expected_version)
+    
+    try:
+        log, created_fault_type = open_fault_ticket(db, item, report.fault_name, report.description, current_user)
+        db.commit()
+    except StaleDataError:
+        raise concurrency.conflict(db, report.equipment_id)
+    if created_fault_type:
+        refdata.bump()
+    return {"status": "Fault Reported", "ticket_id": log.id, "version": item.version}
 
 @router.post("/maintenance/fix/{equipment_id}")
 def fix_equipment(
     equipment_id: int,
     notes: str = "",
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    expected_version: Optional[int] = Depends(concurrency.if_match_version)
 ):
     if not (current_user.profile and current_user.profile.can_change_maintenance_status):
         if current_user.role != "master":
@@ -90,6 +221,7 @@ def fix_equipment(
     item = db.query(models.Equipment).filter(models.Equipment.id == equipment_id).first()
     if not item:
         raise HTTPException(status_code=404, detail="Equipment not found")
+    concurrency.check_version(db, item, expected_version)
     
     item.status = "Functional"
     
@@ -97,7 +229,10 @@ def fix_equipment(
     db.query(models.MaintenanceLog).filter(
         models.MaintenanceLog.equipment_id == equipment_id,
         models.MaintenanceLog.status != "Closed"
-    ).update({"status": "Closed", "closed_at": datetime.utcnow()}, synchronize_session=False)
+    ).update(
+        {"status": "Closed", "closed_at": datetime.utcnow(), "change_seq": changes.next_seq(db)},
+        synchronize_session=False
+    )
     
     # Log transaction
     log = models.TransactionLog(
@@ -108,5 +243,10 @@ def fix_equipment(
     )
     db.add(log)
     
-    db.commit()
-    return {"status": "Fixed", "notes": notes}
+    try:
+        # Fold the just-closed tickets into the MTTR/MTBF cache in the same transaction
+        reliability.refresh(db)
+        db.commit()
+    except StaleDataError:
+        raise concurrency.conflict(db, equipment_id)
+    return {"status": "Fixed", "notes": notes, "version": item.version}
@@ -0,0 +1,35 @@
+"""Metrics Router - Operational counters (unauthenticated, exempt from admission control)"""
+from fastapi import APIRouter
+
+from ..admission import controller as admission
+from ..report_cache import cache as report_cache
+from ..bus import bus
+from ..group_commit import writer as group_commit
+from ..single_flight import flights
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics/admission")
+def get_admission_metrics():
+    """Per route class: in flight, queue depth, admits/rejects, wait and service time percentiles (ms)."""
+    return admission.metrics()
+
+@router.get("/metrics/report_cache")
+def get_report_cache_metrics():
+    """Inventory report cache: entries, estimated bytes, hits/misses, evictions, invalidated entries."""
+    return report_cache.metrics()
+
+@router.get("/metrics/bus")
+def get_bus_metrics():
+    """Invalidation bus: backend, this worker's origin id, messages published/received, resyncs."""
+    return bus.metrics()
+
+@router.get("/metrics/group_commit")
+def get_group_commit_metrics():
+    """Group-commit writer: batches, ops, failures, replays, batch size, queue wait and commit time (ms)."""
+    return group_commit.metrics()
+
+@router.get("/metrics/single_flight")
+def get_single_flight_metrics():
+    """Request coalescing: calls, executions, shared results and coalescing ratio, overall and per route."""
+    return flights.metrics()
@@ -1,12 +1,21 @@
 """Reports Router - Inventory and daily movement reports"""
+import os
+
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
+from fastapi.responses import FileResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
 from datetime import datetime, timedelta
 from typing import List, Optional
 
 from ..database import get_db
-from ..dependencies import get_current_active_user, get_daily_status
+from ..dependencies import get_current_active_user, get_daily_status, apply_equipment_scope, apply_log_scope
+from ..pagination import encode_cursor, keyset_before, keyset_order
 from .. import models
+from .. import schemas
+from .. import report_jobs
+from ..report_cache import cache as report_cache, normalize_filters
+from ..single_flight import flights, request_key
 
 router = APIRouter(tags=["reports"])
 
@@ -19,92 +28,217 @@ def get_inventory_report(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    q = db.query(models.Equipment).options(
-        joinedload(models.Equipment.catalog_item),
-        joinedload(models.Equipment.holder),
-        joinedload(models.Equipment.owner)
+    filters = normalize_filters(equipment_type, location, status, holder_name)
+    key = request_key("/reports/query", current_user, *filters)
+    return report_cache.get_or_compute(
+        current_user, filters, lambda: flights.do(key, lambda: inventory_rows(db, current_user, *filters))
     )
 
-    # Apply Visibility Filters (Hierarchy Scoping)
-    user_hierarchy = current_user.unit_hierarchy
-    
-    # MASTER role always sees everything
-    if current_user.role == models.UserRole.MASTER or current_user.role == "master":
-        pass
-    elif current_user.profile and current_user.profile.can_view_all_equipment:
-        pass
-
-    elif current_user.profile and current_user.profile.can_view_battalion_realtime:
-        if user_hierarchy:
-            parts = user_hierarchy.split('/')
-            if len(parts) >= 2:
-                bat_path = "/".join(parts[:2])
-                q = q.filter(models.Equipment.unit_hierarchy.startswith(bat_path))
-            else:
-                q = q.filter(models.Equipment.unit_hierarchy.startswith(user_hierarchy))
-        else:
-            q = q.filter(models.Equipment.holder_user_id == current_user.id)
-
-    elif current_user.profile and current_user.profile.can_view_company_realtime:
-        if user_hierarchy:
-            q = q.filter(models.Equipment.unit_hierarchy.startswith(user_hierarchy))
-        else:
-            q = q.filter(models.Equipment.holder_user_id == current_user.id)
-    else:
-        q = q.filter(models.Equipment.holder_user_id == current_user.id)
+def inventory_rows(
+    db: Session,
+    user: models.User,
+    equipment_type: Optional[str] = None,
+    location: Optional[str] = None,
+    status: Optional[str] = None,
+    holder_name: Optional[str] = None
+) -> List[dict]:
+    """Inventory report rows (frontend GeneralReportItem). Shared by /reports/query and report jobs."""
+    # One narrow table (equipment_read) instead of joining catalog/users per row
+    R = models.EquipmentRead
+    q = apply_equipment_scope(db.query(R), user, R)
 
     # Apply user filters
     if equipment_type:
-        q = q.join(models.CatalogItem).filter(models.CatalogItem.name.ilike(f"%{equipment_type}%"))
+        q = q.filter(R.item_name.ilike(f"%{equipment_type}%"))
     if location:
-        q = q.filter(models.Equipment.custom_location.ilike(f"%{location}%"))
+        q = q.filter(R.custom_location.ilike(f"%{location}%"))
     if status:
-        q = q.filter(models.Equipment.status == status)
+        q = q.filter(R.status == status)
     if holder_name:
-        q = q.join(models.User, models.Equipment.holder_user_id == models.User.id).filter(
-            models.User.full_name.ilike(f"%{holder_name}%")
-        )
+        q = q.filter(R.holder_name.ilike(f"%{holder_name}%"))
 
-    items = q.order_by(models.Equipment.id.asc()).all()
+    rows = q.order_by(R.equipment_id.asc()).all()
 
     # Build response matching frontend GeneralReportItem interface
     result = []
-    for item in items:
-        compliance = get_daily_status(item.last_verified_at)
+    for row in rows:
+        compliance = get_daily_status(row.last_verified_at)
         reporting_status = "Reported" if compliance == "GOOD" else compliance
-        
+
         result.append({
-            "id": item.id,
-            "item_type": item.catalog_item.name if item.catalog_item else "Unknown",
-            "unit_association": item.unit_hierarchy or "",
-            "designated_owner": item.owner.full_name if item.owner else (item.holder.full_name if item.holder else "Unassigned"),
-            "actual_location": item.custom_location or "",
-            "serial_number": item.serial_number or "",
+            "id": row.equipment_id,
+            "item_type": row.item_name,
+            "unit_association": row.unit_hierarchy or "",
+            "designated_owner": row.owner_name or row.holder_name or "Unassigned",
+            "actual_location": row.custom_location or "",
+            "serial_number": row.serial_number or "",
             "reporting_status": reporting_status,
-            "last_reporter": item.holder.full_name if item.holder else "",
-            "last_verified_at": item.last_verified_at.isoformat() if item.last_verified_at else None,
+            "last_reporter": row.holder_name or "",
+            "last_verified_at": row.last_verified_at.isoformat() if row.last_verified_at else None,
         })
     
     return result
 
+def _time_bucket(column, granularity: str, dialect: str):
+    """SQL expression truncating a timestamp to the hour/day (Postgres vs SQLite)."""
+    if dialect == "postgresql":
+        return func.date_trunc(granularity, column)
+    fmt = "%Y-%m-%dT%H:00:00" if granularity == "hour" else "%Y-%m-%dT00:00:00"
+    return func.strftime(fmt, column)
+
+def movement_window(start: Optional[datetime], end: Optional[datetime]):
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+def _scoped_movement(q, user: models.User, start: datetime, end: datetime, event_type: Optional[str]):
+    q = q.select_from(models.TransactionLog).join(
+        models.Equipment, models.TransactionLog.equipment_id == models.Equipment.id
+    ).filter(
+        models.TransactionLog.timestamp >= start,
+        models.TransactionLog.timestamp < end
+    )
+    if event_type:
+        q = q.filter(models.TransactionLog.event_type == event_type)
+    return apply_log_scope(q, user)
+
+def movement_histogram(db: Session, user: models.User, start: datetime, end: datetime,
+                       event_type: Optional[str], aggregate: str) -> dict:
+    if aggregate in ("hour", "day"):
+        key = _time_bucket(models.TransactionLog.timestamp, aggregate, db.bind.dialect.name)
+    elif aggregate == "event_type":
+        key = models.TransactionLog.event_type
+    else:
+        key = models.Equipment.unit_hierarchy
+    key = key.label("key")
+
+    rows = _scoped_movement(
+        db.query(key, func.count(models.TransactionLog.id)), user, start, end, event_type
+    ).group_by(key).order_by(key).all()
+    return {
+        "aggregate": aggregate,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "buckets": [{
+            "key": k.isoformat() if isinstance(k, datetime) else k,
+            "count": count
+        } for k, count in rows]
+    }
+
+def movement_events(db: Session, user: models.User, start: datetime, end: datetime, event_type: Optional[str],
+                    cursor: Optional[str] = None, limit: Optional[int] = None):
+    """Raw events, newest first. Returns (items, next_cursor); limit=None returns the whole window."""
+    Reporter = aliased(models.User)
+    q = _scoped_movement(db.query(
+        models.TransactionLog.id,
+        models.TransactionLog.timestamp,
+        models.TransactionLog.event_type,
+        models.TransactionLog.location,
+        models.Equipment.serial_number,
+        models.CatalogItem.name.label("equipment_name"),
+        Reporter.full_name.label("reporter_name")
+    ), user, start, end, event_type).outerjoin(
+        models.CatalogItem, models.Equipment.catalog_item_id == models.CatalogItem.id
+    ).outerjoin(
+        Reporter, models.TransactionLog.involved_user_id == Reporter.id
+    )
+    if cursor:
+        q = q.filter(keyset_before(models.TransactionLog.timestamp, models.TransactionLog.id, cursor))
+
+    q = q.order_by(*keyset_order(models.TransactionLog.timestamp, models.TransactionLog.id))
+    rows = q.limit(limit + 1).all() if limit else q.all()
+    page = rows[:limit] if limit else rows
+
+    items = [{
+        "id": row.id,
+        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        "event_type": row.event_type,
+        "serial_number": row.serial_number,
+        "equipment_name": row.equipment_name,
+        "reporter_name": row.reporter_name,
+        "location": row.location
+    } for row in page]
+    next_cursor = encode_cursor(page[-1].timestamp, page[-1].id) if limit and len(rows) > limit else None
+    return items, next_cursor
+
 @router.get("/reports/daily_movement")
 def get_daily_movement_report(
+    start: Optional[datetime] = Query(None, description="Window start (UTC). Defaults to end - 24h"),
+    end: Optional[datetime] = Query(None, description="Window end (UTC). Defaults to now"),
+    event_type: Optional[str] = Query(None),
+    aggregate: Optional[str] = Query(None, pattern="^(hour|day|event_type|unit)$"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    cutoff = datetime.utcnow() - timedelta(hours=24)
-    
-    logs = db.query(models.TransactionLog).options(
-        joinedload(models.TransactionLog.equipment)
-    ).filter(
-        models.TransactionLog.timestamp >= cutoff
-    ).order_by(models.TransactionLog.timestamp.desc()).all()
-    
-    return [{
-        "id": log.id,
-        "timestamp": log.timestamp.isoformat() if log.timestamp else None,
-        "event_type": log.event_type,
-        "serial_number": log.equipment.serial_number if log.equipment else None,
-        "reporter_name": None,
-        "location": log.location
-    } for log in logs]
+    """
+    Movement log for an arbitrary time window, scoped to what the caller can see.
+    Raw events are keyset-paginated (newest first); `aggregate` returns SQL-computed histograms instead.
+    """
+    start, end = movement_window(start, end)
+    if aggregate:
+        return movement_histogram(db, current_user, start, end, event_type, aggregate)
+
+    items, next_cursor = movement_events(db, current_user, start, end, event_type, cursor, limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+# --- Asynchronous report jobs ---
+def _own_job(db: Session, job_id: str, user: models.User) -> models.ReportJob:
+    job = db.query(models.ReportJob).filter(models.ReportJob.id == job_id).first()
+    if not job or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@router.post("/reports/jobs", response_model=schemas.ReportJobResponse, status_code=202)
+def submit_report_job(
+    req: schemas.ReportJobCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Queue a report (same parameters as /reports/query or /reports/daily_movement) and return its job id.
+    If an artifact for the same scope, parameters and data version exists, the job is done immediately.
+    """
+    return report_jobs.to_response(report_jobs.submit(db, current_user, req))
+
+@router.get("/reports/jobs", response_model=List[schemas.ReportJobResponse])
+def list_report_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    jobs = db.query(models.ReportJob).filter(models.ReportJob.user_id == current_user.id).order_by(
+        models.ReportJob.created_at.desc()
+    ).limit(limit).all()
+    return [report_jobs.to_response(job) for job in jobs]
+
+@router.get("/reports/jobs/{job_id}", response_model=schemas.ReportJobResponse)
+def get_report_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    return report_jobs.to_response(_own_job(db, job_id, current_user))
+
+@router.get("/reports/jobs/{job_id}/download")
+def download_report_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """The report JSON, sent gzip-encoded straight from the artifact file."""
+    job = _own_job(db, job_id, current_user)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Report job is {job.status}")
+    path = report_jobs.artifact_path(job.cache_key)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Report artifact expired. Submit the job again.")
+    return FileResponse(
+        path,
+        media_type="application/json",
+        filename=f"{job.report_type}-{job.id}.json",
+        headers={"Content-Encoding": "gzip"}
+    )
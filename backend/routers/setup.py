@@ -7,6 +7,7 @@ from ..database import get_db
 from ..dependencies import get_current_active_user, verify_admin_access
 from .. import models
 from .. import security
+from ..refdata import cache as refdata
 
 router = APIRouter(tags=["setup"])
 
@@ -23,6 +24,7 @@ def initialize_system(db: Session = Depends(get_db)):
     ]
     db.add_all(profiles)
     db.commit()
+    refdata.bump()
     
     return {"status": "System initialized with default profiles"}
 
@@ -32,13 +34,16 @@ def list_profiles(
     current_user: models.User = Depends(get_current_active_user)
 ):
     """List all available profiles for admin assignment."""
-    profiles = db.query(models.Profile).order_by(models.Profile.id).all()
-    return [{"id": p.id, "name": p.name, "name_he": p.name_he} for p in profiles]
+    return refdata.profiles(db)
 
 @router.get("/setup/fault_types")
 def get_fault_types(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
-    faults = db.query(models.FaultType).all()
-    return [{"id": f.id, "name": f.name, "is_pending": f.is_pending} for f in faults]
+    return refdata.fault_types(db)
+
+@router.get("/setup/reference_version")
+def get_reference_version(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    """Current reference-data version; clients can skip refetching fault types/profiles while it is unchanged."""
+    return {"version": refdata.version(db)}
 
 @router.get("/setup/fault_types/pending")
 def get_pending_fault_types(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
@@ -46,8 +51,7 @@ def get_pending_fault_types(db: Session = Depends(get_db), current_user: models.
     if not (current_user.profile and current_user.profile.can_add_category):
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    faults = db.query(models.FaultType).filter(models.FaultType.is_pending == True).all()
-    return [{"id": f.id, "name": f.name, "is_pending": f.is_pending} for f in faults]
+    return [f for f in refdata.fault_types(db) if f["is_pending"]]
 
 @router.post("/setup/fault_types")
 def create_fault_type(
@@ -55,7 +59,7 @@ def create_fault_type(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    if db.query(models.FaultType).filter(models.FaultType.name == name).first():
+    if refdata.fault_type_by_name(db, name):
         raise HTTPException(status_code=400, detail="Fault type already exists")
     
     is_manager = current_user.profile and current_user.profile.can_add_category
@@ -66,6 +70,7 @@ def create_fault_type(
     )
     db.add(fault)
     db.commit()
+    refdata.bump()
     
     return {"status": "Created", "id": fault.id, "is_pending": fault.is_pending}
 
@@ -84,6 +89,7 @@ def approve_fault_type(
     
     fault.is_pending = False
     db.commit()
+    refdata.bump()
     
     return {"status": "Approved", "id": fault.id}
 
@@ -102,5 +108,6 @@ def delete_fault_type(
     
     db.delete(fault)
     db.commit()
+    refdata.bump()
     
     return {"status": "Deleted"}
@@ -0,0 +1,162 @@
+"""
+Offline Sync Router - Batched replay of field-device operations
+One request, one transaction: verifications, daily verify stamps and fault reports
+queued while offline are applied in order, deduplicated by idempotency key.
+"""
+import json
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..database import get_db
+from ..dependencies import get_current_active_user
+from ..refdata import cache as refdata
+from .. import models
+from .. import schemas
+from .equipment import stamp_daily_verification
+from .maintenance import open_fault_ticket
+from .verifications import record_verification
+
+router = APIRouter(tags=["sync"])
+
+def _naive_utc(ts: datetime) -> datetime:
+    """Device timestamps may carry "Z" or an offset; the database stores naive UTC."""
+    if ts.tzinfo:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def _observed_at(op: schemas.SyncOperation, now: datetime) -> datetime:
+    """Device time in naive UTC, clamped so a skewed clock can't stamp the future."""
+    return min(_naive_utc(op.observed_at or now), now)
+
+def _conflict(op: schemas.SyncOperation, item: models.Equipment, observed_at: datetime, batch_version: int) -> bool:
+    """
+    The device acted on stale state if the version or status it saw is no longer current, or if a
+    status-changing op races a verification that landed on the server after the device acted.
+    Versions are compared to the item as it was before this batch, so a device's own queued ops
+    on the same item don't conflict with each other.
+    """
+    if op.base_version is not None and op.base_version != batch_version:
+        return True
+    if op.base_status is not None and op.base_status != item.status:
+        return True
+    changes_status = op.type == "report_fault" or (op.type == "verification" and op.reported_status != item.status)
+    if changes_status and op.base_last_verified_at and item.last_verified_at:
+        return item.last_verified_at > _naive_utc(op.base_last_verified_at) and item.last_verified_at > observed_at
+    return False
+
+def _apply(db: Session, op: schemas.SyncOperation, item: models.Equipment, user: models.User, observed_at: datetime):
+    """Returns (ref_id, rejection_detail, created_fault_type)."""
+    if op.type == "verify":
+        if item.holder_user_id != user.id:
+            return None, "You can only verify equipment you hold", False
+        log = stamp_daily_verification(db, item, user, observed_at)
+        db.flush()
+        return log.id, None, False
+
+    if op.type == "verification":
+        if not op.verification_type or not op.reported_status:
+            return None, "verification_type and reported_status are required", False
+        data = schemas.VerificationCreate(
+            equipment_id=item.id,
+            verification_type=op.verification_type,
+            reported_status=op.reported_status,
+            findings=op.findings,
+            action_required=op.action_required
+        )
+        verification = record_verification(db, item, data, user, observed_at)
+        return verification.id, None, False
+
+    if not op.fault_name:
+        return None, "fault_name is required", False
+    ticket, created_fault_type = open_fault_ticket(db, item, op.fault_name, op.description or "", user, observed_at)
+    return ticket.id, None, created_fault_type
+
+@router.post("/sync", response_model=schemas.SyncResponse, response_model_exclude_none=True)
+def sync_operations(
+    req: schemas.SyncRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Apply a batch of offline operations in one transaction.
+    Already-applied keys come back as "duplicate" with their original result; stale ops as "conflict"
+    with the current server state, so the device can reconcile without refetching.
+    """
+    now = datetime.utcnow()
+    keys = [op.idempotency_key for op in req.operations]
+    ledger = {
+        row.idempotency_key: row for row in db.query(models.SyncOperation).filter(
+            models.SyncOperation.user_id == current_user.id,
+            models.SyncOperation.idempotency_key.in_(keys)
+        )
+    }
+    items = {
+        item.id: item for item in db.query(models.Equipment).filter(
+            models.Equipment.id.in_({op.equipment_id for op in req.operations})
+        )
+    }
+
+    batch_versions = {item_id: item.version for item_id, item in items.items()}
+
+    results = []
+    bump_refdata = False
+    try:
+        for op in req.operations:
+            if op.idempotency_key in ledger:
+                previous = json.loads(ledger[op.idempotency_key].result)
+                results.append(schemas.SyncResult(**{**previous, "outcome": "duplicate"}))
+                continue
+
+            item = items.get(op.equipment_id)
+            if not item:
+                results.append(schemas.SyncResult(key=op.idempotency_key, outcome="rejected", detail="Equipment not found"))
+                continue
+
+            observed_at = _observed_at(op, now)
+            if _conflict(op, item, observed_at, batch_versions[item.id]):
+                results.append(schemas.SyncResult(
+                    key=op.idempotency_key, outcome="conflict",
+                    status=item.status, last_verified_at=item.last_verified_at, version=item.version
+                ))
+                continue
+
+            ref_id, rejection, created_fault_type = _apply(db, op, item, current_user, observed_at)
+            if rejection:
+                results.append(schemas.SyncResult(key=op.idempotency_key, outcome="rejected", detail=rejection))
+                continue
+            bump_refdata = bump_refdata or created_fault_type
+
+            db.flush()  # Emit the versioned UPDATE now so item.version is current
+            result = schemas.SyncResult(
+                key=op.idempotency_key, outcome="applied", ref_id=ref_id,
+                status=item.status, last_verified_at=item.last_verified_at, version=item.version
+            )
+            entry = models.SyncOperation(
+                user_id=current_user.id,
+                idempotency_key=op.idempotency_key,
+                op_type=op.type,
+                result=result.model_dump_json(exclude_none=True)
+            )
+            db.add(entry)
+            ledger[op.idempotency_key] = entry  # Same key twice in one batch
+            results.append(result)
+
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Another sync with the same idempotency keys is in progress. Retry.")
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Equipment in this batch was modified concurrently. Retry the sync.")
+    except Exception as e:
+        db.rollback()
+        print(f"Sync Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal Server Error during sync: {str(e)}")
+
+    if bump_refdata:
+        refdata.bump()
+    return schemas.SyncResponse(results=results)
@@ -0,0 +1,52 @@
+"""Units Router - Unit tree with per-node counts, and re-parenting (units + unit_closure)"""
+from fastapi import APIRouter, Depends, HTTPException
+
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..dependencies import get_current_active_user, get_visibility_scope, verify_admin_access
+from .. import models
+from .. import schemas
+from .. import units
+
+router = APIRouter(tags=["units"])
+
+@router.get("/units/tree")
+def get_unit_tree(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    The unit tree visible to the caller (whole tree, or the subtree of their battalion/company),
+    each node with direct and subtree counts of members and equipment.
+    """
+    kind, value = get_visibility_scope(current_user)
+    if kind == "holder":
+        raise HTTPException(status_code=403, detail="Not authorized to view the unit tree")
+    return units.tree(db, root_id=value.id if kind == "unit" else None)
+
+@router.post("/units/{unit_id}/move")
+def move_unit(
+    unit_id: int,
+    req: schemas.UnitMoveRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Re-parent a unit (e.g. a company to another battalion). Scope follows immediately."""
+    verify_admin_access(current_user)
+    unit = db.query(models.Unit).filter(models.Unit.id == unit_id).first()
+    if not unit:
+        raise HTTPException(status_code=404, detail="Unit not found")
+    new_parent = None
+    if req.new_parent_id is not None:
+        new_parent = db.query(models.Unit).filter(models.Unit.id == req.new_parent_id).first()
+        if not new_parent:
+            raise HTTPException(status_code=404, detail="Parent unit not found")
+
+    try:
+        relabelled = units.move(db, unit, new_parent)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    return {"status": "Moved", "unit_id": unit.id, "path": unit.path, "equipment_relabelled": relabelled}
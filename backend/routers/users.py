@@ -1,13 +1,18 @@
 """Users Router - User management endpoints"""
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
+from typing import List, Optional, Set
 
 from ..database import get_db
-from ..dependencies import get_current_active_user, verify_admin_access, get_daily_status
+from ..dependencies import get_current_active_user, verify_admin_access, get_daily_status, get_visibility_scope
+from ..pagination import encode_cursor, decode_cursor
 from .. import models
 from .. import schemas
 from .. import security
+from .. import units
+from .. import roster
+from ..refdata import cache as refdata
+from ..user_index import index as user_index
 
 router = APIRouter(tags=["users"])
 
@@ -20,8 +25,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     assigned_role = "master" if user_count == 0 else "user"
     target_profile_name = "Master" if user_count == 0 else "Soldier"
         
-    profile = db.query(models.Profile).filter(models.Profile.name == target_profile_name).first()
-    profile_id = profile.id if profile else None
+    profile_id = refdata.profile_id(db, target_profile_name)
 
     new_user = models.User(
         personal_number=user.personal_number, 
@@ -38,6 +42,18 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db.refresh(new_user)
     return new_user
 
+@router.post("/users/import", response_model=schemas.RosterImportResponse)
+def import_roster(
+    content: bytes = Body(..., media_type="text/csv"),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    upsert: bool = Query(False, description="Update users that already exist (e.g. unit transfers)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Bulk-create (or with upsert, update) users from a CSV / NDJSON roster. Invalid rows are reported, the rest imported."""
+    verify_admin_access(current_user)
+    return roster.import_roster(db, content, format, upsert)
+
 @router.put("/users/promote", response_model=schemas.UserResponse)
 def promote_user(req: schemas.PromoteUserRequest, current_user: models.User = Depends(get_current_active_user), db: Session = Depends(get_db)):
     verify_admin_access(current_user)
@@ -57,18 +73,65 @@ def get_my_equipment(current_user: models.User = Depends(get_current_active_user
         current_state_description=item.current_state_description, compliance_check=item.report_status,
         report_status=item.report_status, compliance_level=get_daily_status(item.last_verified_at),
         holder_user_id=item.holder_user_id, custom_location=item.custom_location,
-        actual_location_id=item.actual_location_id, serial_number=item.serial_number
+        actual_location_id=item.actual_location_id, serial_number=item.serial_number,
+        version=item.version
     ) for item in items]
 
 @router.get("/users/me", response_model=schemas.UserResponse)
 def read_users_me(current_user: models.User = Depends(get_current_active_user)):
     return current_user
 
-@router.get("/users", response_model=List[schemas.UserResponse])
-def list_all_users(q: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+SEARCH_MAX = 1000  # Users matched by /users?q= before keyset paging
+
+def _typeahead_units(db: Session, user: models.User) -> Optional[Set[int]]:
+    """
+    Unit ids whose members the caller may pick or list (None = everyone). Soldiers pick within
+    their battalion; a caller with neither an all-units scope nor a unit gets an empty set.
+    """
+    kind, value = get_visibility_scope(user)
+    if kind == "all":
+        return None
+    unit = value if kind == "unit" else (units.battalion_of(user.unit) if user.unit else None)
+    if unit is None:
+        return set()
+    return {row[0] for row in db.execute(units.subtree(unit.id))}
+
+@router.get("/users/typeahead", response_model=schemas.UserTypeaheadResponse)
+def typeahead_users(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Prefix match on any word of the name or on the personal number, within the caller's units."""
+    items, complete = user_index.search(db, q, limit, _typeahead_units(db, current_user))
+    response.headers["Cache-Control"] = "private, max-age=30"
+    return {"items": items, "complete": complete}
+
+@router.get("/users", response_model=schemas.UserPage)
+def list_all_users(
+    q: Optional[str] = None,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Users within the caller's units (as for the typeahead) by id, keyset-paginated. `q` is a
+    prefix match on any word of the name or on the personal number, answered from the
+    typeahead index (first SEARCH_MAX matches) instead of a table scan.
+    """
     query = db.query(models.User).options(joinedload(models.User.profile))
+    unit_ids = _typeahead_units(db, current_user)
     if q:
-        query = query.filter((models.User.full_name.ilike(f"%{q}%")) | (models.User.personal_number.ilike(f"%{q}%")))
-    else:
-        query = query.limit(50)
-    return query.all()
+        matches, _ = user_index.search(db, q, SEARCH_MAX, unit_ids)
+        query = query.filter(models.User.id.in_([m["id"] for m in matches]))
+    elif unit_ids is not None:
+        query = query.filter(models.User.unit_id.in_(unit_ids))
+    if cursor:
+        _, after_id = decode_cursor(cursor)
+        query = query.filter(models.User.id > after_id)
+    rows = query.order_by(models.User.id.asc()).limit(limit + 1).all()
+    page = rows[:limit]
+    return {"items": page, "next_cursor": encode_cursor(None, page[-1].id) if len(rows) > limit else None}
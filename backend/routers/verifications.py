@@ -1,39 +1,37 @@
 """
 Equipment Verification & Status History Router
 """
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
-from .. import models, schemas
+from .. import models, schemas, concurrency, group_commit
 from ..dependencies import get_current_user
 
 router = APIRouter(prefix="/verifications", tags=["Verifications"])
 
 
-@router.post("/", response_model=schemas.VerificationResponse)
-async def create_verification(
+def record_verification(
+    db: Session,
+    equipment: models.Equipment,
     data: schemas.VerificationCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
-):
-    """Create a verification record. Updates equipment status if changed."""
-    equipment = db.query(models.Equipment).filter(
-        models.Equipment.id == data.equipment_id
-    ).first()
-    
-    if not equipment:
-        raise HTTPException(status_code=404, detail="Equipment not found")
-    
+    user: models.User,
+    observed_at: Optional[datetime] = None
+) -> models.Verification:
+    """Add a verification (and a status history row if the status changed). Caller commits."""
+    observed_at = observed_at or datetime.utcnow()
     verification = models.Verification(
-        equipment_id=data.equipment_id,
+        equipment_id=equipment.id,
         verification_type=data.verification_type,
         reported_status=data.reported_status,
         findings=data.findings,
         action_required=data.action_required,
-        created_by=current_user.id
+        created_date=observed_at,
+        created_by=user.id
     )
     db.add(verification)
     db.flush()
@@ -42,19 +40,41 @@ async def create_verification(
     if data.reported_status != old_status:
         equipment.status = data.reported_status
         history = models.EquipmentStatusHistory(
-            equipment_id=data.equipment_id,
+            equipment_id=equipment.id,
             old_status=old_status,
             new_status=data.reported_status,
             change_reason="verification",
             verification_id=verification.id,
             notes=data.findings,
-            created_by=current_user.id
+            created_date=observed_at,
+            created_by=user.id
         )
         db.add(history)
     
-    equipment.last_verified_at = datetime.utcnow()
-    db.commit()
-    db.refresh(verification)
+    if not equipment.last_verified_at or equipment.last_verified_at < observed_at:
+        equipment.last_verified_at = observed_at
+    return verification
+
+
+def _create_verification(
+    db: Session,
+    data: schemas.VerificationCreate,
+    user: models.User,
+    expected_version: Optional[int] = None
+) -> schemas.VerificationResponse:
+    """Body of POST /verifications/; flushes but does not commit (shared with the group-commit writer)."""
+    equipment = db.query(models.Equipment).filter(
+        models.Equipment.id == data.equipment_id
+    ).first()
+    
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    if expected_version is not None and equipment.version != expected_version:
+        # The caller turns this into the 409; rolling back here would undo a whole group-commit batch
+        raise StaleDataError(f"Equipment {equipment.id} is at version {equipment.version}, not {expected_version}")
+    
+    verification = record_verification(db, equipment, data, user)
+    db.flush()
     
     return schemas.VerificationResponse(
         id=verification.id,
@@ -65,10 +85,32 @@ async def create_verification(
         action_required=verification.action_required,
         created_date=verification.created_date,
         created_by=verification.created_by,
-        reporter_name=current_user.full_name
+        reporter_name=user.full_name,
+        equipment_version=equipment.version
     )
 
 
+@router.post("/", response_model=schemas.VerificationResponse)
+async def create_verification(
+    data: schemas.VerificationCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+    expected_version: Optional[int] = Depends(concurrency.if_match_version)
+):
+    """Create a verification record. Updates equipment status if changed."""
+    try:
+        if group_commit.ENABLED:
+            db.close()  # Hand the connection back while waiting; current_user stays loaded (detached)
+            return await asyncio.wrap_future(group_commit.writer.submit(
+                lambda session: _create_verification(session, data, current_user, expected_version)
+            ))
+        response = _create_verification(db, data, current_user, expected_version)
+        db.commit()
+        return response
+    except StaleDataError:
+        raise concurrency.conflict(db, data.equipment_id)
+
+
 @router.get("/equipment/{equipment_id}", response_model=List[schemas.VerificationResponse])
 async def get_equipment_verifications(
     equipment_id: int,
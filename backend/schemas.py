@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
 from datetime import datetime
 
 # --- Analytics ---
@@ -46,6 +46,30 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+class UserTypeaheadItem(BaseModel):
+    id: int
+    full_name: Optional[str] = None
+    personal_number: Optional[str] = None
+
+class UserTypeaheadResponse(BaseModel):
+    items: List[UserTypeaheadItem]
+    complete: bool  # All matches returned: longer queries can be filtered client-side
+
+class RosterRowError(BaseModel):
+    row: int  # CSV line / NDJSON line number
+    personal_number: Optional[str] = None
+    error: str
+
+class RosterImportResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    errors: List[RosterRowError]
+
 class UserLogin(BaseModel):
     personal_number: str
     password: str
@@ -80,11 +104,26 @@ class EquipmentResponse(BaseModel):
     compliance_level: str
     report_status: str
     compliance_check: str 
+    version: Optional[int] = None # Send back as If-Match on mutations
 
     class Config:
         from_attributes = True
 
 # --- Actions ---
+class SerialLookupRequest(BaseModel):
+    serials: List[str] = Field(min_length=1, max_length=5000)  # In scan order; repeats allowed
+
+class SerialLookupResult(BaseModel):
+    serial: str
+    status: str  # "found" | "not_found" | "out_of_scope"
+    equipment: Optional[EquipmentResponse] = None  # Only when found
+
+class SerialLookupResponse(BaseModel):
+    results: List[SerialLookupResult]  # Same order and length as the request
+    found: int
+    not_found: int
+    out_of_scope: int
+
 class TransferPossessionRequest(BaseModel):
     equipment_id: int
     to_holder_id: Optional[int] = None
@@ -126,6 +165,7 @@ class TicketResponse(BaseModel):
     status: str
     description: str
     created_at: Optional[datetime] = None  # Alias for timestamp
+    opened_at: Optional[datetime] = None
     closed_at: Optional[datetime] = None
     
     is_false_alarm: bool = False
@@ -136,6 +176,11 @@ class TicketResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class TicketPage(BaseModel):
+    items: List[TicketResponse]
+    next_cursor: Optional[str] = None
+    counts: Optional[Dict[str, int]] = None  # Per-status totals over the whole scope
+
 class DailyActivityItem(BaseModel):
     timestamp: datetime
     event_type: str
@@ -180,6 +225,7 @@ class VerificationResponse(BaseModel):
     created_date: datetime
     created_by: int
     reporter_name: Optional[str] = None
+    equipment_version: Optional[int] = None # Equipment.version after this verification
 
     class Config:
         from_attributes = True
@@ -199,3 +245,136 @@ class StatusHistoryResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# --- Offline Sync ---
+class SyncOperation(BaseModel):
+    idempotency_key: str
+    type: str = Field(pattern="^(verify|verification|report_fault)$")
+    equipment_id: int
+    observed_at: Optional[datetime] = None  # When the action happened on the device
+    
+    # What the device believed when it acted (conflict detection)
+    base_status: Optional[str] = None
+    base_last_verified_at: Optional[datetime] = None
+    base_version: Optional[int] = None  # Equipment.version the device last saw
+    
+    # verification
+    verification_type: Optional[str] = None
+    reported_status: Optional[str] = None
+    findings: Optional[str] = None
+    action_required: bool = False
+    
+    # report_fault
+    fault_name: Optional[str] = None
+    description: Optional[str] = None
+
+class SyncRequest(BaseModel):
+    operations: List[SyncOperation] = Field(max_length=500)
+
+class SyncResult(BaseModel):
+    key: str
+    outcome: str  # "applied" | "duplicate" | "conflict" | "rejected"
+    ref_id: Optional[int] = None
+    detail: Optional[str] = None
+    status: Optional[str] = None  # Server state after the op (or the conflicting state)
+    last_verified_at: Optional[datetime] = None
+    version: Optional[int] = None
+
+class SyncResponse(BaseModel):
+    results: List[SyncResult]
+
+# --- Unit Hierarchy ---
+class UnitMoveRequest(BaseModel):
+    new_parent_id: Optional[int] = None # None = make it a root unit
+
+# --- Report Jobs ---
+class ReportJobCreate(BaseModel):
+    report_type: str = Field(pattern="^(inventory|daily_movement)$")
+    
+    # inventory filters
+    equipment_type: Optional[str] = None
+    location: Optional[str] = None
+    status: Optional[str] = None
+    holder_name: Optional[str] = None
+    
+    # daily_movement window (defaults to the 24h before submission)
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    event_type: Optional[str] = None
+    aggregate: Optional[str] = Field(None, pattern="^(hour|day|event_type|unit)$")
+
+class ReportJobResponse(BaseModel):
+    job_id: str
+    report_type: str
+    status: str  # "queued" | "running" | "done" | "failed"
+    cached: bool = False
+    row_count: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+
+# --- Inventory Counts ---
+class CountSessionCreate(BaseModel):
+    location_id: Optional[int] = None  # XOR custom_location
+    custom_location: Optional[str] = None
+
+class CountScanChunk(BaseModel):
+    serials: List[str] = Field(min_length=1, max_length=5000)
+
+class CountApplyRequest(BaseModel):
+    equipment_ids: Optional[List[int]] = None  # None = every pending unexpected item
+
+class CountDismissRequest(BaseModel):
+    equipment_ids: Optional[List[int]] = None  # None = every pending unexpected item
+
+class CountSessionResponse(BaseModel):
+    session_id: str
+    status: str  # "open" | "closed" | "applied"
+    location_id: Optional[int] = None
+    custom_location: Optional[str] = None
+    place: str
+    scan_count: int
+    summary: Optional[Dict[str, int]] = None  # expected + count per outcome, after close
+    created_at: datetime
+    closed_at: Optional[datetime] = None
+    applied_at: Optional[datetime] = None
+
+class CountLineResponse(BaseModel):
+    outcome: str  # "found" | "missing" | "unexpected" | "unknown" | "out_of_scope"
+    serial: Optional[str] = None
+    equipment_id: Optional[int] = None
+    recorded_location: Optional[str] = None  # unexpected only: where the database has it
+    scans: int
+    applied: bool = False
+    dismissed: bool = False
+
+    class Config:
+        from_attributes = True
+
+class CountLinePage(BaseModel):
+    items: List[CountLineResponse]
+    next_cursor: Optional[str] = None
+
+# --- Custody History ---
+class CustodyStateResponse(BaseModel):
+    equipment_id: int
+    serial_number: Optional[str] = None
+    item_name: Optional[str] = None
+    holder_user_id: Optional[int] = None
+    holder_name: Optional[str] = None
+    owner_user_id: Optional[int] = None
+    owner_name: Optional[str] = None
+    custom_location: Optional[str] = None
+    actual_location_id: Optional[int] = None
+    location_name: Optional[str] = None
+    unit_id: Optional[int] = None
+    unit_hierarchy: Optional[str] = None  # Path at the time
+    status: Optional[str] = None
+    valid_from: datetime  # This state held from valid_from ...
+    valid_to: Optional[datetime] = None  # ... until valid_to (None = still current)
+
+class CustodyHoldingsResponse(BaseModel):
+    at: datetime
+    items: List[CustodyStateResponse]
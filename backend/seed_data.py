@@ -7,6 +7,11 @@ from sqlalchemy import text
 from .database import SessionLocal, engine
 from . import models
 from . import security
+from . import changes  # Registers the change_seq flush hook
+from . import read_model  # Registers the equipment_read flush hook
+from . import units  # Registers the unit_id resolution hook
+from . import partitions  # Partitioned transaction_logs DDL + brigade flush hook
+from .refdata import cache as refdata
 from datetime import datetime
 import random
 
@@ -195,6 +200,7 @@ def seed_matrix():
 
     db.add_all(items)
     db.commit()
+    refdata.bump()
     print(f"🚀 Hierarchy Seeded Successfully!")
 
 if __name__ == "__main__":
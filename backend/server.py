@@ -0,0 +1,96 @@
+"""
+Production Server Profile
+
+    python -m backend.server
+
+Runs WEB_CONCURRENCY uvicorn worker processes (default: CPU count) without --reload.
+Each worker has its own DB pool, admission limits and in-process caches:
+
+- On PostgreSQL, DB pools are sized so that all workers together stay within DB_MAX_CONNECTIONS
+  (default 90, under Postgres' default max_connections of 100). The launcher keeps
+  LAUNCHER_CONNECTIONS for its background jobs; each worker gets an equal share of the rest:
+  one for the invalidation-bus listener, the rest split between pool_size and max_overflow.
+- ADMISSION_CAPACITY defaults to the worker's pool minus its background threads (overdue
+  sweeper, report job workers, group-commit writer), so admitted requests never wait on the pool.
+- Caches stay coherent through the invalidation bus (bus.py).
+
+The launcher runs the one-time startup work (create_all, backfills) once before spawning
+workers and marks them with BACKEND_LAUNCHED=1, so they skip it instead of racing on it.
+It also runs the jobs that must exist once per deployment (overdue_equipment persistence,
+snapshot exporter, custody checkpointer); workers only refresh their in-memory overdue view.
+Explicit DB_POOL_SIZE / DB_MAX_OVERFLOW / ADMISSION_CAPACITY values are left untouched.
+"""
+import os
+
+from sqlalchemy import create_engine
+
+from . import database
+
+WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "90"))
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+LAUNCHED_ENV = "BACKEND_LAUNCHED"
+LAUNCHER_CONNECTIONS = 3  # Overdue sweeper, snapshot exporter, custody checkpointer
+
+def launched() -> bool:
+    """True in a worker spawned by main(): the launcher already did the one-time work."""
+    return os.getenv(LAUNCHED_ENV) == "1"
+
+def pool_settings(workers: int, max_connections: int = DB_MAX_CONNECTIONS) -> dict:
+    per_worker = max(4, (max_connections - LAUNCHER_CONNECTIONS) // max(1, workers))
+    pooled = per_worker - 1  # One connection is the bus listener, outside the pool
+    pool_size = max(2, pooled // 2)
+    max_overflow = max(0, pooled - pool_size)
+    background = 1 + int(os.getenv("REPORT_WORKERS", "2"))  # Overdue sweeper + report jobs
+    background += os.getenv("GROUP_COMMIT_ENABLED", "0") == "1"  # Group-commit writer
+    return {
+        "DB_POOL_SIZE": pool_size,
+        "DB_MAX_OVERFLOW": max_overflow,
+        "ADMISSION_CAPACITY": max(2, pool_size + max_overflow - background),
+    }
+
+def configure_pool():
+    """
+    Rebuild the engine with DB_POOL_SIZE / DB_MAX_OVERFLOW if set (PostgreSQL only) and
+    rebind SessionLocal to it. Call before the engine is first used. Returns the engine.
+    """
+    engine = database.engine
+    pool_size = os.getenv("DB_POOL_SIZE")
+    if not pool_size or engine.dialect.name != "postgresql":
+        return engine
+    engine = create_engine(
+        engine.url,
+        pool_size=int(pool_size),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "0")),
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+    database.engine.dispose()
+    database.engine = engine
+    database.SessionLocal.configure(bind=engine)
+    return engine
+
+def main():
+    import uvicorn
+
+    if database.engine.dialect.name == "postgresql":
+        for name, value in pool_settings(WORKERS).items():
+            os.environ.setdefault(name, str(value))
+        print(f"Starting {WORKERS} workers: pool {os.environ['DB_POOL_SIZE']}+{os.environ['DB_MAX_OVERFLOW']}, "
+              f"admission capacity {os.environ['ADMISSION_CAPACITY']} per worker")
+    else:
+        print(f"Starting {WORKERS} workers (default pool and admission limits)")
+
+    from . import main as app_module  # One-time startup work, before the workers race on it
+    app_module.engine.dispose()
+    app_module.start_singletons()
+
+    os.environ[LAUNCHED_ENV] = "1"  # Inherited by the workers
+    try:
+        uvicorn.run("backend.main:app", host=HOST, port=PORT, workers=WORKERS, proxy_headers=True)
+    finally:
+        app_module.stop_singletons()
+
+if __name__ == "__main__":
+    main()
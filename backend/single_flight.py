@@ -0,0 +1,154 @@
+"""
+Single-Flight Request Coalescing
+
+When a briefing starts, dozens of dashboards ask for the same `/analytics/unit_readiness`,
+`/tickets/` and `/reports/query` at once. Each call would run the same SQL. Here
+concurrent identical requests share one computation instead. They are keyed by
+(route, caller scope, params): the first caller (the leader) runs it, and callers that
+arrive while it is still running wait for its result, or its exception. Nothing is kept
+afterwards. That is report_cache.py's job, and it sits on top of this.
+
+    flights.do(key, fn)                 # sync handlers: fn() runs in the caller's thread
+    await flights.do_async(key, fn)     # async handlers: fn() runs in the threadpool
+
+fn must return plain values or Pydantic models, never ORM objects: its result is shared
+between requests whose sessions differ.
+
+The leader claims a heavy admission slot before computing (admission.claim_heavy), so
+callers that only wait hold a plain read slot.
+
+A caller never joins a computation that started before a write committed in this
+worker, or before a report-cache invalidation arrived from another worker over the bus.
+Otherwise a user could miss their own update. Coalescing counts are at
+GET /metrics/single_flight (per worker).
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .bus import bus
+from . import admission
+from . import models
+from . import report_cache
+
+WROTE_KEY = "single_flight_wrote"
+
+class _Flight:
+    __slots__ = ("future", "generation", "waiters")
+
+    def __init__(self, generation: int):
+        self.future: Future = Future()
+        self.generation = generation
+        self.waiters = 0
+
+def request_key(route: str, user: models.User, *params: Hashable) -> tuple:
+    """(route, caller scope, params): callers with the same visibility share results."""
+    return (route, report_cache.compile_scope(user), params)
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._generation = 0
+        # Counters per route (key[0])
+        self._calls: Dict[str, int] = defaultdict(int)
+        self._executions: Dict[str, int] = defaultdict(int)
+        self.max_waiters = 0
+
+    def bump(self):
+        """Something was written: later callers must not join computations already running."""
+        with self._lock:
+            self._generation += 1
+
+    def _join(self, key: Hashable) -> tuple:
+        """(flight, is_leader)."""
+        route = key[0] if isinstance(key, tuple) else str(key)
+        with self._lock:
+            self._calls[route] += 1
+            flight = self._flights.get(key)
+            if flight is not None and flight.generation == self._generation:
+                flight.waiters += 1
+                self.max_waiters = max(self.max_waiters, flight.waiters)
+                return flight, False
+            flight = _Flight(self._generation)
+            self._flights[key] = flight
+            self._executions[route] += 1
+            return flight, True
+
+    def _land(self, key: Hashable, flight: _Flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        flight, leader = self._join(key)
+        if not leader:
+            return flight.future.result()
+        try:
+            admission.claim_heavy()
+            result = fn()
+        except BaseException as e:
+            flight.future.set_exception(e)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            self._land(key, flight)
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        flight, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(flight.future)
+        try:
+            await admission.claim_heavy_async()
+            result = await run_in_threadpool(fn)
+        except BaseException as e:
+            flight.future.set_exception(e)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            self._land(key, flight)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            calls, executions = sum(self._calls.values()), sum(self._executions.values())
+            return {
+                "calls": calls,
+                "executions": executions,
+                "shared": calls - executions,
+                "coalescing_ratio": round((calls - executions) / calls, 3) if calls else 0.0,
+                "in_flight": len(self._flights),
+                "max_waiters": self.max_waiters,
+                "routes": {
+                    route: {"calls": n, "executions": self._executions[route]}
+                    for route, n in sorted(self._calls.items())
+                },
+            }
+
+flights = SingleFlight()
+
+# --- Hooks ---
+@event.listens_for(Session, "after_flush")
+def _note_write(session: Session, flush_context):
+    session.info[WROTE_KEY] = True
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed(session: Session):
+    if session.info.pop(WROTE_KEY, None):
+        flights.bump()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(WROTE_KEY, None)
+
+bus.subscribe(report_cache.CHANNEL, lambda payload: flights.bump())
@@ -0,0 +1,305 @@
+"""
+Columnar Snapshots (offline analysis)
+
+Point-in-time exports of equipment (joined with its catalog item), transaction_logs,
+maintenance_logs and verifications as NumPy `.npy` column files, so analysts can load
+full history locally instead of paging `/reports/query` JSON.
+
+Layout:  SNAPSHOT_DIR/<YYYYmmddTHHMMSS.ffffffZ>/
+    manifest.json                 tables, row counts, column kinds, change_seq at export
+    <table>/<column>.npy          int64 / float64 / bool / datetime64[us]
+    <table>/<column>.null.npy     bool mask, only for int/bool columns that contain NULLs
+    <table>/<column>.codes.npy    strings: int32 dictionary codes (-1 = NULL)
+    <table>/<column>.dict.npy     strings: the distinct values, indexed by code
+Floats use NaN and datetimes NaT for NULL. All tables are read in one transaction
+(REPEATABLE READ on Postgres, an explicit BEGIN on SQLite), and a snapshot directory only
+appears once complete. On SQLite without WAL that read lock makes writers wait for the export.
+
+Export:  python -m backend.snapshots   (or set SNAPSHOT_INTERVAL_HOURS to run it in the API)
+Read:    snap = snapshots.open_snapshot(); snap["equipment"]["status"].decode()
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import Boolean, DateTime, Float, Integer, func, select
+
+from .database import SessionLocal
+from . import models
+from . import changes
+
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "military_logistics_snapshots")
+)
+INTERVAL_HOURS = float(os.getenv("SNAPSHOT_INTERVAL_HOURS", "0"))  # 0 = no in-process schedule
+KEEP = int(os.getenv("SNAPSHOT_KEEP", "7"))
+BATCH = 5000
+
+def _tables():
+    E = models.Equipment
+    T = models.TransactionLog
+    M = models.MaintenanceLog
+    V = models.Verification
+    return {
+        "equipment": select(
+            E.id, E.serial_number, E.catalog_item_id,
+            models.CatalogItem.name.label("item_name"), models.CatalogItem.category,
+            E.status, E.sensitivity, E.unit_hierarchy, E.unit_id,
+            E.holder_user_id, E.owner_user_id, E.owner_location_id, E.actual_location_id,
+            E.custom_location, E.last_verified_at, E.version
+        ).outerjoin(models.CatalogItem, E.catalog_item_id == models.CatalogItem.id).order_by(E.id),
+        "transaction_logs": select(
+            T.id, T.equipment_id, T.involved_user_id, T.involved_location_id, T.timestamp,
+            T.user_status_at_time, T.event_type, T.is_returned_broken, T.broken_description, T.location
+        ).order_by(T.id),
+        "maintenance_logs": select(
+            M.id, M.equipment_id, M.fault_type_id, M.description, M.status, M.opened_at, M.closed_at,
+            M.repair_seconds, M.failure_gap_seconds, M.technician_id
+        ).order_by(M.id),
+        "verifications": select(
+            V.id, V.equipment_id, V.verification_type, V.reported_status, V.findings,
+            V.action_required, V.created_date, V.created_by
+        ).order_by(V.id),
+    }
+
+def _kind(sql_type) -> str:
+    if isinstance(sql_type, Boolean):
+        return "bool"
+    if isinstance(sql_type, Integer):
+        return "int"
+    if isinstance(sql_type, Float):
+        return "float"
+    if isinstance(sql_type, DateTime):
+        return "datetime"
+    return "str"
+
+# --- Writing ---
+class _ColumnWriter:
+    """Fills one preallocated memory-mapped column chunk by chunk."""
+
+    DTYPES = {"int": np.int64, "float": np.float64, "bool": np.bool_, "datetime": "datetime64[us]", "str": np.int32}
+
+    def __init__(self, directory: str, name: str, kind: str, rows: int):
+        self.directory = directory
+        self.name = name
+        self.kind = kind
+        filename = f"{name}.codes.npy" if kind == "str" else f"{name}.npy"
+        self.data = np.lib.format.open_memmap(
+            os.path.join(directory, filename), mode="w+", dtype=self.DTYPES[kind], shape=(rows,)
+        )
+        self.nulls = np.zeros(rows, dtype=np.bool_) if kind in ("int", "bool") else None
+        self.codes: Dict[str, int] = {}
+
+    def write(self, offset: int, values: list):
+        end = offset + len(values)
+        if self.kind == "str":
+            codes = self.codes
+            self.data[offset:end] = [
+                -1 if v is None else codes.setdefault(v, len(codes)) for v in values
+            ]
+        elif self.kind == "float":
+            self.data[offset:end] = [np.nan if v is None else v for v in values]
+        elif self.kind == "datetime":
+            self.data[offset:end] = np.array(values, dtype="datetime64[us]")  # None -> NaT
+        else:
+            self.nulls[offset:end] = [v is None for v in values]
+            self.data[offset:end] = [0 if v is None else v for v in values]
+
+    def close(self):
+        self.data.flush()
+        del self.data
+        if self.kind == "str":
+            dictionary = np.array(list(self.codes), dtype=str) if self.codes else np.array([], dtype="U1")
+            np.save(os.path.join(self.directory, f"{self.name}.dict.npy"), dictionary)
+        elif self.nulls is not None and self.nulls.any():
+            np.save(os.path.join(self.directory, f"{self.name}.null.npy"), self.nulls)
+
+def _export_table(conn, stmt, directory: str) -> dict:
+    os.makedirs(directory)
+    rows = conn.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar_one()
+    writers = [
+        _ColumnWriter(directory, c.name, _kind(c.type), rows) for c in stmt.selected_columns
+    ]
+    offset = 0
+    result = conn.execution_options(yield_per=BATCH).execute(stmt)
+    for chunk in result.partitions(BATCH):
+        if offset + len(chunk) > rows:
+            raise RuntimeError(f"{directory}: more rows than counted (snapshot is not isolated)")
+        for i, writer in enumerate(writers):
+            writer.write(offset, [r[i] for r in chunk])
+        offset += len(chunk)
+    for writer in writers:
+        writer.close()
+    if offset != rows:
+        raise RuntimeError(f"{directory}: fewer rows than counted (snapshot is not isolated)")
+    return {"rows": rows, "columns": {w.name: w.kind for w in writers}}
+
+def export(base_dir: str = SNAPSHOT_DIR) -> str:
+    """Write a new snapshot and return its directory. Prunes down to SNAPSHOT_KEEP snapshots."""
+    os.makedirs(base_dir, exist_ok=True)
+    taken_at = datetime.utcnow()
+    name = taken_at.strftime("%Y%m%dT%H%M%S.%fZ")
+    tmp_dir = tempfile.mkdtemp(prefix=f".{name}.", dir=base_dir)
+
+    db = SessionLocal()
+    try:
+        dialect = db.get_bind().dialect.name
+        options = {"isolation_level": "REPEATABLE READ"} if dialect == "postgresql" else {}
+        conn = db.connection(execution_options=options)
+        if dialect == "sqlite":
+            # pysqlite only opens a transaction before a write, so each SELECT would see the
+            # latest commit. BEGIN pins one read snapshot (taken at the first read) for the export.
+            conn.exec_driver_sql("BEGIN")
+        manifest = {
+            "taken_at": taken_at.isoformat() + "Z",
+            "change_seq": changes.current_seq(db),
+            "tables": {table: _export_table(conn, stmt, os.path.join(tmp_dir, table))
+                       for table, stmt in _tables().items()},
+        }
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        final_dir = os.path.join(base_dir, name)
+        os.rename(tmp_dir, final_dir)  # Readers never see a partial snapshot
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    finally:
+        db.close()
+
+    prune(base_dir)
+    return final_dir
+
+def list_snapshots(base_dir: str = SNAPSHOT_DIR) -> List[str]:
+    """Complete snapshot directories, oldest first."""
+    try:
+        names = os.listdir(base_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        os.path.join(base_dir, n) for n in names
+        if not n.startswith(".") and os.path.isfile(os.path.join(base_dir, n, "manifest.json"))
+    )
+
+def prune(base_dir: str = SNAPSHOT_DIR, keep: int = KEEP) -> int:
+    old = list_snapshots(base_dir)[:-keep] if keep > 0 else []
+    for path in old:
+        shutil.rmtree(path, ignore_errors=True)
+    return len(old)
+
+# --- Reading ---
+class DictColumn:
+    """A dictionary-encoded string column: `codes` (memory-mapped int32) + `dictionary`."""
+
+    def __init__(self, codes: np.ndarray, dictionary: np.ndarray):
+        self.codes = codes
+        self.dictionary = dictionary
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def code_of(self, value: str) -> int:
+        """Code for a value (-1 if absent), for fast filters: col.codes == col.code_of("Faulty")."""
+        hits = np.flatnonzero(self.dictionary == value)
+        return int(hits[0]) if len(hits) else -1
+
+    def decode(self) -> np.ndarray:
+        """Object array of strings, None for NULL."""
+        values = np.empty(len(self.dictionary) + 1, dtype=object)
+        values[:-1] = self.dictionary
+        values[-1] = None
+        return values[self.codes]  # -1 picks the trailing None
+
+class Table:
+    def __init__(self, directory: str, meta: dict):
+        self.directory = directory
+        self.rows = meta["rows"]
+        self.kinds: Dict[str, str] = meta["columns"]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.kinds)
+
+    def _load(self, filename: str, mmap: bool = True) -> np.ndarray:
+        path = os.path.join(self.directory, filename)
+        # Zero-length files cannot be memory-mapped
+        return np.load(path, mmap_mode="r" if mmap and self.rows else None)
+
+    def __getitem__(self, name: str):
+        kind = self.kinds[name]
+        if kind == "str":
+            return DictColumn(self._load(f"{name}.codes.npy"), self._load(f"{name}.dict.npy", mmap=False))
+        return self._load(f"{name}.npy")
+
+    def nulls(self, name: str) -> np.ndarray:
+        """Boolean NULL mask for any column."""
+        kind = self.kinds[name]
+        if kind == "str":
+            return self[name].codes == -1
+        if kind == "float":
+            return np.isnan(self[name])
+        if kind == "datetime":
+            return np.isnat(self[name])
+        path = os.path.join(self.directory, f"{name}.null.npy")
+        return np.load(path) if os.path.exists(path) else np.zeros(self.rows, dtype=np.bool_)
+
+class Snapshot:
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.taken_at: str = self.manifest["taken_at"]
+        self.change_seq: int = self.manifest["change_seq"]
+
+    @property
+    def tables(self) -> List[str]:
+        return list(self.manifest["tables"])
+
+    def __getitem__(self, table: str) -> Table:
+        return Table(os.path.join(self.directory, table), self.manifest["tables"][table])
+
+def open_snapshot(path: Optional[str] = None) -> Snapshot:
+    """Open a snapshot directory, or the newest one under SNAPSHOT_DIR."""
+    if path is None or not os.path.isfile(os.path.join(path, "manifest.json")):
+        found = list_snapshots(path or SNAPSHOT_DIR)
+        if not found:
+            raise FileNotFoundError(f"No snapshots under {path or SNAPSHOT_DIR}")
+        path = found[-1]
+    return Snapshot(path)
+
+# --- Schedule ---
+class SnapshotExporter:
+    def __init__(self, interval_hours: float = INTERVAL_HOURS):
+        self.interval = interval_hours * 3600
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                print(f"Snapshot written: {export()}")
+            except Exception as e:
+                print(f"Snapshot export failed: {e}")
+
+exporter = SnapshotExporter()
+
+if __name__ == "__main__":
+    path = export()
+    snap = open_snapshot(path)
+    print(f"Snapshot written: {path}")
+    for name in snap.tables:
+        print(f"  {name}: {snap[name].rows} rows")
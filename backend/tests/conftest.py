@@ -0,0 +1,95 @@
+"""
+Shared test fixtures.
+
+The app is imported once per run against a fresh file-backed SQLite database, so requests
+made from several threads use separate connections and really race. Tokens are minted
+directly (no bcrypt logins). Each factory call creates uniquely named rows, so tests don't
+need to clean up after each other.
+
+    python -m pytest backend/tests
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="logistics-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("INVALIDATION_BUS", "local")
+os.environ.setdefault("OVERDUE_SWEEP_SECONDS", "3600")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend.main import app  # noqa: E402  (creates the schema)
+from backend.database import SessionLocal  # noqa: E402
+from backend import models, security  # noqa: E402
+
+_ids = itertools.count(1)
+
+PROFILES = {
+    "Master": dict(can_view_all_equipment=True, can_change_assignment_others=True, can_change_maintenance_status=True),
+    "Battalion Tech Commander": dict(can_view_battalion_realtime=True, can_change_assignment_others=True, can_change_maintenance_status=True),
+    "Company Commander": dict(can_view_company_realtime=True, can_change_assignment_others=True, can_change_maintenance_status=True),
+    "Soldier": dict(),
+}
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def _profile_id(db, name: str) -> int:
+    profile = db.query(models.Profile).filter(models.Profile.name == name).first()
+    if profile is None:
+        profile = models.Profile(name=name, **PROFILES[name])
+        db.add(profile)
+        db.commit()
+    return profile.id
+
+@pytest.fixture
+def auth():
+    """auth(user) -> Authorization header for that user."""
+    def headers(user: models.User) -> dict:
+        return {"Authorization": f"Bearer {security.create_access_token(data={'sub': user.personal_number})}"}
+    return headers
+
+@pytest.fixture
+def make_user(db):
+    def make(profile: str = "Company Commander", unit: str = "188/53/A", role: str = "manager") -> models.User:
+        n = next(_ids)
+        user = models.User(
+            personal_number=f"t{n}", full_name=f"Test User {n}", password_hash="-",
+            role=role, profile_id=_profile_id(db, profile), unit_hierarchy=unit
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+@pytest.fixture
+def make_item(db):
+    def make(unit: str = "188/53/A", holder: models.User = None, catalog: str = "Radio 710") -> models.Equipment:
+        catalog_item = db.query(models.CatalogItem).filter(models.CatalogItem.name == catalog).first()
+        if catalog_item is None:
+            catalog_item = models.CatalogItem(name=catalog)
+            db.add(catalog_item)
+            db.commit()
+        item = models.Equipment(
+            catalog_item_id=catalog_item.id, serial_number=f"T-{next(_ids)}", unit_hierarchy=unit,
+            holder_user_id=holder.id if holder else None
+        )
+        db.add(item)
+        db.commit()
+        return item
+    return make
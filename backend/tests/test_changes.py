@@ -0,0 +1,67 @@
+"""Delta feeds (changes.py): /equipment/changes and /tickets/changes resume from a cursor and revoke."""
+from backend import models
+
+def _feed(client, path, headers, since, limit=500):
+    r = client.get(path, params={"since": since, "limit": limit}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+def _report_fault(client, headers, item, key):
+    r = client.post("/sync", json={"operations": [
+        {"idempotency_key": key, "type": "report_fault", "equipment_id": item.id, "fault_name": "No power"}
+    ]}, headers=headers)
+    return r.json()["results"][0]["ref_id"]
+
+def test_equipment_feed_pages_in_seq_order_and_resumes(client, make_user, make_item, auth):
+    soldier = make_user(profile="Soldier", role="user")
+    held = [make_item(holder=soldier) for _ in range(3)]
+    headers = auth(soldier)
+
+    seen, cursors, since = [], [], 0
+    while True:
+        page = _feed(client, "/equipment/changes", headers, since, limit=1)
+        seen += [i["id"] for i in page["items"]]
+        cursors.append(page["cursor"])
+        since = page["cursor"]
+        if not page["has_more"]:
+            break
+    assert seen == [i.id for i in held]  # Oldest change first, one per page
+    assert cursors == sorted(set(cursors))  # Strictly increasing
+
+    idle = _feed(client, "/equipment/changes", headers, since)
+    assert idle["items"] == [] and idle["cursor"] == since
+
+    _report_fault(client, headers, held[1], f"feed-{soldier.id}")
+    resumed = _feed(client, "/equipment/changes", headers, since)
+    assert [i["id"] for i in resumed["items"]] == [held[1].id]  # Only what changed after the cursor
+    assert resumed["cursor"] > since
+
+def test_transfer_out_of_scope_revokes_item_and_its_tickets(client, db, make_user, make_item, auth):
+    commander = make_user(unit="490/1/A")
+    soldier, other = (make_user(profile="Soldier", role="user", unit="490/1/A") for _ in range(2))
+    item, kept = make_item(unit="490/1/A", holder=soldier), make_item(unit="490/1/A", holder=soldier)
+    headers = auth(soldier)
+    ticket_id = _report_fault(client, headers, item, f"revoke-{soldier.id}")
+    kept_ticket = _report_fault(client, headers, kept, f"revoke-kept-{soldier.id}")
+
+    since = _feed(client, "/equipment/changes", headers, 0)["cursor"]
+    assert {t["id"] for t in _feed(client, "/tickets/changes", headers, 0)["items"]} == {ticket_id, kept_ticket}
+
+    r = client.post("/equipment/transfer", json={"equipment_id": item.id, "to_holder_id": other.id}, headers=auth(commander))
+    assert r.status_code == 200, r.text
+
+    equipment = _feed(client, "/equipment/changes", headers, since)
+    assert equipment["revoked_ids"] == [item.id] and equipment["items"] == []
+    tickets = _feed(client, "/tickets/changes", headers, since)
+    assert tickets["revoked_ids"] == [ticket_id] and tickets["items"] == []
+
+    # The new holder's first sync gets the item; nothing is revoked for them
+    theirs = _feed(client, "/equipment/changes", auth(other), 0)
+    assert [i["id"] for i in theirs["items"]] == [item.id] and theirs["revoked_ids"] == []
+
+    # Deleting a ticket that is still in scope leaves a tombstone instead
+    since = tickets["cursor"]
+    db.delete(db.get(models.MaintenanceLog, kept_ticket))
+    db.commit()
+    gone = _feed(client, "/tickets/changes", headers, since)
+    assert gone["deleted_ids"] == [kept_ticket] and gone["cursor"] > since
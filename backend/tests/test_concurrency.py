@@ -0,0 +1,71 @@
+"""Optimistic concurrency (concurrency.py): parallel transfers of one item lose no updates."""
+import threading
+
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend import models
+
+THREADS = 8
+ATTEMPTS = 5  # Transfers each thread tries
+
+def test_parallel_transfers_with_if_match_lose_no_updates(db, make_user, make_item, auth):
+    commander = make_user()
+    targets = [make_user(profile="Soldier", role="user") for _ in range(2)]
+    item = make_item(holder=commander)
+    start_version = item.version
+    start_logs = db.query(models.TransactionLog).filter(models.TransactionLog.equipment_id == item.id).count()
+    headers = auth(commander)
+
+    statuses, successes = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def worker(n: int):
+        client = TestClient(app)  # One client (and connection) per thread
+        version = start_version
+        barrier.wait()
+        for attempt in range(ATTEMPTS):
+            r = client.post(
+                "/equipment/transfer",
+                json={"equipment_id": item.id, "to_holder_id": targets[(n + attempt) % 2].id},
+                headers={**headers, "If-Match": f'"{version}"'},
+            )
+            with lock:
+                statuses.append(r.status_code)
+            if r.status_code == 200:
+                with lock:
+                    successes.append(r.json()["version"])
+                version = r.json()["version"]
+            elif r.status_code == 409:
+                version = r.json()["detail"]["current"]["version"]  # Retry from the state we lost to
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert set(statuses) <= {200, 409}, statuses
+    assert successes, "at least one transfer must win"
+    assert 409 in statuses, "the threads never raced; raise THREADS"
+
+    db.expire_all()
+    final = db.get(models.Equipment, item.id)
+    assert final.version == start_version + len(successes)
+    assert sorted(successes) == list(range(start_version + 1, final.version + 1))  # Each version won once
+    logs = db.query(models.TransactionLog).filter(models.TransactionLog.equipment_id == item.id).count()
+    assert logs == start_logs + len(successes)
+
+def test_stale_if_match_is_rejected_without_writing(client, db, make_user, make_item, auth):
+    commander = make_user()
+    item = make_item(holder=commander)
+    soldier = make_user(profile="Soldier", role="user")
+
+    r = client.post("/equipment/transfer", json={"equipment_id": item.id, "to_holder_id": soldier.id},
+                    headers={**auth(commander), "If-Match": f'"{item.version + 1}"'})
+
+    assert r.status_code == 409
+    assert r.json()["detail"]["current"]["version"] == item.version
+    db.expire_all()
+    assert db.get(models.Equipment, item.id).holder_user_id == commander.id
@@ -0,0 +1,50 @@
+"""Count sessions (reconciliation.py): every line outcome at close, and RECONCILE moves on apply."""
+from backend import models
+
+def _placed(db, item, place: str) -> models.Equipment:
+    item.custom_location = place
+    db.commit()
+    return item
+
+def test_close_classifies_every_scan_and_apply_moves_unexpected(client, db, make_user, make_item, auth):
+    counter = make_user(profile="Company Commander", unit="540/1/A")
+    headers = auth(counter)
+    place = f"Store {counter.id}"
+    found = _placed(db, make_item(unit="540/1/A"), place)
+    missing = _placed(db, make_item(unit="540/1/A"), place)
+    unexpected = _placed(db, make_item(unit="540/1/A"), "Workshop")
+    hidden = _placed(db, make_item(unit="541/1/A"), "Somewhere secret")
+    unknown = f"NO-SUCH-{counter.id}"
+
+    session = client.post("/counts", json={"custom_location": place}, headers=headers).json()["session_id"]
+    scans = [found.serial_number, unexpected.serial_number, unexpected.serial_number, hidden.serial_number, unknown]
+    assert client.post(f"/counts/{session}/scans", json={"serials": scans}, headers=headers).json()["scan_count"] == 5
+
+    closed = client.post(f"/counts/{session}/close", headers=headers).json()
+    assert closed["status"] == "closed"
+    assert closed["summary"] == {
+        "found": 1, "missing": 1, "unexpected": 1, "unknown": 1, "out_of_scope": 1, "expected": 2
+    }
+    assert client.post(f"/counts/{session}/scans", json={"serials": ["late"]}, headers=headers).status_code == 409
+
+    lines = {l["outcome"]: l for l in client.get(f"/counts/{session}/lines", headers=headers).json()["items"]}
+    assert (lines["found"]["equipment_id"], lines["found"]["scans"]) == (found.id, 1)
+    assert (lines["missing"]["equipment_id"], lines["missing"]["scans"]) == (missing.id, 0)
+    assert (lines["unexpected"]["equipment_id"], lines["unexpected"]["scans"]) == (unexpected.id, 2)
+    assert lines["unexpected"]["recorded_location"]  # Where the database had it
+    assert lines["unknown"]["serial"] == unknown and lines["unknown"]["equipment_id"] is None
+    hidden_line = lines["out_of_scope"]
+    assert hidden_line["equipment_id"] is None and hidden_line["recorded_location"] is None  # Nothing leaks
+
+    applied = client.post(f"/counts/{session}/apply", json={}, headers=headers).json()
+    assert (applied["moved"], applied["skipped"]) == (1, 0)
+    assert applied["session"]["status"] == "applied"
+
+    db.expire_all()
+    assert db.get(models.Equipment, unexpected.id).custom_location == place
+    assert db.get(models.Equipment, hidden.id).custom_location == "Somewhere secret"
+    log = db.query(models.TransactionLog).filter(
+        models.TransactionLog.equipment_id == unexpected.id, models.TransactionLog.event_type == "RECONCILE"
+    ).one()
+    assert (log.location, log.involved_user_id) == (place, counter.id)
+    assert client.post(f"/counts/{session}/apply", json={}, headers=headers).status_code == 409
@@ -0,0 +1,45 @@
+"""Custody history (custody.py): point-in-time holdings across a transfer and a pruned checkpoint."""
+from datetime import datetime, timedelta
+
+from backend import custody, models
+
+def _held(client, headers, user, at: datetime) -> set:
+    r = client.get("/custody/holdings", params={"at": at.isoformat(), "holder_user_id": user.id}, headers=headers)
+    assert r.status_code == 200, r.text
+    return {i["equipment_id"] for i in r.json()["items"]}
+
+def test_holdings_across_a_transfer_and_a_pruned_checkpoint(client, db, make_user, make_item, auth):
+    first, second = make_user(profile="Soldier", role="user"), make_user(profile="Soldier", role="user")
+    item = make_item(holder=first)
+    early = custody.checkpoint(db)
+    pruned = custody.checkpoint(db)
+    item.holder_user_id = second.id
+    db.commit()
+    late = custody.checkpoint(db)
+    early_id, pruned_id, late_id = early.id, pruned.id, late.id
+
+    # Move the history months back: two checkpoints in one old month, the third in the next
+    I = models.CustodyInterval
+    before, after = db.query(I).filter(I.equipment_id == item.id).order_by(I.id).all()
+    base = (datetime.utcnow() - timedelta(days=150)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    before.valid_from, before.valid_to, after.valid_from = base, base + timedelta(days=10), base + timedelta(days=10)
+    early.taken_at, pruned.taken_at, late.taken_at = base + timedelta(days=2), base + timedelta(days=5), base + timedelta(days=40)
+    db.commit()
+
+    headers = auth(make_user(profile="Master", role="master"))
+    probes = [base - timedelta(days=1), base + timedelta(days=7), base + timedelta(days=12), base + timedelta(days=45)]
+    expected = [(set(), set()), ({item.id}, set()), (set(), {item.id}), (set(), {item.id})]
+
+    def answers():
+        return [(_held(client, headers, first, at), _held(client, headers, second, at)) for at in probes]
+
+    assert answers() == expected
+    assert custody.prune(db) >= 1
+    remaining = {cp_id for cp_id, in db.query(models.CustodyCheckpoint.id).filter(
+        models.CustodyCheckpoint.id.in_([early_id, pruned_id, late_id])
+    )}
+    assert remaining == {early_id, late_id}  # Thinned to the first of each month
+    assert answers() == expected  # Day 7 is now answered from the earlier checkpoint
+
+    assert custody.interval_at(db, item.id, base + timedelta(days=7)).holder_user_id == first.id
+    assert custody.interval_at(db, item.id, base + timedelta(days=12)).holder_user_id == second.id
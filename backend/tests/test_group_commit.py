@@ -0,0 +1,62 @@
+"""Group commit (group_commit.py): a bad op fails alone and the rest of its batch still commits."""
+from sqlalchemy import event
+
+from backend import models
+from backend.group_commit import GroupCommitWriter
+
+def _batch(*ops):
+    """Run ops as exactly one batch: the window is long and max_batch closes it on the last op."""
+    writer = GroupCommitWriter(window=5.0, max_batch=len(ops))
+    futures = [writer.submit(op) for op in ops]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result(timeout=10))
+        except Exception as e:
+            outcomes.append(e)
+    writer.stop()
+    return writer, outcomes
+
+def _relocate(item_id: int, place: str, fail: bool = False):
+    def op(db):
+        db.get(models.Equipment, item_id).custom_location = place
+        if fail:
+            db.flush()  # Written before failing: the batch transaction is poisoned
+            raise ValueError("bad op")
+        return place
+    return op
+
+def _locations(db, *items):
+    db.expire_all()
+    return [db.get(models.Equipment, item.id).custom_location for item in items]
+
+def test_poisoned_op_is_dropped_and_the_batch_replayed(db, make_item):
+    a, b, c = (make_item(unit="550/1/A") for _ in range(3))
+
+    def rejected(db):
+        raise LookupError("not found")  # Fails before writing anything
+
+    writer, outcomes = _batch(_relocate(a.id, "gc-a"), rejected, _relocate(b.id, "gc-b", fail=True), _relocate(c.id, "gc-c"))
+    assert outcomes[0] == "gc-a" and outcomes[3] == "gc-c"
+    assert isinstance(outcomes[1], LookupError) and isinstance(outcomes[2], ValueError)
+    assert _locations(db, a, b, c) == ["gc-a", None, "gc-c"]
+    assert writer.replays == 1 and writer.fallbacks == 0  # Only the op that wrote forces a replay
+    assert (writer.batches, writer.ops, writer.failed) == (1, 4, 2)
+
+def test_failed_commit_falls_back_to_one_commit_per_op(db, make_item):
+    a, b, c = (make_item(unit="550/2/A") for _ in range(3))
+
+    def bad_at_commit(db):
+        """Passes flush but breaks whichever commit includes it."""
+        db.get(models.Equipment, b.id).custom_location = "gc-bad"
+
+        def boom(session):
+            raise RuntimeError("commit failed")
+        event.listen(db, "before_commit", boom, once=True)
+        return "gc-bad"
+
+    writer, outcomes = _batch(_relocate(a.id, "gc-a"), bad_at_commit, _relocate(c.id, "gc-c"))
+    assert outcomes[0] == "gc-a" and outcomes[2] == "gc-c"
+    assert isinstance(outcomes[1], RuntimeError)
+    assert _locations(db, a, b, c) == ["gc-a", None, "gc-c"]
+    assert writer.fallbacks == 1
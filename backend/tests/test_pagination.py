@@ -0,0 +1,41 @@
+"""Keyset pagination (pagination.py): NULL timestamps sort last and are never skipped."""
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from backend import models
+from backend.pagination import keyset_before, keyset_order, encode_cursor
+
+def test_paging_through_null_timestamps_visits_every_row_once(client, db, make_user, make_item, auth):
+    item = make_item(unit="480/1/A")
+    same = datetime(2026, 1, 1, 12, 0)
+    logs = [models.TransactionLog(equipment_id=item.id, event_type="HANDOVER", timestamp=ts)
+            for ts in (datetime(2026, 1, 2), same, same, same, same)]
+    db.add_all(logs)
+    db.commit()
+    # The column default fills a None on insert, so clear two timestamps afterwards
+    db.query(models.TransactionLog).filter(models.TransactionLog.id.in_([logs[3].id, logs[4].id])).update(
+        {models.TransactionLog.timestamp: None}, synchronize_session=False
+    )
+    db.commit()
+    master = make_user(profile="Master", role="master")
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/equipment/{item.id}/timeline", params=params, headers=auth(master)).json()
+        seen += [(row["source"], row["id"], row["timestamp"]) for row in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == len(set(seen)) == 5
+    assert [ts is None for _, _, ts in seen] == [False, False, False, True, True]
+
+def test_order_and_filter_agree_on_every_dialect():
+    log = models.TransactionLog
+    for dialect in (postgresql.dialect(), sqlite.dialect()):
+        order = ", ".join(str(c.compile(dialect=dialect)) for c in keyset_order(log.timestamp, log.id))
+        assert "NULLS LAST" in order
+    dated = str(keyset_before(log.timestamp, log.id, encode_cursor(datetime(2026, 1, 1), 7)).compile())
+    assert "timestamp IS NULL" in dated  # Undated rows are still ahead of a dated cursor
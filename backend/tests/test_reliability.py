@@ -0,0 +1,55 @@
+"""Reliability analytics (reliability.py): scoped unit rollups that follow units.move()."""
+from datetime import datetime, timedelta
+
+from backend import models, reliability, units
+
+def _close_ticket(db, item, hours: float = 2.0):
+    now = datetime.utcnow()
+    db.add(models.MaintenanceLog(
+        equipment_id=item.id, status="Closed", opened_at=now - timedelta(hours=hours), closed_at=now
+    ))
+    db.commit()
+    reliability.refresh(db)
+    db.commit()
+
+def _unit(db, path: str) -> models.Unit:
+    return db.query(models.Unit).filter(models.Unit.path == path).one()
+
+def test_unit_scoped_user_sees_only_their_subtree(client, db, make_user, make_item, auth):
+    _close_ticket(db, make_item(unit="410/1/A"))
+    _close_ticket(db, make_item(unit="420/1/A"))
+    battalion = make_user(profile="Battalion Tech Commander", unit="410/1/A")
+
+    rows = client.get("/analytics/reliability", params={"dimension": "unit"}, headers=auth(battalion)).json()
+    keys = {r["key"] for r in rows}
+    assert keys == {"410/1", "410/1/A"}  # Not the brigade above them, not the other brigade
+
+    asked_outside = client.get("/analytics/reliability", params={"dimension": "unit", "unit": "420"}, headers=auth(battalion))
+    assert asked_outside.json() == []
+
+def test_fleet_wide_rollups_need_an_all_units_scope(client, make_user, auth):
+    company = make_user(profile="Company Commander", unit="410/1/A")
+    soldier = make_user(profile="Soldier", role="user")
+    for user in (company, soldier):
+        assert client.get("/analytics/reliability", params={"dimension": "catalog"}, headers=auth(user)).status_code == 403
+        assert client.get("/analytics/fault_heatmap", headers=auth(user)).status_code == 403
+    assert client.get("/analytics/reliability", params={"dimension": "unit"}, headers=auth(soldier)).status_code == 403
+
+    master = make_user(profile="Master", role="master")
+    assert client.get("/analytics/fault_heatmap", headers=auth(master)).status_code == 200
+
+def test_unit_rollup_follows_a_move(client, db, make_user, make_item, auth):
+    _close_ticket(db, make_item(unit="430/1/A"))
+    _close_ticket(db, make_item(unit="430/2/B"))
+    master = make_user(profile="Master", role="master")
+
+    def repairs() -> dict:
+        rows = client.get("/analytics/reliability", params={"dimension": "unit", "unit": "430"}, headers=auth(master)).json()
+        return {r["key"]: r["repairs"] for r in rows}
+
+    assert repairs()["430/1"] == 1
+    units.move(db, _unit(db, "430/2"), _unit(db, "430/1"))
+    db.commit()
+    after = repairs()
+    assert after["430/1"] == 2 and after["430"] == 2
+    assert "430/2" not in after and after["430/1/2/B"] == 1
@@ -0,0 +1,46 @@
+"""Inventory report cache (report_cache.py): a committed write evicts only the scopes that cover it."""
+from datetime import datetime, timedelta
+
+from backend.report_cache import cache, compile_scope
+
+FILTERS = {"equipment_type": "Radio"}
+
+def _cached(user) -> bool:
+    scope = compile_scope(user)
+    return any(key[0] == scope for key in list(cache._entries))
+
+def test_write_evicts_ancestor_scopes_and_keeps_siblings(client, db, make_user, make_item, auth):
+    soldier = make_user(profile="Soldier", role="user", unit="530/1/A")
+    item = make_item(unit="530/1/A", holder=soldier)
+    item.last_verified_at = datetime.utcnow() - timedelta(days=3)
+    db.commit()
+    make_item(unit="530/1/B")
+    make_item(unit="530/2/A")
+    covering = [
+        make_user(profile="Master", role="master"),
+        make_user(profile="Battalion Tech Commander", unit="530/1/B"),  # Scope: battalion 530/1
+        make_user(profile="Company Commander", unit="530/1/A"),
+        soldier,
+    ]
+    siblings = [
+        make_user(profile="Battalion Tech Commander", unit="530/2/A"),
+        make_user(profile="Company Commander", unit="530/1/B"),
+        make_user(profile="Soldier", role="user", unit="530/1/A"),  # Same company, holds nothing
+    ]
+    before = client.get("/reports/query", params=FILTERS, headers=auth(covering[2])).json()
+    assert [r["reporting_status"] for r in before if r["id"] == item.id] == ["SEVERE"]  # Not verified for three days
+    for user in covering + siblings:
+        assert client.get("/reports/query", params=FILTERS, headers=auth(user)).status_code == 200
+        assert _cached(user)
+
+    r = client.post("/sync", json={"operations": [
+        {"idempotency_key": f"cache-{soldier.id}", "type": "verify", "equipment_id": item.id}
+    ]}, headers=auth(soldier))
+    assert r.json()["results"][0]["outcome"] == "applied"
+
+    assert [_cached(u) for u in covering] == [False] * len(covering)
+    assert [_cached(u) for u in siblings] == [True] * len(siblings)
+
+    # The next read in an evicted scope sees the write
+    rows = client.get("/reports/query", params=FILTERS, headers=auth(covering[2])).json()
+    assert [r["reporting_status"] for r in rows if r["id"] == item.id] == ["Reported"]
@@ -0,0 +1,58 @@
+"""Roster import (roster.py): inserts, upserted renames that reach the read model, and rejected rows."""
+from backend import models
+
+HEADER = "personal_number,full_name,password,unit_hierarchy,profile,role\n"
+
+def _import(client, headers, csv: str, upsert: bool = True):
+    r = client.post("/users/import", params={"upsert": upsert}, content=(HEADER + csv).encode(),
+                    headers={**headers, "Content-Type": "text/csv"})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+def test_import_inserts_updates_and_reports_rejected_rows(client, db, make_user, make_item, auth):
+    master = make_user(profile="Master", role="master")
+    headers = auth(master)
+    holder = make_user(profile="Soldier", role="user", unit="560/1/A")
+    item = make_item(unit="560/1/A", holder=holder)
+
+    def rows() -> dict:
+        return {r["id"]: r for r in client.get("/reports/query", headers=headers).json()}
+
+    assert rows()[item.id]["last_reporter"] == holder.full_name  # Cached for the all-units scope
+
+    n = f"r{holder.id}"
+    result = _import(client, headers, "\n".join([
+        f"{n}-new,Dana Newcomer,secret,560/2/A,,",                   # 2: created, unit 560/2 made on the fly
+        f"{holder.personal_number},Renamed Holder,,560/1/B,,",       # 3: updated (rename + transfer)
+        f"{n}-noname,,secret,,,",                                    # 4: missing full_name
+        f"{n}-role,Bad Role,secret,,,general",                       # 5: unknown role
+        f"{n}-nopass,No Password,,,,",                               # 6: new users need a password
+        f"{n}-new,Dana Again,secret,,,",                             # 7: duplicate in this roster
+        f"{n}-prof,Bad Profile,secret,,No Such Profile,",            # 8: unknown profile
+    ]) + "\n")
+
+    assert (result["created"], result["updated"], result["failed"]) == (1, 1, 5)
+    assert [e["row"] for e in result["errors"]] == [4, 5, 6, 7, 8]
+    assert "full_name" in result["errors"][0]["error"] and "role" in result["errors"][1]["error"]
+
+    db.expire_all()
+    created = db.query(models.User).filter(models.User.personal_number == f"{n}-new").one()
+    assert created.full_name == "Dana Newcomer" and created.unit.path == "560/2/A"
+    assert created.profile.name == "Soldier" and created.password_hash != "secret"
+    moved = db.get(models.User, holder.id)
+    assert (moved.full_name, moved.unit_hierarchy, moved.unit.path) == ("Renamed Holder", "560/1/B", "560/1/B")
+
+    read = db.get(models.EquipmentRead, item.id)
+    assert read.holder_name == "Renamed Holder"
+    assert rows()[item.id]["last_reporter"] == "Renamed Holder"  # The cached report was dropped
+
+    found = client.get("/users/typeahead", params={"q": "Newcomer"}, headers=headers).json()["items"]
+    assert created.id in {u["id"] for u in found}
+    assert db.query(models.User).filter(models.User.personal_number.like(f"{n}-%")).count() == 1
+
+def test_existing_users_are_rejected_without_upsert(client, make_user, auth):
+    master = make_user(profile="Master", role="master")
+    existing = make_user(profile="Soldier", role="user")
+    result = _import(client, auth(master), f"{existing.personal_number},Someone Else,,,,\n", upsert=False)
+    assert (result["created"], result["updated"], result["failed"]) == (0, 0, 1)
+    assert "upsert" in result["errors"][0]["error"]
@@ -0,0 +1,109 @@
+"""Single-flight coalescing (single_flight.py): one execution per key, shared results and errors."""
+import asyncio
+import threading
+import time
+
+from backend.single_flight import SingleFlight
+
+N = 20
+KEY = ("/analytics/unit_readiness", ("all",), ())
+
+def _wait_for_waiters(flights: SingleFlight, key, n: int, timeout: float = 5.0):
+    """Block the leader until n followers joined, so the test never depends on timing."""
+    deadline = time.monotonic() + timeout
+    while flights._flights[key].waiters < n:
+        assert time.monotonic() < deadline, "followers never joined"
+        time.sleep(0.001)
+
+def test_threads_share_one_execution():
+    flights = SingleFlight()
+    executions, results = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(N)
+
+    def compute():
+        executions.append(1)
+        _wait_for_waiters(flights, KEY, N - 1)
+        return {"ready": 42}
+
+    def caller():
+        barrier.wait()
+        result = flights.do(KEY, compute)
+        with lock:
+            results.append(result)
+
+    threads = [threading.Thread(target=caller) for _ in range(N)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(executions) == 1
+    assert results == [{"ready": 42}] * N
+    assert flights.metrics()["executions"] == 1 and flights.metrics()["calls"] == N
+
+def test_tasks_share_one_execution():
+    flights = SingleFlight()
+    executions = []
+
+    def compute():
+        executions.append(1)
+        _wait_for_waiters(flights, KEY, N - 1)
+        return 42
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do_async(KEY, compute) for _ in range(N)))
+
+    assert asyncio.run(scenario()) == [42] * N
+    assert len(executions) == 1
+
+def test_exception_reaches_every_waiter():
+    flights = SingleFlight()
+    executions, errors = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(N)
+
+    def compute():
+        executions.append(1)
+        _wait_for_waiters(flights, KEY, N - 1)
+        raise ValueError("report failed")
+
+    def caller():
+        barrier.wait()
+        try:
+            flights.do(KEY, compute)
+        except ValueError as e:
+            with lock:
+                errors.append(str(e))
+
+    threads = [threading.Thread(target=caller) for _ in range(N)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(executions) == 1
+    assert errors == ["report failed"] * N
+    assert flights.metrics()["in_flight"] == 0  # A later caller starts afresh
+
+def test_bump_starts_a_new_flight():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    results = {}
+
+    def before_write():
+        started.set()
+        release.wait(5)
+        return "stale"
+
+    leader = threading.Thread(target=lambda: results.setdefault("first", flights.do(KEY, before_write)))
+    leader.start()
+    assert started.wait(5)
+
+    flights.bump()  # A write committed while the first computation was running
+    results["second"] = flights.do(KEY, lambda: "fresh")  # Must not wait for the stale flight
+    release.set()
+    leader.join()
+
+    assert results == {"first": "stale", "second": "fresh"}
+    assert flights.metrics()["executions"] == 2
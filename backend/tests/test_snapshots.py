@@ -0,0 +1,42 @@
+"""Columnar snapshots (snapshots.py): one read snapshot for the whole export, also on SQLite."""
+import threading
+
+import numpy as np
+
+from backend import models, snapshots
+from backend.database import SessionLocal
+
+def test_commit_during_export_is_not_in_the_snapshot(tmp_path, monkeypatch, make_item):
+    before = make_item(unit="570/1/A")
+    catalog_item_id, serial = before.catalog_item_id, f"SNAP-{before.id}"
+    committed = threading.Event()
+    added = {}
+
+    def write_elsewhere():
+        with SessionLocal() as other:
+            item = models.Equipment(
+                catalog_item_id=catalog_item_id, serial_number=serial, unit_hierarchy="570/1/A"
+            )
+            other.add(item)
+            other.commit()
+            added["id"] = item.id
+        committed.set()
+
+    writer = threading.Thread(target=write_elsewhere)
+
+    class RacingWriter(snapshots._ColumnWriter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if writer.ident is None:
+                # Between the equipment count and its streaming query. With a read snapshot the
+                # commit either waits for the export (SQLite without WAL) or is simply not seen.
+                writer.start()
+                committed.wait(1.0)
+
+    monkeypatch.setattr(snapshots, "_ColumnWriter", RacingWriter)
+    snap = snapshots.open_snapshot(snapshots.export(str(tmp_path)))
+    writer.join(10)
+
+    ids = np.asarray(snap["equipment"]["id"])
+    assert before.id in ids and added["id"] not in ids
+    assert snap.manifest["tables"]["equipment"]["rows"] == len(ids)
@@ -0,0 +1,66 @@
+"""Offline sync (routers/sync.py): idempotent replay, stale-version conflicts and mixed batches."""
+from backend import models
+
+def _sync(client, headers, *ops):
+    r = client.post("/sync", json={"operations": list(ops)}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()["results"]
+
+def _logs(db, item) -> int:
+    db.expire_all()
+    return db.query(models.TransactionLog).filter(models.TransactionLog.equipment_id == item.id).count()
+
+def test_replayed_op_returns_the_original_result(client, db, make_user, make_item, auth):
+    soldier = make_user(profile="Soldier", role="user")
+    item = make_item(holder=soldier)
+    headers = auth(soldier)
+    op = {"idempotency_key": f"replay-{soldier.id}", "type": "verify", "equipment_id": item.id}
+
+    first, = _sync(client, headers, op)
+    assert first["outcome"] == "applied"
+    logs = _logs(db, item)
+
+    again, = _sync(client, headers, op)  # The device never saw the first response and retries
+    assert again["outcome"] == "duplicate"
+    assert again["ref_id"] == first["ref_id"] and again["version"] == first["version"]
+    assert _logs(db, item) == logs
+    assert db.query(models.SyncOperation).filter(models.SyncOperation.user_id == soldier.id).count() == 1
+
+def test_stale_base_version_is_a_conflict(client, db, make_user, make_item, auth):
+    soldier = make_user(profile="Soldier", role="user")
+    item = make_item(holder=soldier)
+    current = item.version
+    logs = _logs(db, item)
+
+    result, = _sync(client, auth(soldier), {
+        "idempotency_key": f"stale-{soldier.id}", "type": "report_fault", "equipment_id": item.id,
+        "fault_name": "Broken antenna", "base_version": current - 1,
+    })
+    assert result["outcome"] == "conflict"
+    assert result["version"] == current and result["status"] == item.status  # Server state to reconcile with
+    assert _logs(db, item) == logs
+    assert db.query(models.MaintenanceLog).filter(models.MaintenanceLog.equipment_id == item.id).count() == 0
+
+def test_mixed_batch_gets_one_result_per_op_in_order(client, db, make_user, make_item, auth):
+    soldier = make_user(profile="Soldier", role="user")
+    mine, stale = make_item(holder=soldier), make_item(holder=soldier)
+    someone_elses = make_item(holder=make_user(profile="Soldier", role="user"))
+    k = f"mixed-{soldier.id}"
+
+    results = _sync(client, auth(soldier),
+        {"idempotency_key": f"{k}-1", "type": "verify", "equipment_id": mine.id, "base_version": mine.version},
+        # Same item, same pre-batch version: a device's own queued ops don't conflict with each other
+        {"idempotency_key": f"{k}-2", "type": "report_fault", "equipment_id": mine.id,
+         "fault_name": "Cracked screen", "base_version": mine.version},
+        {"idempotency_key": f"{k}-3", "type": "verify", "equipment_id": stale.id, "base_version": stale.version + 1},
+        {"idempotency_key": f"{k}-4", "type": "verify", "equipment_id": someone_elses.id},
+        {"idempotency_key": f"{k}-5", "type": "verify", "equipment_id": 10**9},
+        {"idempotency_key": f"{k}-1", "type": "verify", "equipment_id": mine.id},
+    )
+    assert [(r["key"], r["outcome"]) for r in results] == [
+        (f"{k}-1", "applied"), (f"{k}-2", "applied"), (f"{k}-3", "conflict"),
+        (f"{k}-4", "rejected"), (f"{k}-5", "rejected"), (f"{k}-1", "duplicate"),
+    ]
+    assert results[5]["ref_id"] == results[0]["ref_id"]
+    ledger = db.query(models.SyncOperation.idempotency_key).filter(models.SyncOperation.user_id == soldier.id).all()
+    assert sorted(key for key, in ledger) == [f"{k}-1", f"{k}-2"]  # Only applied ops are recorded
@@ -0,0 +1,66 @@
+"""Unit hierarchy (units.py): closure-table resolve/subtree/move and the scope filters built on it."""
+import pytest
+
+from backend import models, units
+from backend.dependencies import apply_equipment_scope, get_visibility_scope, in_scope
+
+def _unit(db, path: str) -> models.Unit:
+    return db.query(models.Unit).filter(models.Unit.path == path).one()
+
+def _subtree_paths(db, path: str) -> set:
+    ids = units.subtree(_unit(db, path).id)
+    return {p for p, in db.query(models.Unit.path).filter(models.Unit.id.in_(ids))}
+
+def _visible(db, user) -> set:
+    return {i for i, in apply_equipment_scope(db.query(models.Equipment.id), user)}
+
+def test_resolve_creates_ancestors_once_with_closure_rows(db):
+    leaf = units.resolve(db.connection(), " 500 / 1 /A ")
+    db.commit()
+    assert units.resolve(db.connection(), "500/1/A") == leaf  # Normalized, idempotent
+
+    assert [(u.path, u.depth) for u in db.query(models.Unit).filter(models.Unit.path.like("500%")).order_by(models.Unit.path)] == [
+        ("500", 0), ("500/1", 1), ("500/1/A", 2)
+    ]
+    closure = {(a, d) for a, d in db.query(models.UnitClosure.ancestor_id, models.UnitClosure.depth).filter(
+        models.UnitClosure.descendant_id == leaf
+    )}
+    assert closure == {(_unit(db, "500").id, 2), (_unit(db, "500/1").id, 1), (leaf, 0)}
+    assert _subtree_paths(db, "500") == {"500", "500/1", "500/1/A"}
+
+def test_scope_matches_the_segment_aware_prefix_rule(db, make_user, make_item):
+    soldier = make_user(profile="Soldier", role="user", unit="510/5/A")
+    items = [make_item(unit=path) for path in ("510/5/A", "510/5/B", "510/53/A", "510/5", "511/5/A")]
+    items.append(make_item(unit="510/53/A", holder=soldier))
+    users = [
+        make_user(profile="Battalion Tech Commander", unit="510/5/A"),  # Battalion 510/5, not 510/53
+        make_user(profile="Company Commander", unit="510/5/A"),
+        soldier,
+    ]
+    ours = {i.id for i in items}
+    for user in users:
+        scope = get_visibility_scope(user)
+        expected = {i.id for i in items if in_scope(scope, i.unit_hierarchy, i.holder_user_id)}
+        assert _visible(db, user) & ours == expected
+
+    battalion, company, _ = users
+    assert _visible(db, battalion) & ours == {items[0].id, items[1].id, items[3].id}
+    assert _visible(db, company) & ours == {items[0].id}
+    assert _visible(db, soldier) == {items[5].id}
+
+def test_scope_follows_a_move(db, make_user, make_item):
+    battalion = make_user(profile="Battalion Tech Commander", unit="520/1/A")
+    moved = make_item(unit="520/2/B")
+    assert moved.id not in _visible(db, battalion)
+
+    units.move(db, _unit(db, "520/2"), _unit(db, "520/1"))
+    db.commit()
+    db.refresh(moved)
+    assert moved.id in _visible(db, battalion)
+    assert moved.unit_hierarchy == "520/1/2/B"  # Legacy path relabelled, so in_scope agrees
+    assert in_scope(get_visibility_scope(battalion), moved.unit_hierarchy, moved.holder_user_id)
+    assert _subtree_paths(db, "520/1") == {"520/1", "520/1/A", "520/1/2", "520/1/2/B"}
+
+    with pytest.raises(ValueError):
+        units.move(db, _unit(db, "520/1"), _unit(db, "520/1/2"))  # Under its own subunit
+    db.rollback()
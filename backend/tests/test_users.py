@@ -0,0 +1,33 @@
+"""User search (routers/users.py): typeahead and listing stay inside the caller's units."""
+
+def test_holder_without_unit_finds_nobody(client, make_user, auth):
+    target = make_user(profile="Soldier", role="user", unit="440/1/A")
+    loner = make_user(profile="Soldier", role="user", unit=None)
+
+    r = client.get("/users/typeahead", params={"q": target.full_name}, headers=auth(loner))
+    assert r.status_code == 200
+    assert r.json()["items"] == []
+    assert client.get("/users", params={"q": target.personal_number}, headers=auth(loner)).json()["items"] == []
+
+def test_listing_is_scoped_and_prefix_matched(client, db, make_user, auth):
+    commander = make_user(profile="Company Commander", unit="450/1/A")
+    mate = make_user(profile="Soldier", role="user", unit="450/1/A")
+    mate.full_name = "Yossi Zalmanovich"
+    db.commit()
+    outsider = make_user(profile="Soldier", role="user", unit="460/1/A")
+    headers = auth(commander)
+
+    listed = {u["id"] for u in client.get("/users", params={"limit": 200}, headers=headers).json()["items"]}
+    assert {commander.id, mate.id} <= listed and outsider.id not in listed
+
+    found = {u["id"] for u in client.get("/users", params={"q": "zalman"}, headers=headers).json()["items"]}
+    assert found == {mate.id}  # Any word of the name is a prefix key
+    assert client.get("/users", params={"q": outsider.personal_number}, headers=headers).json()["items"] == []
+    # Anchored: a fragment from the middle of a word does not match
+    assert client.get("/users", params={"q": "almanov"}, headers=headers).json()["items"] == []
+
+def test_all_units_scope_lists_everyone(client, make_user, auth):
+    master = make_user(profile="Master", role="master")
+    outsider = make_user(profile="Soldier", role="user", unit="470/1/A")
+    found = client.get("/users", params={"q": outsider.personal_number}, headers=auth(master)).json()["items"]
+    assert outsider.id in {u["id"] for u in found}
@@ -0,0 +1,420 @@
+"""
+Traffic Capture & Replay
+
+Synthetic benchmarks (benchmark.py) hit a fixed read mix. This module records what real
+users actually send, so a change can be measured against a real Monday-morning roll call.
+
+Capture (opt-in): set TRAFFIC_CAPTURE_DIR and every worker appends its requests to
+    TRAFFIC_CAPTURE_DIR/traffic-<YYYYmmddTHHMMSS>-<pid>.ndjson.gz
+One JSON object per line: arrival offset, method, route template, path, query, JSON
+body, caller, status and latency. The middleware only queues the request; a background
+thread sanitizes and writes it, so requests do not wait on disk. If the queue is full, the
+record is dropped.
+- Passwords, tokens and secrets in bodies and query strings are replaced by "REDACTED".
+  Personal data (PERSONAL: personal numbers, names, the typeahead `q`) is replaced by its
+  pseudonym, so repeated values still repeat on replay, but searches no longer match.
+  /login, /metrics/* and the docs are not recorded. Non-JSON bodies (e.g. a CSV roster)
+  are not stored, and such requests are skipped on replay.
+- The caller is a pseudonym (HMAC of the personal number with SECRET_KEY) plus their
+  scope: role, profile and unit. Personal numbers, names and tokens are never written.
+
+Replay:
+    python -m backend.traffic traces/*.ndjson.gz --db sqlite:///fixture.db --speed 4 --out after.json
+    python -m backend.traffic traces/*.ndjson.gz --db sqlite:///fixture.db --compare before.json
+
+Replay runs the in-process app (with its startup/shutdown hooks) against --db. It re-issues
+each request at its recorded offset divided by --speed (0 = as fast as --concurrency allows),
+then prints p50/p95 per route, against the recorded latencies or, with --compare, against
+an earlier replay. Compare against an earlier replay when judging a change: recorded
+latencies come from other hardware and another database size. Callers map to fixture users
+with the same pseudonym (fixture restored from production, same SECRET_KEY), otherwise
+to a user with the same role/profile/unit, then role/profile, then role. Tokens are minted
+directly, so no logins are replayed. Writes are replayed too (unless --skip-writes): point
+--db at a disposable copy, restored fresh before each run.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from fastapi import Request
+
+CAPTURE_DIR = os.getenv("TRAFFIC_CAPTURE_DIR", "")
+MAX_BODY = int(os.getenv("TRAFFIC_CAPTURE_MAX_BODY", "65536"))  # Larger JSON bodies are not stored
+QUEUE_SIZE = int(os.getenv("TRAFFIC_CAPTURE_QUEUE", "10000"))
+FLUSH_SECONDS = 5.0
+
+SKIP_PATHS = ("/login", "/docs", "/redoc", "/openapi.json")
+SKIP_PREFIXES = ("/metrics/",)
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+SENSITIVE = ("password", "token", "secret")
+PERSONAL = ("personal_number", "full_name", "holder_name", "q")  # Exact keys
+REDACTED = "REDACTED"
+
+# --- Sanitizing ---
+def _sensitive(key: str) -> bool:
+    key = key.lower()
+    return any(s in key for s in SENSITIVE)
+
+def _scrub(key: str, value):
+    if _sensitive(key):
+        return REDACTED
+    if key.lower() in PERSONAL and isinstance(value, (str, int)):
+        return pseudonym(str(value))
+    return redact(value)
+
+def redact(value):
+    """Copy of a JSON value with password/token/secret fields replaced and personal fields pseudonymized."""
+    if isinstance(value, dict):
+        return {k: _scrub(str(k), v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v) for v in value]
+    return value
+
+def pseudonym(personal_number: str) -> str:
+    from . import security
+
+    return hmac.new(security.SECRET_KEY.encode(), personal_number.encode(), hashlib.sha256).hexdigest()[:16]
+
+# --- Capture ---
+class Recorder:
+    def __init__(self, directory: str = CAPTURE_DIR):
+        self.directory = directory
+        self.enabled = bool(directory)
+        self.recorded = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._started = time.time()
+        self._callers: Dict[str, tuple] = {}  # personal_number -> (pseudonym, scope); reset each flush
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._started = time.time()
+        stamp = datetime.utcfromtimestamp(self._started).strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.directory, f"traffic-{stamp}-{os.getpid()}.ndjson.gz")
+        self._thread = threading.Thread(target=self._run, args=(path,), name="traffic-recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+
+    def record(self, entry: dict):
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self, path: str):
+        with gzip.open(path, "wt", encoding="utf-8") as out:
+            out.write(json.dumps({"trace": 1, "started": self._started, "host": socket.gethostname(), "pid": os.getpid()}) + "\n")
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    entry = self._queue.get(timeout=FLUSH_SECONDS)
+                except queue.Empty:
+                    entry = False
+                if entry is None:
+                    break
+                if entry:
+                    try:
+                        out.write(json.dumps(self._sanitize(entry), separators=(",", ":")) + "\n")
+                        self.recorded += 1
+                    except Exception as e:
+                        print(f"Traffic record dropped: {e}")
+                        self.dropped += 1
+                if time.monotonic() - last_flush >= FLUSH_SECONDS:
+                    out.flush()
+                    out.buffer.flush(zlib.Z_SYNC_FLUSH)  # Readable up to here even if the worker dies
+                    self._callers.clear()
+                    last_flush = time.monotonic()
+        print(f"Traffic capture {path}: {self.recorded} requests, {self.dropped} dropped")
+
+    def _caller(self, authorization: Optional[str]) -> tuple:
+        """(pseudonym, scope) of the bearer token's user, or (None, None)."""
+        if not authorization or not authorization.lower().startswith("bearer "):
+            return None, None
+        from jose import JWTError, jwt
+        from . import models, security
+        from .database import SessionLocal
+
+        try:
+            claims = jwt.decode(authorization[7:], security.SECRET_KEY, algorithms=[security.ALGORITHM],
+                                options={"verify_exp": False})
+        except JWTError:
+            return None, None
+        personal_number = claims.get("sub")
+        if not personal_number:
+            return None, None
+        if personal_number not in self._callers:
+            with SessionLocal() as db:
+                user = db.query(models.User).filter(models.User.personal_number == personal_number).first()
+                scope = None if user is None else {
+                    "role": user.role,
+                    "profile": user.profile.name if user.profile else None,
+                    "unit": user.unit_hierarchy,
+                }
+            self._callers[personal_number] = (pseudonym(personal_number), scope)
+        return self._callers[personal_number]
+
+    def _sanitize(self, entry: dict) -> dict:
+        user, scope = self._caller(entry.pop("authorization"))
+        raw, body = entry.pop("raw_body"), None
+        if raw:
+            try:
+                body = redact(json.loads(raw))
+            except ValueError:
+                entry["body_skipped"] = True
+        entry["t"] = round(entry["t"] - self._started, 4)
+        entry["query"] = [[k, _scrub(k, v)] for k, v in parse_qsl(entry["query"], keep_blank_values=True)]
+        entry["body"] = body
+        entry["user"] = user
+        entry["scope"] = scope
+        return entry
+
+recorder = Recorder()
+
+async def middleware(request: Request, call_next):
+    path = request.url.path
+    if path in SKIP_PATHS or path.startswith(SKIP_PREFIXES) or request.method == "OPTIONS":
+        return await call_next(request)
+    raw_body, body_skipped = None, False
+    if request.method in WRITE_METHODS:
+        size = int(request.headers.get("content-length") or 0)
+        if request.headers.get("content-type", "").startswith("application/json") and size <= MAX_BODY:
+            raw_body = await request.body()  # Cached by Starlette for the endpoint
+        else:
+            body_skipped = size > 0
+    arrived = time.time()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        entry = {
+            "t": arrived,
+            "method": request.method,
+            "route": getattr(route, "path", path),
+            "path": path,
+            "query": request.url.query,
+            "raw_body": raw_body,
+            "authorization": request.headers.get("authorization"),
+            "status": status,
+            "ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        if body_skipped:
+            entry["body_skipped"] = True
+        recorder.record(entry)
+
+# --- Replay ---
+def load(paths: List[str]) -> List[dict]:
+    """All records from these trace files, ordered by absolute arrival time ("at")."""
+    records = []
+    for path in paths:
+        started = None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn last line
+                    if "trace" in entry:
+                        started = entry["started"]
+                        continue
+                    entry["at"] = started + entry["t"]
+                    records.append(entry)
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            pass  # Worker died before closing its file: keep what was flushed
+    records.sort(key=lambda e: e["at"])
+    return records
+
+def map_callers(db, records: List[dict]) -> Dict[str, str]:
+    """Trace pseudonym -> fixture personal_number (same user if present, else same scope)."""
+    from . import models
+
+    users = [u for u in db.query(models.User).all() if u.is_active_duty]
+    by_pseudonym = {pseudonym(u.personal_number): u.personal_number for u in users}
+    buckets = defaultdict(list)
+    for u in users:
+        profile = u.profile.name if u.profile else None
+        buckets[(u.role, profile, u.unit_hierarchy)].append(u.personal_number)
+        buckets[(u.role, profile)].append(u.personal_number)
+        buckets[(u.role,)].append(u.personal_number)
+    cycles = {key: itertools.cycle(numbers) for key, numbers in buckets.items()}
+
+    mapping = {}
+    for entry in records:
+        user, scope = entry.get("user"), entry.get("scope")
+        if user is None or user in mapping:
+            continue
+        if user in by_pseudonym:
+            mapping[user] = by_pseudonym[user]
+        elif scope:
+            for key in ((scope["role"], scope["profile"], scope["unit"]), (scope["role"], scope["profile"]), (scope["role"],)):
+                if key in cycles:
+                    mapping[user] = next(cycles[key])
+                    break
+    return mapping
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+async def replay(app, records: List[dict], tokens: Dict[str, str], speed: float, concurrency: int) -> dict:
+    import httpx
+
+    results, skipped = [], defaultdict(int)
+    limit = asyncio.Semaphore(concurrency)
+    max_lag = 0.0
+
+    async def send(client, entry, token):
+        async with limit:
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            started = time.perf_counter()
+            try:
+                response = await client.request(entry["method"], entry["path"], params=entry["query"],
+                                                json=entry["body"], headers=headers)
+                status = response.status_code
+            except Exception:
+                status = 599
+            results.append((entry, (time.perf_counter() - started) * 1000, status))
+
+    loop = asyncio.get_running_loop()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+            tasks, first, t0 = [], records[0]["at"] if records else 0.0, loop.time()
+            for entry in records:
+                if entry.get("body_skipped"):
+                    skipped["body not captured"] += 1
+                    continue
+                token = None
+                if entry.get("user"):
+                    token = tokens.get(entry["user"])
+                    if token is None:
+                        skipped["no matching fixture user"] += 1
+                        continue
+                if speed > 0:
+                    delay = (entry["at"] - first) / speed - (loop.time() - t0)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        max_lag = max(max_lag, -delay)
+                tasks.append(asyncio.create_task(send(client, entry, token)))
+            await asyncio.gather(*tasks)
+            elapsed = loop.time() - t0
+
+    routes = defaultdict(lambda: {"recorded": [], "replayed": [], "status_changed": 0, "statuses": defaultdict(int)})
+    for entry, ms, status in results:
+        for key in (f"{entry['method']} {entry['route']}", "ALL"):
+            stats = routes[key]
+            stats["recorded"].append(entry["ms"])
+            stats["replayed"].append(ms)
+            stats["status_changed"] += status != entry["status"]
+            stats["statuses"][str(status)] += 1
+    report = {
+        "replayed": len(results),
+        "skipped": dict(skipped),
+        "speed": speed,
+        "seconds": round(elapsed, 2),
+        "max_lag_ms": round(max_lag * 1000, 1),
+        "routes": {},
+    }
+    for key, stats in routes.items():
+        report["routes"][key] = {
+            "n": len(stats["replayed"]),
+            "recorded_p50": _percentile(stats["recorded"], 0.50),
+            "recorded_p95": _percentile(stats["recorded"], 0.95),
+            "p50": _percentile(stats["replayed"], 0.50),
+            "p95": _percentile(stats["replayed"], 0.95),
+            "total_ms": round(sum(stats["replayed"]), 1),
+            "status_changed": stats["status_changed"],
+            "statuses": dict(sorted(stats["statuses"].items())),
+        }
+    return report
+
+def _delta(new: float, old: float) -> str:
+    return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    against = "baseline" if baseline else "recorded"
+    print(f"Replayed {report['replayed']} requests in {report['seconds']}s at speed {report['speed'] or 'max'} "
+          f"(max lag {report['max_lag_ms']}ms); skipped: {report['skipped'] or 'none'}")
+    print(f"{'route':<48} {'n':>6} {against + ' p50/p95':>20} {'replay p50/p95':>18} {'Δp50':>7} {'Δp95':>7} {'status≠':>8}")
+    rows = sorted(report["routes"].items(), key=lambda kv: (kv[0] != "ALL", -kv[1]["total_ms"]))
+    for key, stats in rows:
+        if baseline:
+            old = baseline["routes"].get(key, {})
+            old_p50, old_p95 = old.get("p50", 0.0), old.get("p95", 0.0)
+        else:
+            old_p50, old_p95 = stats["recorded_p50"], stats["recorded_p95"]
+        before = f"{old_p50}/{old_p95}"
+        after = f"{stats['p50']}/{stats['p95']}"
+        print(f"{key[:48]:<48} {stats['n']:>6} {before:>20} {after:>18} "
+              f"{_delta(stats['p50'], old_p50):>7} {_delta(stats['p95'], old_p95):>7} {stats['status_changed']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="+", help="Trace files (traffic-*.ndjson.gz)")
+    parser.add_argument("--db", help="Fixture DATABASE_URL (default: $DATABASE_URL)")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, N = N times faster, 0 = no pacing")
+    parser.add_argument("--concurrency", type=int, default=256, help="Max requests in flight")
+    parser.add_argument("--skip-writes", action="store_true", help="Replay only GET requests")
+    parser.add_argument("--out", help="Write the report as JSON (input for a later --compare)")
+    parser.add_argument("--compare", help="Earlier --out report to compare against")
+    args = parser.parse_args()
+
+    if args.db:
+        os.environ["DATABASE_URL"] = args.db
+    os.environ.pop("TRAFFIC_CAPTURE_DIR", None)  # Don't record the replay itself
+    from . import security
+    from .database import SessionLocal
+    from .main import app
+
+    records = load(args.traces)
+    if args.skip_writes:
+        records = [e for e in records if e["method"] not in WRITE_METHODS]
+    if not records:
+        sys.exit("No requests in the given traces")
+    with SessionLocal() as db:
+        callers = map_callers(db, records)
+    tokens = {user: security.create_access_token(data={"sub": number}) for user, number in callers.items()}
+
+    report = asyncio.run(replay(app, records, tokens, args.speed, args.concurrency))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Unit Hierarchy (units + unit_closure)
+
+The tree used to exist only as slash strings ("188/53/A") matched with `startswith`,
+which also let "188/5" match "188/53". Now every path is a `units` row and
+`unit_closure` holds every (ancestor, descendant) pair, so "all units under X" is one
+indexed lookup and scope filters compare unit ids instead of string prefixes.
+
+- Writers keep setting `unit_hierarchy` as before; a before_flush hook resolves it to
+  `unit_id` (creating missing units and their closure rows on the fly).
+- `move()` re-parents a subtree by rewriting closure rows only; scope follows at once.
+  The legacy path strings are then relabelled per unit with set-based UPDATEs.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, func, inspect, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from . import changes
+from . import read_model
+
+BATTALION_DEPTH = 1  # "188" = brigade (0), "188/53" = battalion (1), "188/53/A" = company (2)
+
+def normalize(path: Optional[str]) -> Optional[str]:
+    if not path:
+        return None
+    segments = [s.strip() for s in path.split("/") if s.strip()]
+    return "/".join(segments) or None
+
+def path_within(path: Optional[str], ancestor: str) -> bool:
+    """Segment-aware prefix test: "188/53/A" is within "188/53", "188/53" is not within "188/5"."""
+    return bool(path) and (path == ancestor or path.startswith(f"{ancestor}/"))
+
+def brigade_of(path: Optional[str]) -> str:
+    """Top segment of a path ("188/53/A" -> "188"); "" for no unit. The partition key of transaction_logs."""
+    path = normalize(path)
+    return path.split("/")[0] if path else ""
+
+def subtree(unit_id: int):
+    """SELECT of every unit id under (and including) unit_id, for use in IN (...) filters."""
+    return select(models.UnitClosure.descendant_id).where(models.UnitClosure.ancestor_id == unit_id)
+
+def battalion_of(unit: models.Unit) -> models.Unit:
+    """The battalion-level ancestor of a unit (the unit itself if it is a battalion or brigade)."""
+    while unit.depth > BATTALION_DEPTH and unit.parent is not None:
+        unit = unit.parent
+    return unit
+
+def resolve(conn, path: Optional[str]) -> Optional[int]:
+    """
+    Unit id for a path, creating the unit and any missing ancestors (with closure rows).
+    Each insert runs in a savepoint, so a concurrent request creating the same path is not an error.
+    """
+    path = normalize(path)
+    if not path:
+        return None
+    segments = path.split("/")
+    prefixes = ["/".join(segments[:i + 1]) for i in range(len(segments))]
+    units = models.Unit.__table__
+    closure = models.UnitClosure.__table__
+    known = dict(conn.execute(select(units.c.path, units.c.id).where(units.c.path.in_(prefixes))).all())
+
+    parent_id = None
+    for depth, prefix in enumerate(prefixes):
+        unit_id = known.get(prefix)
+        if unit_id is None:
+            try:
+                with conn.begin_nested():
+                    unit_id = conn.execute(units.insert().values(
+                        name=segments[depth], path=prefix, parent_id=parent_id, depth=depth
+                    )).inserted_primary_key[0]
+                    conn.execute(closure.insert().values(ancestor_id=unit_id, descendant_id=unit_id, depth=0))
+                    if parent_id is not None:
+                        conn.execute(closure.insert().from_select(
+                            ["ancestor_id", "descendant_id", "depth"],
+                            select(closure.c.ancestor_id, literal(unit_id), closure.c.depth + 1).where(
+                                closure.c.descendant_id == parent_id
+                            )
+                        ))
+            except IntegrityError:
+                # Another request created the same unit first (units.path is unique): use theirs
+                unit_id = conn.execute(select(units.c.id).where(units.c.path == prefix)).scalar_one()
+        parent_id = unit_id
+    return parent_id
+
+def backfill(session: Session) -> int:
+    """Resolve unit_id for rows written before the units table existed. Commits if anything changed."""
+    conn = session.connection()
+    targets = [
+        (models.User, func.coalesce(models.User.unit_hierarchy, models.User.unit_path)),
+        (models.Equipment, models.Equipment.unit_hierarchy),
+        (models.EquipmentRead, models.EquipmentRead.unit_hierarchy),
+        (models.Tombstone, models.Tombstone.unit_hierarchy),
+    ]
+    updated = 0
+    for model, path_col in targets:
+        paths = [r[0] for r in conn.execute(
+            select(path_col).where(model.unit_id.is_(None), path_col.isnot(None)).distinct()
+        )]
+        for path in paths:
+            unit_id = resolve(conn, path)
+            if unit_id is None:
+                continue
+            updated += conn.execute(
+                update(model.__table__).where(model.unit_id.is_(None), path_col == path).values(unit_id=unit_id)
+            ).rowcount
+    if updated:
+        session.commit()
+    return updated
+
+def move(session: Session, unit: models.Unit, new_parent: Optional[models.Unit]) -> int:
+    """
+    Re-parent `unit` (and its subtree) under `new_parent` (None = new root).
+    Raises ValueError on a cycle or a path clash. Returns the number of equipment rows relabelled.
+    Does not commit.
+    """
+    conn = session.connection()
+    closure = models.UnitClosure.__table__
+    members = conn.execute(
+        select(closure.c.descendant_id, closure.c.depth).where(closure.c.ancestor_id == unit.id)
+    ).all()
+    member_ids = [m.descendant_id for m in members]
+    if new_parent is not None and new_parent.id in member_ids:
+        raise ValueError("Cannot move a unit under itself or its own subunit")
+
+    new_path = f"{new_parent.path}/{unit.name}" if new_parent else unit.name
+    if new_path != unit.path and session.query(models.Unit.id).filter(models.Unit.path == new_path).first():
+        raise ValueError(f"Unit {new_path} already exists")
+
+    # 1. Closure: cut the links to the old ancestors, add the cross product with the new ones
+    conn.execute(closure.delete().where(
+        closure.c.descendant_id.in_(member_ids), closure.c.ancestor_id.notin_(member_ids)
+    ))
+    if new_parent is not None:
+        ancestors = conn.execute(
+            select(closure.c.ancestor_id, closure.c.depth).where(closure.c.descendant_id == new_parent.id)
+        ).all()
+        conn.execute(closure.insert(), [
+            {"ancestor_id": a.ancestor_id, "descendant_id": m.descendant_id, "depth": a.depth + m.depth + 1}
+            for a in ancestors for m in members
+        ])
+
+    # 2. Paths and depths of the moved nodes
+    old_path = unit.path
+    old_parent_id = unit.parent_id
+    depth_shift = (new_parent.depth + 1 if new_parent else 0) - unit.depth
+    moved = session.query(models.Unit).filter(models.Unit.id.in_(member_ids)).all()
+    for node in moved:
+        node.path = new_path + node.path[len(old_path):]
+        node.depth += depth_shift
+    unit.parent_id = new_parent.id if new_parent else None
+    session.flush()
+
+    # 3. Legacy path strings (display/grouping only; scope already follows unit_id)
+    seq = changes.next_seq(session)
+    relabelled = 0
+    for node in moved:
+        session.query(models.User).filter(models.User.unit_id == node.id).update(
+            {"unit_hierarchy": node.path}, synchronize_session=False
+        )
+        relabelled += session.query(models.Equipment).filter(models.Equipment.unit_id == node.id).update(
+            {"unit_hierarchy": node.path, "change_seq": seq, "version": models.Equipment.version + 1},
+            synchronize_session=False
+        )
+    equipment_ids = [r[0] for r in session.query(models.Equipment.id).filter(models.Equipment.unit_id.in_(member_ids))]
+    if old_parent_id is not None and equipment_ids:
+        # The items left the old parent's ancestors' scopes without their unit_id changing:
+        # mark them there for delta clients (changes.revoked drops scopes that still contain them)
+        old_parent = session.get(models.Unit, old_parent_id)
+        conn.execute(models.Tombstone.__table__.insert(), [
+            {"entity": "equipment", "entity_id": equipment_id, "change_seq": seq, "kind": "left_scope",
+             "unit_hierarchy": old_parent.path, "unit_id": old_parent_id, "holder_user_id": None}
+            for equipment_id in equipment_ids
+        ])
+    read_model.refresh(session, equipment_ids)
+    if brigade_of(new_path) != brigade_of(old_path):
+        from . import partitions  # Imports units
+        partitions.relabel(session, equipment_ids, brigade_of(new_path))
+    return relabelled
+
+def tree(session: Session, root_id: Optional[int] = None) -> List[dict]:
+    """
+    The unit tree (or the subtree under root_id) as nested dicts with per-node counts:
+    direct and subtree totals of members (users) and equipment. Four GROUP BY queries in total.
+    """
+    closure = models.UnitClosure
+    node_query = session.query(models.Unit)
+    if root_id is not None:
+        node_query = node_query.filter(models.Unit.id.in_(subtree(root_id)))
+    nodes = node_query.order_by(models.Unit.path).all()
+    node_ids = [n.id for n in nodes]
+
+    def subtree_counts(model) -> Dict[int, int]:
+        return dict(session.query(closure.ancestor_id, func.count(model.id)).join(
+            model, model.unit_id == closure.descendant_id
+        ).filter(closure.ancestor_id.in_(node_ids)).group_by(closure.ancestor_id).all())
+
+    def direct_counts(model) -> Dict[int, int]:
+        return dict(session.query(model.unit_id, func.count(model.id)).filter(
+            model.unit_id.in_(node_ids)
+        ).group_by(model.unit_id).all())
+
+    members, equipment = subtree_counts(models.User), subtree_counts(models.Equipment)
+    direct_members, direct_equipment = direct_counts(models.User), direct_counts(models.Equipment)
+
+    by_id = {}
+    roots = []
+    for n in nodes:  # Ordered by path, so parents come before children
+        by_id[n.id] = {
+            "id": n.id,
+            "name": n.name,
+            "path": n.path,
+            "depth": n.depth,
+            "members": members.get(n.id, 0),
+            "equipment": equipment.get(n.id, 0),
+            "direct_members": direct_members.get(n.id, 0),
+            "direct_equipment": direct_equipment.get(n.id, 0),
+            "children": []
+        }
+        parent = by_id.get(n.parent_id)
+        if parent is not None:
+            parent["children"].append(by_id[n.id])
+        else:
+            roots.append(by_id[n.id])
+    return roots
+
+# --- Flush hook ---
+def _path_changed(obj, attrs) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+@event.listens_for(Session, "before_flush")
+def _resolve_units(session: Session, flush_context, instances):
+    pending = [o for o in session.new if isinstance(o, (models.User, models.Equipment))]
+    pending += [o for o in session.dirty if isinstance(o, (models.User, models.Equipment))]
+    for obj in pending:
+        is_user = isinstance(obj, models.User)
+        attrs = ("unit_hierarchy", "unit_path") if is_user else ("unit_hierarchy",)
+        if obj in session.new:
+            if obj.unit_id is not None:
+                continue
+        elif not _path_changed(obj, attrs) or _path_changed(obj, ("unit_id",)):
+            continue
+        path = (obj.unit_hierarchy or obj.unit_path) if is_user else obj.unit_hierarchy
+        obj.unit_id = resolve(session.connection(), path)
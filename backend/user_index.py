@@ -0,0 +1,183 @@
+"""
+User Typeahead Index
+
+The transfer / assign-owner dialogs search users on every keystroke. Instead of an
+unanchored `ILIKE '%q%'` scan per keystroke, lookups run against an in-memory sorted
+list of (key, user_id) pairs. Keys are the case-folded full name, each later word of it
+(so "coh" finds "Yossi Cohen") and the personal number. A prefix is one bisect plus a
+walk over the matching range. The same pairs are also kept per unit, so a scoped lookup
+bisects only the caller's units instead of skipping past everyone else's matches.
+
+Changes to users (insert, rename, unit change, delete) are applied after commit: this
+worker reloads just those users on its next lookup, and the ids are sent to the other
+workers over the invalidation bus (bus.py).
+"""
+import bisect
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .bus import bus
+
+CHANNEL = "users"
+CHANGED_KEY = "user_index_changed"
+INDEXED_ATTRS = ("full_name", "personal_number", "unit_id")
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").casefold().split())
+
+def keys_for(full_name: Optional[str], personal_number: Optional[str]) -> Set[str]:
+    name = normalize(full_name)
+    words = name.split(" ")
+    keys = {" ".join(words[i:]) for i in range(len(words))}
+    keys.add(normalize(personal_number))
+    keys.discard("")
+    return keys
+
+class UserIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[Tuple[str, int]] = []
+        self._by_unit: Dict[Optional[int], List[Tuple[str, int]]] = {}
+        self._users: Dict[int, dict] = {}
+        self._loaded = False
+        self._pending: Set[int] = set()
+        self.version = 0  # Bumped on every applied change; clients may use it as a cache key
+
+    # --- Invalidation ---
+    def mark_changed(self, user_ids: Optional[Iterable[int]]):
+        """None = reload everything."""
+        with self._lock:
+            if user_ids is None:
+                self._loaded = False
+                self._pending.clear()
+            else:
+                self._pending.update(user_ids)
+
+    def _ensure_current(self, db: Session):
+        if self._loaded and not self._pending:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load_all(db)
+            elif self._pending:
+                pending, self._pending = self._pending, set()
+                self._apply(db, pending)
+
+    def _rows(self, db: Session, ids=None):
+        U = models.User
+        stmt = select(U.id, U.full_name, U.personal_number, U.unit_id)
+        if ids is not None:
+            stmt = stmt.where(U.id.in_(ids))
+        return db.execute(stmt)
+
+    def _load_all(self, db: Session):
+        users, keys, by_unit = {}, [], {}
+        for r in self._rows(db):
+            users[r.id] = {"id": r.id, "full_name": r.full_name, "personal_number": r.personal_number, "unit_id": r.unit_id}
+            pairs = [(k, r.id) for k in keys_for(r.full_name, r.personal_number)]
+            keys.extend(pairs)
+            by_unit.setdefault(r.unit_id, []).extend(pairs)
+        keys.sort()
+        for pairs in by_unit.values():
+            pairs.sort()
+        self._users, self._keys, self._by_unit = users, keys, by_unit
+        self._loaded = True
+        self._pending.clear()
+        self.version += 1
+
+    def _apply(self, db: Session, ids: Set[int]):
+        for user_id in ids:
+            old = self._users.pop(user_id, None)
+            if old:
+                unit_keys = self._by_unit.get(old["unit_id"], [])
+                for key in keys_for(old["full_name"], old["personal_number"]):
+                    for pairs in (self._keys, unit_keys):
+                        i = bisect.bisect_left(pairs, (key, user_id))
+                        if i < len(pairs) and pairs[i] == (key, user_id):
+                            del pairs[i]
+        for r in self._rows(db, list(ids)):
+            self._users[r.id] = {"id": r.id, "full_name": r.full_name, "personal_number": r.personal_number, "unit_id": r.unit_id}
+            unit_keys = self._by_unit.setdefault(r.unit_id, [])
+            for key in keys_for(r.full_name, r.personal_number):
+                bisect.insort(self._keys, (key, r.id))
+                bisect.insort(unit_keys, (key, r.id))
+        self.version += 1
+
+    # --- Lookups ---
+    @staticmethod
+    def _walk(pairs: List[Tuple[str, int]], prefix: str, limit: int) -> Tuple[List[Tuple[str, int]], bool]:
+        """First matches for up to `limit` distinct users, and whether more users match."""
+        found, seen = [], set()
+        i = bisect.bisect_left(pairs, (prefix, -1))
+        while i < len(pairs) and pairs[i][0].startswith(prefix):
+            if pairs[i][1] not in seen:
+                if len(seen) == limit:
+                    return found, False
+                seen.add(pairs[i][1])
+                found.append(pairs[i])
+            i += 1
+        return found, True
+
+    def search(self, db: Session, q: str, limit: int, unit_ids: Optional[Set[int]] = None) -> Tuple[List[dict], bool]:
+        """
+        Up to `limit` users with a key starting with q (alphabetical by matched key),
+        optionally only those whose unit is in unit_ids. Returns (items, complete):
+        complete=True means these are all the matches, so narrower queries can be
+        filtered client-side.
+        """
+        self._ensure_current(db)
+        prefix = normalize(q)
+        if not prefix:
+            return [], False
+        with self._lock:
+            if unit_ids is None:
+                found, complete = self._walk(self._keys, prefix, limit)
+            else:
+                found, complete = [], True
+                for unit_id in unit_ids:
+                    pairs = self._by_unit.get(unit_id)
+                    if pairs:
+                        unit_found, unit_complete = self._walk(pairs, prefix, limit)
+                        found.extend(unit_found)
+                        complete = complete and unit_complete
+                found.sort()
+                if len(found) > limit:
+                    found, complete = found[:limit], False
+            return [self._users[user_id] for _, user_id in found], complete
+
+index = UserIndex()
+
+# --- Hooks ---
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context):
+    changed = {o.id for o in session.new if isinstance(o, models.User)}
+    changed.update(o.id for o in session.deleted if isinstance(o, models.User))
+    for obj in session.dirty:
+        if isinstance(obj, models.User):
+            state = inspect(obj)
+            if any(state.attrs[a].history.has_changes() for a in INDEXED_ATTRS):
+                changed.add(obj.id)
+    if changed:
+        session.info.setdefault(CHANGED_KEY, set()).update(changed)
+
+@event.listens_for(Session, "after_commit")
+def _publish_changed_users(session: Session):
+    changed = session.info.pop(CHANGED_KEY, None)
+    if changed:
+        index.mark_changed(changed)
+        bus.publish(CHANNEL, json.dumps(sorted(changed)))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changed_users(session: Session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(CHANGED_KEY, None)
+
+def _apply_remote(payload: Optional[str]):
+    index.mark_changed(None if payload is None else json.loads(payload))
+
+bus.subscribe(CHANNEL, _apply_remote)
@@ -44,8 +44,8 @@ export default function AdminPanel({ onClose: _onClose }: AdminPanelProps) {
             if (searchTerm.length > 1) {
                 setIsSearching(true);
                 try {
-                    const res = await api.get(`/users?q=${searchTerm}`);
-                    setSearchResults(res.data);
+                    const res = await api.get('/users', { params: { q: searchTerm } });
+                    setSearchResults(res.data.items);
                 } catch (e) { console.error(e); }
                 setIsSearching(false);
             } else {
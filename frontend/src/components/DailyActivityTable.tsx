@@ -11,6 +11,7 @@ interface DailyActivityItem {
     timestamp: string | null;
     event_type: string;
     serial_number: string | null;
+    equipment_name: string | null;
     reporter_name: string | null;
     location: string | null;
 }
@@ -68,16 +69,18 @@ function getEventLabel(eventType: string) {
 
 export default function DailyActivityTable({ limit, onViewAll }: DailyActivityTableProps) {
     const [activities, setActivities] = useState<DailyActivityItem[]>([]);
+    const [hasMore, setHasMore] = useState(false);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
 
     useEffect(() => {
         const fetchActivity = async () => {
             try {
-                const res = await api.get('/reports/daily_movement');
-                // API returns a flat array, not { items: [...] }
+                // Paginated server-side: only fetch the rows we display
+                const res = await api.get('/reports/daily_movement', { params: limit ? { limit } : {} });
                 const data = Array.isArray(res.data) ? res.data : (res.data?.items || []);
                 setActivities(data);
+                setHasMore(Boolean(res.data?.next_cursor));
             } catch (err) {
                 console.error("Failed to fetch daily activity", err);
                 setError("טעינת יומן הפעילות נכשלה");
@@ -87,7 +90,7 @@ export default function DailyActivityTable({ limit, onViewAll }: DailyActivityTa
         };
 
         fetchActivity();
-    }, []);
+    }, [limit]);
 
     if (loading) return (
         <div className="p-6 text-center text-muted-foreground">
@@ -151,13 +154,13 @@ export default function DailyActivityTable({ limit, onViewAll }: DailyActivityTa
             </div>
 
             {/* View All link */}
-            {limit && activities.length > limit && onViewAll && (
+            {limit && hasMore && onViewAll && (
                 <div className="px-4 py-3 border-t border-border/30 text-center">
                     <button
                         onClick={onViewAll}
                         className="text-sm text-primary hover:text-primary/80 font-medium transition-colors"
                     >
-                        הצג את כל {activities.length} האירועים ←
+                        הצג את כל האירועים ←
                     </button>
                 </div>
             )}
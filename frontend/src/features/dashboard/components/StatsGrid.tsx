@@ -56,8 +56,8 @@ export default function StatsGrid({ stats }: StatsGridProps) {
 
     // Fetch open tickets count
     useEffect(() => {
-        api.get('/tickets/?status_filter=Open')
-            .then(res => setOpenTickets(Array.isArray(res.data) ? res.data.length : 0))
+        api.get('/tickets/', { params: { include_counts: true, limit: 1 } })
+            .then(res => setOpenTickets(res.data?.counts?.Open ?? 0))
             .catch(() => setOpenTickets(0));
     }, []);
 
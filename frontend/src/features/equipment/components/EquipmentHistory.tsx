@@ -1,17 +1,15 @@
 import { useState, useEffect } from 'react';
 import api from '@/api';
 
-interface StatusHistoryItem {
+// One row of GET /equipment/{id}/timeline — movements, tickets, verifications and status changes merged
+interface TimelineItem {
+    source: 'transaction' | 'maintenance' | 'verification' | 'status_change';
     id: number;
-    equipment_id: number;
-    old_status: string;
-    new_status: string;
-    change_reason: string;
-    verification_id: number | null;
-    notes: string | null;
-    created_date: string;
-    created_by: number;
-    user_name: string | null;
+    timestamp: string | null;
+    event_type: string | null;
+    status: string | null;
+    details: string | null;
+    actor_name: string | null;
 }
 
 interface EquipmentHistoryProps {
@@ -21,8 +19,10 @@ interface EquipmentHistoryProps {
 }
 
 export default function EquipmentHistory({ equipmentId, isOpen, onClose }: EquipmentHistoryProps) {
-    const [history, setHistory] = useState<StatusHistoryItem[]>([]);
+    const [history, setHistory] = useState<TimelineItem[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [loading, setLoading] = useState(false);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     useEffect(() => {
         if (isOpen && equipmentId) {
@@ -33,8 +33,9 @@ export default function EquipmentHistory({ equipmentId, isOpen, onClose }: Equip
     const fetchHistory = async () => {
         setLoading(true);
         try {
-            const response = await api.get(`/equipment/${equipmentId}/history`);
-            setHistory(response.data);
+            const response = await api.get(`/equipment/${equipmentId}/timeline`);
+            setHistory(response.data.items);
+            setNextCursor(response.data.next_cursor ?? null);
         } catch (error) {
             console.error('Failed to fetch history:', error);
         } finally {
@@ -42,6 +43,20 @@ export default function EquipmentHistory({ equipmentId, isOpen, onClose }: Equip
         }
     };
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const response = await api.get(`/equipment/${equipmentId}/timeline`, { params: { cursor: nextCursor } });
+            setHistory(prev => [...prev, ...response.data.items]);
+            setNextCursor(response.data.next_cursor ?? null);
+        } catch (error) {
+            console.error('Failed to fetch more history:', error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     if (!isOpen) return null;
 
     const getStatusColor = (status: string) => {
@@ -52,6 +67,23 @@ export default function EquipmentHistory({ equipmentId, isOpen, onClose }: Equip
         }
     };
 
+    // Status changes carry their reason in event_type; other sources are keyed by source
+    const reasonOf = (item: TimelineItem) => {
+        switch (item.source) {
+            case 'status_change': return item.event_type || '';
+            case 'maintenance': return 'fault_report';
+            case 'verification': return 'verification';
+            default:
+                switch (item.event_type) {
+                    case 'FIX': return 'repair';
+                    case 'VERIFICATION': return 'verification';
+                    case 'HANDOVER':
+                    case 'HANDOVER_LOC': return 'transfer';
+                    default: return item.event_type || '';
+                }
+        }
+    };
+
     const getReasonIcon = (reason: string) => {
         switch (reason) {
             case 'verification': return '✅';
@@ -97,42 +129,53 @@ export default function EquipmentHistory({ equipmentId, isOpen, onClose }: Equip
                         <div className="space-y-3">
                             {history.map((item) => (
                                 <div
-                                    key={item.id}
+                                    key={`${item.source}-${item.id}`}
                                     className="border-r-4 border-primary/50 pr-4 py-3 rounded-lg
                                                bg-accent/30 hover:bg-accent/50 transition-colors"
                                 >
                                     <div className="flex items-center gap-2 text-sm text-muted-foreground">
-                                        <span>{getReasonIcon(item.change_reason)}</span>
+                                        <span>{getReasonIcon(reasonOf(item))}</span>
                                         <span className="font-medium text-foreground/80">
-                                            {getReasonLabel(item.change_reason)}
+                                            {getReasonLabel(reasonOf(item))}
                                         </span>
                                         <span>•</span>
                                         <span>
-                                            {new Date(item.created_date).toLocaleString('he-IL')}
+                                            {item.timestamp ? new Date(item.timestamp).toLocaleString('he-IL') : '—'}
                                         </span>
-                                        {item.user_name && (
+                                        {item.actor_name && (
                                             <>
                                                 <span>•</span>
-                                                <span className="text-foreground/60">{item.user_name}</span>
+                                                <span className="text-foreground/60">{item.actor_name}</span>
                                             </>
                                         )}
                                     </div>
-                                    <div className="flex items-center gap-2 mt-2">
-                                        <span className={`px-2 py-0.5 rounded text-xs font-bold ${getStatusColor(item.old_status)}`}>
-                                            {item.old_status}
-                                        </span>
-                                        <span className="text-muted-foreground">→</span>
-                                        <span className={`px-2 py-0.5 rounded text-xs font-bold ${getStatusColor(item.new_status)}`}>
-                                            {item.new_status}
-                                        </span>
-                                    </div>
-                                    {item.notes && (
-                                        <p className="text-sm text-muted-foreground mt-1.5 pr-1">{item.notes}</p>
+                                    {item.status && (
+                                        <div className="flex items-center gap-2 mt-2">
+                                            <span className={`px-2 py-0.5 rounded text-xs font-bold ${getStatusColor(item.status)}`}>
+                                                {item.status}
+                                            </span>
+                                        </div>
+                                    )}
+                                    {item.details && (
+                                        <p className="text-sm text-muted-foreground mt-1.5 pr-1">{item.details}</p>
                                     )}
                                 </div>
                             ))}
                         </div>
                     )}
+
+                    {nextCursor && !loading && (
+                        <div className="text-center mt-4">
+                            <button
+                                onClick={loadMore}
+                                disabled={loadingMore}
+                                className="px-4 py-2 rounded-lg text-sm font-medium text-primary hover:bg-primary/10
+                                           transition-colors disabled:opacity-50 disabled:cursor-wait"
+                            >
+                                {loadingMore ? 'טוען...' : 'טען עוד'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             </div>
         </div>
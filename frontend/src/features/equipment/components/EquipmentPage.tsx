@@ -127,8 +127,8 @@ function TransferModal({
         if (mode === 'person' && searchTerm.length > 1) {
             const timer = setTimeout(async () => {
                 try {
-                    const res = await api.get(`/users?q=${searchTerm}`);
-                    setSearchResults(res.data);
+                    const res = await api.get('/users/typeahead', { params: { q: searchTerm } });
+                    setSearchResults(res.data.items);
                 } catch (e) { console.error(e); }
             }, 300);
             return () => clearTimeout(timer);
@@ -250,8 +250,8 @@ function AssignOwnerModal({
         if (searchTerm.length > 1) {
             const timer = setTimeout(async () => {
                 try {
-                    const res = await api.get(`/users?q=${searchTerm}`);
-                    setSearchResults(res.data);
+                    const res = await api.get('/users/typeahead', { params: { q: searchTerm } });
+                    setSearchResults(res.data.items);
                 } catch (e) { console.error(e); }
             }, 300);
             return () => clearTimeout(timer);
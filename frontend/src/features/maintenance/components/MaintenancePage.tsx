@@ -1,5 +1,5 @@
-import { useState, useEffect, useMemo, useCallback } from 'react';
-import { Wrench, RefreshCw, AlertTriangle, CheckCircle, Clock, Inbox } from 'lucide-react';
+import { useState, useEffect, useCallback } from 'react';
+import { Wrench, RefreshCw, AlertTriangle, CheckCircle, Clock, Inbox, Package } from 'lucide-react';
 import api from '@/api';
 
 // ============================================================
@@ -17,7 +17,8 @@ interface Ticket {
     closed_at?: string | null;
 }
 
-type FilterTab = 'all' | 'Open' | 'In Progress' | 'Closed';
+// Mirrors models.TicketStatus — the server returns a count for every member plus 'all'
+type FilterTab = 'all' | 'Open' | 'In Progress' | 'Waiting for Parts' | 'Closed';
 
 // ============================================================
 // Helpers
@@ -37,6 +38,12 @@ const getStatusMeta = (status: string) => {
                 icon: <Clock size={14} />,
                 cls: 'text-blue-700 dark:text-blue-400 bg-blue-100 dark:bg-blue-500/10 border-blue-200 dark:border-blue-500/20',
             };
+        case 'Waiting for Parts':
+            return {
+                label: 'ממתין לחלקים',
+                icon: <Package size={14} />,
+                cls: 'text-violet-700 dark:text-violet-400 bg-violet-100 dark:bg-violet-500/10 border-violet-200 dark:border-violet-500/20',
+            };
         case 'Closed':
             return {
                 label: 'סגור',
@@ -72,15 +79,32 @@ export default function MaintenancePage() {
     const [canFix, setCanFix] = useState(false);
     const [fixingId, setFixingId] = useState<number | null>(null);
 
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    const [counts, setCounts] = useState<Record<FilterTab, number>>({
+        all: 0, Open: 0, 'In Progress': 0, 'Waiting for Parts': 0, Closed: 0,
+    });
+
+    const statusParams = activeTab !== 'all' ? { status_filter: activeTab } : {};
+
     const fetchTickets = useCallback(async () => {
         setLoading(true);
         setError(null);
         try {
+            // Server filters by tab and returns the per-status totals in the same request
             const [ticketRes, userRes] = await Promise.all([
-                api.get('/tickets/'),
+                api.get('/tickets/', {
+                    params: {
+                        include_counts: true,
+                        ...(activeTab !== 'all' ? { status_filter: activeTab } : {}),
+                    },
+                }),
                 api.get('/users/me'),
             ]);
-            setTickets(ticketRes.data);
+            setTickets(ticketRes.data.items);
+            setNextCursor(ticketRes.data.next_cursor ?? null);
+            setCounts(ticketRes.data.counts);
             const u = userRes.data;
             setCanFix(u.role === 'master' || u.profile?.can_change_maintenance_status);
         } catch (err) {
@@ -89,23 +113,25 @@ export default function MaintenancePage() {
         } finally {
             setLoading(false);
         }
-    }, []);
+    }, [activeTab]);
 
     useEffect(() => { fetchTickets(); }, [fetchTickets]);
 
-    // ── Counts ──
-    const counts = useMemo(() => ({
-        all: tickets.length,
-        Open: tickets.filter(t => t.status === 'Open').length,
-        'In Progress': tickets.filter(t => t.status === 'In Progress').length,
-        Closed: tickets.filter(t => t.status === 'Closed').length,
-    }), [tickets]);
-
-    // ── Filtered ──
-    const filtered = useMemo(() => {
-        if (activeTab === 'all') return tickets;
-        return tickets.filter(t => t.status === activeTab);
-    }, [tickets, activeTab]);
+    // ── Next Page (keyset cursor from the previous response) ──
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const res = await api.get('/tickets/', { params: { cursor: nextCursor, ...statusParams } });
+            setTickets(prev => [...prev, ...res.data.items]);
+            setNextCursor(res.data.next_cursor ?? null);
+        } catch (err) {
+            console.error(err);
+            alert('טעינת כרטיסים נוספים נכשלה');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
     // ── Close Ticket ──
     const handleCloseTicket = async (ticket: Ticket) => {
@@ -136,6 +162,7 @@ export default function MaintenancePage() {
         { key: 'all', label: 'הכל' },
         { key: 'Open', label: 'פתוח' },
         { key: 'In Progress', label: 'בטיפול' },
+        { key: 'Waiting for Parts', label: 'ממתין לחלקים' },
         { key: 'Closed', label: 'סגור' },
     ];
 
@@ -192,7 +219,7 @@ export default function MaintenancePage() {
             </div>
 
             {/* ── Ticket Cards ── */}
-            {filtered.length === 0 ? (
+            {tickets.length === 0 ? (
                 <div className="glass-card p-12 text-center">
                     <Inbox size={40} className="text-muted-foreground/30 mx-auto mb-3" />
                     <p className="text-muted-foreground">
@@ -201,7 +228,7 @@ export default function MaintenancePage() {
                 </div>
             ) : (
                 <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
-                    {filtered.map((ticket, idx) => {
+                    {tickets.map((ticket, idx) => {
                         const statusMeta = getStatusMeta(ticket.status);
                         return (
                             <div
@@ -285,6 +312,20 @@ export default function MaintenancePage() {
                     })}
                 </div>
             )}
+
+            {/* ── Load More ── */}
+            {nextCursor && (
+                <div className="text-center">
+                    <button
+                        onClick={loadMore}
+                        disabled={loadingMore}
+                        className="px-6 py-2 rounded-lg text-sm font-medium text-primary hover:bg-primary/10
+                                   transition-colors disabled:opacity-50 disabled:cursor-wait"
+                    >
+                        {loadingMore ? 'טוען...' : `טען עוד (${tickets.length} מתוך ${counts[activeTab]})`}
+                    </button>
+                </div>
+            )}
         </div>
     );
 }